@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the regression inference, using the tip computation example of regression_demo.py.
+
+Times the batched defuzzification of the t1, t2 (with each type reducer) and gt2 rule bases for a big number of samples,
+and compares the t1 one with the per sample center of masses.
+
+"""
+import os
+import sys
+import time
+# In case you run this without installing the package, you need to add the path to the package
+
+# This is for launching from root folder path
+sys.path.append('./ex_fuzzy/')
+sys.path.append('./ex_fuzzy/ex_fuzzy/')
+
+# This is for launching from Demos folder
+sys.path.append('../ex_fuzzy/')
+sys.path.append('../ex_fuzzy/ex_fuzzy/')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import ex_fuzzy.fuzzy_sets as t2
+import ex_fuzzy.rules as rules
+import ex_fuzzy.centroid as centroid
+import ex_fuzzy.utils as utils
+
+from regression_demo import food, service, tip, rule_list
+
+n_samples = 100000
+n_loop_samples = 10000 # The per sample loop is only timed with these samples
+X = np.random.random_sample((n_samples, 2)) * 9
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    res = function(*args)
+    return res, time.perf_counter() - start
+
+
+def t1_variable(variable: t2.fuzzyVariable) -> t2.fuzzyVariable:
+    # Same variable with the upper memberships of the iv fuzzy sets
+    return t2.fuzzyVariable(variable.name, [t2.FS(fuzzy_set.name, fuzzy_set.secondMF_upper, fuzzy_set.domain) for fuzzy_set in variable.linguistic_variables])
+
+
+# T1: batched center of masses vs the per sample loop
+t1_inference_module = rules.RuleBaseT1([t1_variable(food), t1_variable(service)], rule_list, t1_variable(tip))
+t1_output, t1_time = timed(t1_inference_module.forward, X)
+
+firing_strengths = t1_inference_module.compute_rule_antecedent_memberships(X[:n_loop_samples])
+with np.errstate(invalid='ignore'):
+    loop_output, loop_time = timed(lambda: np.array([centroid.center_of_masses(t1_inference_module.consequent_centroids_rules, sample_firing) for sample_firing in firing_strengths]))
+firing_rows = np.sum(firing_strengths, axis=1) > 0
+assert np.allclose(loop_output[firing_rows], t1_output[:n_loop_samples][firing_rows])
+
+print('Samples:', n_samples)
+print('T1 batched: %.3fs   T1 per sample loop: %.3fs (%d samples, %.1fx slower per sample)' % (t1_time, loop_time, n_loop_samples, loop_time / n_loop_samples / (t1_time / n_samples)))
+
+# T2: type reducers
+km_output = None
+for type_reducer in centroid.type_reducers:
+    inference_module = rules.RuleBaseT2([food, service], rule_list, tip, type_reducer=type_reducer)
+    output, elapsed = timed(inference_module.forward, X)
+    if km_output is None:
+        km_output = output
+    print('T2 %-10s %.3fs   mean abs difference with KM: %.4f' % (type_reducer, elapsed, np.mean(np.abs(output - km_output))))
+
+# GT2: alpha planes type reduced as iv rule bases
+gt2_antecedents = utils.construct_partitions(X, t2.FUZZY_SETS.gt2, n_partitions=3)
+gt2_inference_module = rules.RuleBaseGT2(gt2_antecedents, rule_list, tip)
+gt2_output, gt2_time = timed(gt2_inference_module.forward, X)
+print('GT2 (%d alpha cuts): %.3fs' % (len(gt2_inference_module.alpha_cuts), gt2_time))
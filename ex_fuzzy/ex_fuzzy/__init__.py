@@ -1,13 +1,29 @@
+import importlib
+
+# The inference modules only need numpy, so they are imported with the package.
+from . import maintenance
+from . import kernels
 from . import centroid
-from . import eval_rules
-from . import eval_tools
-from . import evolutionary_fit
 from . import fuzzy_sets
 from . import rules
-from . import vis_rules
-from . import utils
+from . import cache
+from . import frozen_model
 from . import persistence
-from . import maintenance
-from . import classifiers
-from . import pattern_stability
-from . import boostrapping_test
\ No newline at end of file
+
+# The training, evaluation and plotting modules load pymoo, sklearn, pandas, matplotlib and networkx,
+# so they are imported the first time they are used (ex_fuzzy.evolutionary_fit, from ex_fuzzy import vis_rules, ...).
+_lazy_modules = ['eval_rules', 'eval_tools', 'evolutionary_fit', 'vis_rules', 'utils', 'classifiers', 'pattern_stability',
+                 'boostrapping_test', 'parallel', 'rule_mining', 'temporal', 'cognitive_maps']
+
+__all__ = ['maintenance', 'kernels', 'centroid', 'fuzzy_sets', 'rules', 'cache', 'frozen_model', 'persistence'] + _lazy_modules
+
+
+def __getattr__(name):
+    if name in _lazy_modules:
+        return importlib.import_module('.' + name, __name__)
+
+    raise AttributeError('module ' + repr(__name__) + ' has no attribute ' + repr(name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,588 @@
+"""
+Bounded caches used to avoid repeating expensive computations during the genetic optimization.
+
+The MembershipStore keeps the memberships of a dataset to the fuzzy variables on disk, so that repeated fits on the same data
+(cross validation folds, stability studies, parameter searches) read them as memory maps instead of computing them again.
+
+"""
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from . import fuzzy_sets as fs
+except ImportError:
+    import fuzzy_sets as fs
+
+
+def array_key(*arrays: np.array) -> bytes:
+    '''
+    Computes a compact key (16 bytes digest) for the content of a series of arrays.
+    Arrays with the same values (and dtypes) give the same key.
+
+    :param arrays: arrays to hash. Their shapes are not part of the key, so the caller must use a fixed layout.
+    :return: bytes with the key.
+    '''
+    hasher = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        hasher.update(array.dtype.str.encode())
+        hasher.update(array.tobytes())
+        hasher.update(b'|')
+
+    return hasher.digest()
+
+
+def _update_hash(hasher, value) -> None:
+    '''
+    Adds a python value (arrays, containers, numbers, strings and objects made of them) to a hash.
+    '''
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            hasher.update(pickle.dumps(value.tolist()))
+        else:
+            hasher.update(value.dtype.str.encode())
+            hasher.update(str(value.shape).encode())
+            hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b'[')
+        for elem in value:
+            _update_hash(hasher, elem)
+        hasher.update(b']')
+    elif isinstance(value, dict):
+        hasher.update(b'{')
+        for key in sorted(value.keys(), key=repr):
+            _update_hash(hasher, key)
+            _update_hash(hasher, value[key])
+        hasher.update(b'}')
+    elif hasattr(value, '__dict__') and not isinstance(value, type):
+        hasher.update(type(value).__qualname__.encode())
+        # Names do not change the memberships
+        _update_hash(hasher, {name: attribute for name, attribute in vars(value).items() if name not in ('name', 'units')})
+    else:
+        hasher.update(repr(value).encode())
+    hasher.update(b'|')
+
+
+def fuzzy_variable_key(fuzzy_variable: fs.fuzzyVariable) -> bytes:
+    '''
+    Computes a key (16 bytes digest) for the membership functions of a fuzzy variable: the kind and parameters of its fuzzy sets.
+    Fuzzy variables that only differ in their names give the same key.
+
+    :param fuzzy_variable: fuzzy variable to hash.
+    :return: bytes with the key.
+    '''
+    hasher = hashlib.blake2b(digest_size=16)
+    _update_hash(hasher, fuzzy_variable.linguistic_variables)
+
+    return hasher.digest()
+
+
+def rules_firing_key(fuzzy_variables: list[fs.fuzzyVariable], rule_list: list, x: np.array, dtype=None) -> str:
+    '''
+    Computes the key of the firing strengths of a list of rules over a dataset: the membership functions, the antecedents and modifiers of
+    each rule, the data and the dtype.
+
+    :param fuzzy_variables: fuzzy variables used by the rules.
+    :param rule_list: list of rules (RuleSimple objects).
+    :param x: array samples x features.
+    :param dtype: floating point type of the firing strengths. If None, the default one is used.
+    :return: hexadecimal string with the key.
+    '''
+    dtype = fs.get_default_dtype() if dtype is None else np.dtype(dtype)
+    hasher = hashlib.blake2b(digest_size=16)
+    for fuzzy_variable in fuzzy_variables:
+        hasher.update(fuzzy_variable_key(fuzzy_variable))
+    _update_hash(hasher, [(np.asarray(rule.antecedents, dtype=int), rule.modifiers) for rule in rule_list])
+    hasher.update(dtype.str.encode())
+    _update_hash(hasher, np.asarray(x))
+
+    return hasher.hexdigest()
+
+
+def cached_fitness(problem, x: np.array, evaluate) -> list:
+    '''
+    Computes the fitness values of a population using the fitness cache of the problem (if it has one).
+    Only the individuals whose key is not cached are evaluated, and each distinct key is evaluated once.
+
+    :param problem: problem with a fitness_cache (LRUCache or None) and a _fitness_keys method.
+    :param x: array population x genes.
+    :param evaluate: function that computes the fitness values of a population (array population x genes). It can also return a tuple with the
+    values and a boolean array telling which of them can be cached.
+    :return: list with the fitness value of each individual.
+    '''
+    fitness_cache = getattr(problem, 'fitness_cache', None)
+    if fitness_cache is None:
+        values = evaluate(x)
+        return list(values[0] if isinstance(values, tuple) else values)
+
+    keys = problem._fitness_keys(x)
+    res = [None] * len(keys)
+    pending = {}
+    for ix, key in enumerate(keys):
+        value = fitness_cache.get(key)
+        if value is None:
+            pending.setdefault(key, []).append(ix)
+        else:
+            res[ix] = value
+
+    if len(pending) > 0:
+        new_values = evaluate(x[[ixs[0] for ixs in pending.values()]])
+        if isinstance(new_values, tuple):
+            new_values, cacheable = new_values
+        else:
+            cacheable = np.ones(len(pending), dtype=bool)
+
+        for (key, ixs), value, store in zip(pending.items(), new_values, cacheable):
+            for ix in ixs:
+                res[ix] = value
+            if store:
+                fitness_cache.put(key, value)
+
+    return res
+
+
+class MembershipStore():
+    '''
+    On disk cache with the memberships of data columns to fuzzy variables.
+
+    The memberships of each variable are saved in a .npy file named after a hash of the data column, the fuzzy sets parameters and the dtype,
+    and they are opened as read-only memory maps when they are requested again, also from other processes or sessions.
+    When the files take more than max_bytes, the least recently used ones are removed.
+    '''
+
+    def __init__(self, folder: str, max_bytes: int=None) -> None:
+        '''
+        :param folder: folder where the membership files are kept. It is created if it does not exist.
+        :param max_bytes: maximum size of the files in the folder. If None, the files are never evicted.
+        '''
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+
+    def key(self, fuzzy_variable: fs.fuzzyVariable, x: np.array, dtype=None) -> str:
+        '''
+        Returns the key of the memberships of a data column to a fuzzy variable.
+
+        :param fuzzy_variable: fuzzy variable.
+        :param x: vector with the values of the variable.
+        :param dtype: floating point type of the memberships. If None, the default one is used.
+        :return: hexadecimal string with the key.
+        '''
+        dtype = fs.get_default_dtype() if dtype is None else np.dtype(dtype)
+        hasher = hashlib.blake2b(fuzzy_variable_key(fuzzy_variable), digest_size=16)
+        hasher.update(dtype.str.encode())
+        _update_hash(hasher, np.asarray(x))
+
+        return hasher.hexdigest()
+
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key + '.npy')
+
+
+    def get(self, key: str) -> np.array:
+        '''
+        Returns the stored array for the key as a read-only memory map. Counts a hit or a miss.
+
+        :param key: key returned by the key method.
+        :return: the memory mapped array or None if it is not stored.
+        '''
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+
+        return array
+
+
+    def put(self, key: str, array: np.array) -> np.array:
+        '''
+        Stores an array and evicts the least recently used files if the store is bigger than max_bytes.
+
+        :param key: key returned by the key method.
+        :param array: array to store.
+        :return: the stored array as a read-only memory map.
+        '''
+        path = self._path(key)
+        # Written under a temporary name, so that other processes never read half written files
+        temporary_path = os.path.join(self.folder, key + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp')
+        with open(temporary_path, 'wb') as file:
+            np.save(file, np.ascontiguousarray(array))
+        os.replace(temporary_path, path)
+        self._evict(keep=path)
+
+        return np.load(path, mmap_mode='r')
+
+
+    def compute_memberships(self, fuzzy_variable: fs.fuzzyVariable, x: np.array, dtype=None):
+        '''
+        Returns the memberships of a data column to a fuzzy variable, reading them from the store if they were already computed.
+        Same output as fuzzy_variable.compute_memberships(x, dtype=dtype, sparse=True), but the memberships to all the fuzzy sets are
+        given as one array labels x samples (...). Categorical variables store their category codes.
+
+        :param fuzzy_variable: fuzzy variable.
+        :param x: vector with the values of the variable.
+        :param dtype: floating point type of the memberships. If None, the default one is used.
+        :return: array with the memberships (or fuzzy_sets.categoricalMemberships for categorical variables).
+        '''
+        dtype = fs.get_default_dtype() if dtype is None else np.dtype(dtype)
+        x = np.asarray(x)
+        key = self.key(fuzzy_variable, x, dtype)
+        stored = self.get(key)
+        categorical = fuzzy_variable.is_categorical()
+
+        if stored is None:
+            memberships = fuzzy_variable.compute_memberships(x, dtype=dtype, sparse=True)
+            if categorical:
+                stored = self.put(key, memberships.codes)
+            else:
+                stored = self.put(key, np.array([np.asarray(membership, dtype=dtype) for membership in memberships]))
+
+        if categorical:
+            return fs.categoricalMemberships(stored, len(fuzzy_variable), fuzzy_variable.fuzzy_type() == fs.FUZZY_SETS.t2, dtype)
+
+        return stored
+
+
+    def invalidate(self, key: str=None) -> None:
+        '''
+        Removes one entry of the store, or all of them if the key is None. Statistics are reset when the whole store is removed.
+
+        :param key: key of the entry to remove.
+        '''
+        paths = [self._path(key)] if key is not None else self._files()
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                # Already removed, or still memory mapped in some platforms
+                pass
+
+        if key is None:
+            with self._lock:
+                self.hits = 0
+                self.misses = 0
+
+
+    def _files(self) -> list[str]:
+        return [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith('.npy')]
+
+
+    def nbytes(self) -> int:
+        '''
+        Returns the size of the stored files in bytes.
+        '''
+        size = 0
+        for path in self._files():
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+
+        return size
+
+
+    def _evict(self, keep: str=None) -> None:
+        '''
+        Removes the least recently used files until the store fits in max_bytes. The file in keep is never removed.
+        '''
+        if self.max_bytes is None:
+            return
+
+        files = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                pass
+
+
+    def hit_rate(self) -> float:
+        '''
+        Returns the proportion of lookups that were found in the store.
+
+        :return: float in [0, 1]. 0 if there were no lookups.
+        '''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+    def stats(self) -> dict:
+        '''
+        Returns the statistics of the store.
+
+        :return: dictionary with the hits, misses, hit rate, current size in bytes and maximum size.
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(), 'nbytes': self.nbytes(), 'max_bytes': self.max_bytes}
+
+
+    def __getstate__(self) -> dict:
+        '''
+        The lock is not copied when the store is sent to other processes.
+        '''
+        state = self.__dict__.copy()
+        del state['_lock']
+
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class LRUCache():
+    '''
+    Least recently used cache with a maximum number of entries. It keeps the hit and miss counts.
+    It is safe to use from several threads.
+    '''
+
+    def __init__(self, maxsize: int=10000) -> None:
+        '''
+        :param maxsize: maximum number of entries kept in the cache.
+        '''
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key, default=None):
+        '''
+        Returns the value stored for the key and marks it as recently used. Counts a hit or a miss.
+
+        :param key: key to look for.
+        :param default: value returned if the key is not in the cache.
+        :return: the stored value or the default one.
+        '''
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+
+    def put(self, key, value) -> None:
+        '''
+        Stores a value in the cache. If the cache is full, the least recently used entry is removed.
+
+        :param key: key of the value.
+        :param value: value to store.
+        '''
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+    def clear(self, reset_stats: bool=True) -> None:
+        '''
+        Removes all the entries and resets the statistics.
+
+        :param reset_stats: if False, the hit and miss counts are kept.
+        '''
+        with self._lock:
+            self._data.clear()
+            if reset_stats:
+                self.hits = 0
+                self.misses = 0
+
+
+    def hit_rate(self) -> float:
+        '''
+        Returns the proportion of lookups that were found in the cache.
+
+        :return: float in [0, 1]. 0 if there were no lookups.
+        '''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+    def stats(self) -> dict:
+        '''
+        Returns the statistics of the cache.
+
+        :return: dictionary with the hits, misses, hit rate, current size and maximum size.
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(), 'size': len(self), 'maxsize': self.maxsize}
+
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FiringCache():
+    '''
+    Memory bounded cache with the firing strengths of rules over a fixed dataset, used to evaluate the populations of the genetic optimization.
+
+    Each column (the firing strength of one rule for all the samples) is keyed by the rule signature: its antecedent labels and modifiers.
+    As offspring share most of their rules with their parents, only the columns of the new rules have to be computed in each generation.
+    Columns that were not requested in the last max_age lookups are evicted, as their rules are no longer in the population,
+    and the least recently used ones are evicted too when the columns take more than max_bytes.
+    '''
+
+    def __init__(self, max_bytes: int, max_age: int=2) -> None:
+        '''
+        :param max_bytes: maximum memory taken by the cached columns.
+        :param max_age: number of lookups a column is kept without being requested.
+        '''
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._nbytes = 0
+        self._age = 0
+        self._data = OrderedDict() # key -> (column, age of its last request)
+        self._lock = threading.Lock()
+
+
+    def columns(self, signatures: np.array, compute) -> np.array:
+        '''
+        Returns the firing strengths of a series of rules, computing only the columns that are not in the cache.
+
+        :param signatures: integer array rules x signature length. Each row identifies one rule.
+        :param compute: function that receives the signatures of the missing rules and returns their firing strengths (samples x rules (x 2)).
+        :return: array samples x rules (x 2) with the firing strengths of all the rules, in the order of the signatures.
+        '''
+        signatures = np.ascontiguousarray(signatures)
+        keys = [signature.tobytes() for signature in signatures]
+
+        with self._lock:
+            self._age += 1
+            cached = [self._data.get(key) for key in keys]
+            missing = [ix for ix, entry in enumerate(cached) if entry is None]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        computed = compute(signatures[missing]) if len(missing) > 0 else None
+        if computed is not None:
+            column_shape, dtype = (computed.shape[0], ) + computed.shape[2:], computed.dtype
+        else:
+            column_shape, dtype = cached[0][0].shape, cached[0][0].dtype
+
+        firing = np.empty((column_shape[0], len(keys)) + column_shape[1:], dtype=dtype)
+        if computed is not None:
+            firing[:, missing] = computed
+
+        with self._lock:
+            for ix, entry in enumerate(cached):
+                if entry is not None:
+                    firing[:, ix] = entry[0]
+                    self._data[keys[ix]] = (entry[0], self._age)
+                    self._data.move_to_end(keys[ix])
+
+            for ix in missing:
+                if keys[ix] not in self._data:
+                    column = firing[:, ix].copy()
+                    self._data[keys[ix]] = (column, self._age)
+                    self._nbytes += column.nbytes
+
+            self._evict()
+
+        return firing
+
+
+    def _evict(self) -> None:
+        '''
+        Removes the columns that were not requested recently and, if the cache is still too big, the least recently used ones.
+        (The caller holds the lock)
+        '''
+        while len(self._data) > 0:
+            key, (column, age) = next(iter(self._data.items()))
+            if age > self._age - self.max_age and self._nbytes <= self.max_bytes:
+                break
+
+            del self._data[key]
+            self._nbytes -= column.nbytes
+
+
+    def clear(self, reset_stats: bool=True) -> None:
+        '''
+        Removes all the columns and resets the statistics.
+
+        :param reset_stats: if False, the hit and miss counts are kept.
+        '''
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+            if reset_stats:
+                self.hits = 0
+                self.misses = 0
+
+
+    def nbytes(self) -> int:
+        '''
+        Returns the memory taken by the cached columns.
+        '''
+        return self._nbytes
+
+
+    def hit_rate(self) -> float:
+        '''
+        Returns the proportion of requested columns that were found in the cache.
+
+        :return: float in [0, 1]. 0 if there were no lookups.
+        '''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+    def stats(self) -> dict:
+        '''
+        Returns the statistics of the cache.
+
+        :return: dictionary with the hits, misses, hit rate, number of columns, current size in bytes and maximum size.
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(), 'size': len(self), 'nbytes': self.nbytes(), 'max_bytes': self.max_bytes}
+
+
+    def __contains__(self, signature: np.array) -> bool:
+        return np.ascontiguousarray(signature).tobytes() in self._data
+
+
+    def __len__(self) -> int:
+        return len(self._data)
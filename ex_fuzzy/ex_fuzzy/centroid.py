@@ -2,6 +2,8 @@
 """
 This is the source file that contains functions to compute centroids for the case of IV fuzzy sets,
 which are commonly used when using the IV-T2 fuzzy sets.
+
+It also contains the batched type reducers (KM, EKM, Nie-Tan and Wu-Mendel), that type reduce the firing strengths of all the samples at the same time.
 """
 import numpy as np
 
@@ -17,6 +19,22 @@ def center_of_masses(z: np.array, w: np.array) -> np.array:
     return z @ w / np.sum(w)
 
 
+def batch_center_of_masses(z: np.array, memberships: np.array) -> np.array:
+    '''
+    Computes the ponderated centroid of each row of memberships with one matrix-vector product.
+
+    :param z: M sized vector of the referencial values.
+    :param memberships: samples x M matrix of the fuzzy memberships.
+    :return: samples sized vector with the centroids. Rows with no membership (no rule fires) get a 0.
+    '''
+    total_memberships = np.sum(memberships, axis=1)
+    res = np.zeros(memberships.shape[0])
+    firing = total_memberships > 0
+    res[firing] = memberships[firing] @ z / total_memberships[firing]
+
+    return res
+
+
 def compute_centroid_t2_l(z: np.array, memberships: np.array) -> float:
     '''
     Computes the Karnik and Mendel algorithm to find the centroid of an IV fuzzy set.
@@ -190,3 +208,213 @@ def consequent_centroid(antecedent_memberships: np.array, centroids: np.array) -
 
 
 
+type_reducers = ['km', 'ekm', 'nie_tan', 'wu_mendel'] # Type reduction methods supported by type_reduction.
+
+
+def centroid_orders(centroids: np.array) -> tuple[np.array, np.array]:
+    '''
+    Computes the orders that sort the left and the right consequent centroids. The rule bases compute them once and reuse them
+    in each KM type reduction.
+
+    :param centroids: M x 2 matrix. M rules and iv dimension (2). Vector of centroids.
+    :return: the order of the left centroids and the order of the right centroids.
+    '''
+    return np.argsort(centroids[:, 0], kind='stable'), np.argsort(centroids[:, 1], kind='stable')
+
+
+def _km_endpoint(z: np.array, weights_before: np.array, weights_after: np.array, initial_y: np.array, initial_switch: int=None, side: str='right') -> np.array:
+    '''
+    Karnik and Mendel iterations for one endpoint of the centroid, for all the samples at the same time.
+    The endpoint with switch point s is the weighted mean of z using weights_before for the first s values and weights_after for the rest.
+    With cumulative sums of the weights each iteration costs O(1) per sample.
+
+    :param z: M sized vector. Referencial values, sorted in ascending order.
+    :param weights_before: samples x M matrix. Weights of the values before the switch point.
+    :param weights_after: samples x M matrix. Weights of the values after the switch point.
+    :param initial_y: samples sized vector. Starting point of the iterations.
+    :param initial_switch: if not None, switch point used to start the iterations instead of initial_y. (Enhanced KM)
+    :param side: side of the switch point of the values equal to the endpoint ('right': before, 'left': after). They have to take the upper weights.
+    :return: samples sized vector with the endpoint.
+    '''
+    n_samples, n_rules = weights_before.shape
+    cumulative_before = np.zeros((n_samples, n_rules + 1), dtype=weights_before.dtype)
+    cumulative_before_z = np.zeros((n_samples, n_rules + 1), dtype=weights_before.dtype)
+    cumulative_after = np.zeros((n_samples, n_rules + 1), dtype=weights_after.dtype)
+    cumulative_after_z = np.zeros((n_samples, n_rules + 1), dtype=weights_after.dtype)
+    np.cumsum(weights_before, axis=1, out=cumulative_before[:, 1:])
+    np.cumsum(weights_before * z, axis=1, out=cumulative_before_z[:, 1:])
+    np.cumsum(weights_after, axis=1, out=cumulative_after[:, 1:])
+    np.cumsum(weights_after * z, axis=1, out=cumulative_after_z[:, 1:])
+
+    def switch_mean(rows, switch, previous_y):
+        numerator = cumulative_before_z[rows, switch] + cumulative_after_z[rows, -1] - cumulative_after_z[rows, switch]
+        denominator = cumulative_before[rows, switch] + cumulative_after[rows, -1] - cumulative_after[rows, switch]
+        # A switch point with no weight only happens when a rounding error moves y past the last value with weight: y is already the endpoint
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(denominator > 0, numerator / denominator, previous_y)
+
+    rows = np.arange(n_samples)
+    y = np.array(initial_y, dtype=np.float64)
+    if initial_switch is not None:
+        switch = np.full(n_samples, min(max(initial_switch, 0), n_rules))
+        y = switch_mean(rows, switch, y)
+    switch = np.searchsorted(z, y, side=side)
+
+    # KM converges in at most M iterations. Only the rows that have not converged are updated
+    for _ in range(n_rules + 1):
+        y[rows] = switch_mean(rows, switch[rows], y[rows])
+        new_switch = np.searchsorted(z, y[rows], side=side)
+        changed = new_switch != switch[rows]
+        if not np.any(changed):
+            break
+
+        rows = rows[changed]
+        switch[rows] = new_switch[changed]
+
+    return y
+
+
+def km_type_reduction(antecedent_memberships: np.array, centroids: np.array, enhanced: bool=False, orders: tuple[np.array, np.array]=None) -> np.array:
+    '''
+    Computes the Karnik and Mendel (or Enhanced Karnik and Mendel) type reduction for all the samples at the same time.
+
+    :param antecedent_memberships: samples x M x 2 array. Lower and upper firing strength of each rule.
+    :param centroids: M x 2 matrix. M rules and iv dimension (2). Vector of centroids.
+    :param enhanced: if True, the iterations start from the EKM switch points.
+    :param orders: orders of the left and right centroids, as returned by centroid_orders. Computed if None.
+    :return: samples x 2 array with the centroid of each sample. Samples where no rule fires get a 0 centroid.
+    '''
+    if orders is None:
+        orders = centroid_orders(centroids)
+    order_l, order_r = orders
+    n_samples, n_rules = antecedent_memberships.shape[0:2]
+    res = np.zeros((n_samples, 2))
+
+    firing = np.sum(antecedent_memberships[:, :, 1], axis=1) > 0
+    if n_rules == 0 or not np.any(firing):
+        return res
+    lower = antecedent_memberships[firing, :, 0]
+    upper = antecedent_memberships[firing, :, 1]
+
+    mean_memberships = (lower + upper) / 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        initial_l = mean_memberships @ centroids[:, 0] / np.sum(mean_memberships, axis=1)
+        initial_r = mean_memberships @ centroids[:, 1] / np.sum(mean_memberships, axis=1)
+
+    res[firing, 0] = _km_endpoint(centroids[order_l, 0], upper[:, order_l], lower[:, order_l], initial_l,
+                                  int(round(n_rules / 2.4)) if enhanced else None)
+    res[firing, 1] = _km_endpoint(centroids[order_r, 1], lower[:, order_r], upper[:, order_r], initial_r,
+                                  int(round(n_rules / 1.7)) if enhanced else None, side='left')
+
+    return res
+
+
+def nie_tan_type_reduction(antecedent_memberships: np.array, centroids: np.array) -> np.array:
+    '''
+    Computes the Nie-Tan type reduction: the center of masses of the centroids using the mean of the lower and upper firing strengths.
+    It is a closed formula (no iterations), and the result is a crisp value.
+
+    :param antecedent_memberships: samples x M x 2 array. Lower and upper firing strength of each rule.
+    :param centroids: M x 2 matrix. M rules and iv dimension (2). Vector of centroids.
+    :return: samples x 2 array, with the crisp output repeated in both columns. Samples where no rule fires get a 0 output.
+    '''
+    weights = np.sum(antecedent_memberships, axis=2)
+    total_weights = np.sum(weights, axis=1)
+    res = np.zeros(weights.shape[0])
+    firing = total_weights > 0
+    res[firing] = weights[firing] @ np.mean(centroids, axis=1) / total_weights[firing]
+
+    return np.stack([res, res], axis=1)
+
+
+def wu_mendel_type_reduction(antecedent_memberships: np.array, centroids: np.array) -> np.array:
+    '''
+    Approximates the KM centroid with the middle of the Wu-Mendel uncertainty bounds. It is a closed formula (no iterations).
+
+    :param antecedent_memberships: samples x M x 2 array. Lower and upper firing strength of each rule.
+    :param centroids: M x 2 matrix. M rules and iv dimension (2). Vector of centroids.
+    :return: samples x 2 array with the centroid of each sample. Samples where no rule fires get a 0 centroid.
+    '''
+    n_samples = antecedent_memberships.shape[0]
+    res = np.zeros((n_samples, 2))
+    lower = antecedent_memberships[:, :, 0]
+    upper = antecedent_memberships[:, :, 1]
+    sum_lower = np.sum(lower, axis=1)
+    sum_upper = np.sum(upper, axis=1)
+
+    # Bounds are only defined when some lower firing strength is positive.
+    bounded = sum_lower > 0
+    # Otherwise the KM endpoints are the extreme centroids of the rules that fire
+    only_upper = ~bounded & (sum_upper > 0)
+    if np.any(only_upper):
+        fired = upper[only_upper] > 0
+        res[only_upper, 0] = np.min(np.where(fired, centroids[:, 0], np.inf), axis=1)
+        res[only_upper, 1] = np.max(np.where(fired, centroids[:, 1], -np.inf), axis=1)
+
+    if not np.any(bounded):
+        return res
+    lower = lower[bounded]
+    upper = upper[bounded]
+    sum_lower = sum_lower[bounded]
+    sum_upper = sum_upper[bounded]
+    centroids_l = centroids[:, 0]
+    centroids_r = centroids[:, 1]
+
+    y_l_upper_weights = upper @ centroids_l / sum_upper
+    y_l_lower_weights = lower @ centroids_l / sum_lower
+    y_r_upper_weights = upper @ centroids_r / sum_upper
+    y_r_lower_weights = lower @ centroids_r / sum_lower
+    inner_l = np.minimum(y_l_upper_weights, y_l_lower_weights)
+    inner_r = np.maximum(y_r_upper_weights, y_r_lower_weights)
+
+    # The rules that do not fire do not change the centroid: the extreme centroids are taken from the ones that fire (tighter bounds)
+    fired = upper > 0
+    min_l = np.min(np.where(fired, centroids_l, np.inf), axis=1, keepdims=True)
+    max_l = np.max(np.where(fired, centroids_l, -np.inf), axis=1, keepdims=True)
+    min_r = np.min(np.where(fired, centroids_r, np.inf), axis=1, keepdims=True)
+    max_r = np.max(np.where(fired, centroids_r, -np.inf), axis=1, keepdims=True)
+
+    spread = np.sum(upper - lower, axis=1) / (sum_upper * sum_lower)
+    left_a = np.sum(lower * np.where(fired, centroids_l - min_l, 0), axis=1)
+    left_b = np.sum(upper * np.where(fired, max_l - centroids_l, 0), axis=1)
+    right_a = np.sum(upper * np.where(fired, centroids_r - min_r, 0), axis=1)
+    right_b = np.sum(lower * np.where(fired, max_r - centroids_r, 0), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        outer_l = inner_l - spread * np.nan_to_num(left_a * left_b / (left_a + left_b))
+        outer_r = inner_r + spread * np.nan_to_num(right_a * right_b / (right_a + right_b))
+
+    res[bounded, 0] = (inner_l + outer_l) / 2
+    res[bounded, 1] = (inner_r + outer_r) / 2
+
+    return res
+
+
+def type_reduction(antecedent_memberships: np.array, centroids: np.array, method: str='km', orders: tuple[np.array, np.array]=None, chunk_size: int=16384) -> np.array:
+    '''
+    Computes the type reduction of a batch of samples with the given method.
+
+    :param antecedent_memberships: samples x M x 2 array. Lower and upper firing strength of each rule.
+    :param centroids: M x 2 matrix. M rules and iv dimension (2). Vector of centroids.
+    :param method: one of type_reducers: 'km' (Karnik and Mendel), 'ekm' (Enhanced KM), 'nie_tan' or 'wu_mendel' (uncertainty bounds).
+    :param orders: orders of the left and right centroids, as returned by centroid_orders. Only used by KM and EKM.
+    :param chunk_size: number of samples reduced at the same time. (KM keeps four samples x M auxiliary arrays)
+    :return: samples x 2 array with the centroid of each sample.
+    '''
+    if method not in type_reducers:
+        raise ValueError('Unknown type reducer ' + str(method) + '. Supported: ' + ', '.join(type_reducers))
+
+    centroids = np.asarray(centroids)
+    if method in ['km', 'ekm'] and orders is None:
+        orders = centroid_orders(centroids)
+
+    res = np.zeros((antecedent_memberships.shape[0], 2))
+    for start in range(0, antecedent_memberships.shape[0], chunk_size):
+        chunk = antecedent_memberships[start:start + chunk_size]
+        if method == 'km' or method == 'ekm':
+            res[start:start + chunk_size] = km_type_reduction(chunk, centroids, enhanced=method == 'ekm', orders=orders)
+        elif method == 'nie_tan':
+            res[start:start + chunk_size] = nie_tan_type_reduction(chunk, centroids)
+        else:
+            res[start:start + chunk_size] = wu_mendel_type_reduction(chunk, centroids)
+
+    return res
@@ -202,7 +202,7 @@ class RuleFineTuneClassifier(ClassifierMixin):
         :return: a class for each sample.
         '''
         # Make predictions using the fitted model
-        y_pred = self.fl_classifier.predict(X)
+        y_pred = self.fl_classifier2.predict(X)
 
         return y_pred
     
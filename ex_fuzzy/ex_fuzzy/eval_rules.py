@@ -39,83 +39,149 @@ class evalRuleBase():
         self.consequents_names = mrule_base.get_consequents_names()
         self.precomputed_truth = precomputed_truth
 
+        self._cached_firing = None
+        self._cached_rules = None
+        self._cached_rules_key = None
+        self._cached_rule_columns = None
+
         if isinstance(y[0], str):
             self.y = np.array([list(self.consequents_names).index(str(y)) for y in y])
 
 
 
-    def compute_pattern_support(self) -> np.array:
+    def _firing_strengths(self) -> np.array:
         '''
-        Computes the pattern support for each of the rules for the given X.
-        Each pattern support firing strength is the result of the tnorm for all the antecedent memeberships,
-        dvided by their number.
+        Returns the firing strength of each rule for each sample of the evaluation data.
+        The matrix is computed only once: if some rules are purged afterwards, the columns of the remaining rules are reused.
+        (Except in gt2, where the firing strengths are scaled using all the rules in the rule base)
 
-        :return: array of shape rules x 2
+        :return: array of shape samples x rules (x 2)
         '''
+        rules_list = self._get_all_rules()
+        rules_key = tuple(id(rule) for rule in rules_list)
+
+        if self._cached_firing is not None:
+            if rules_key == self._cached_rules_key:
+                return self._cached_firing
+
+            if self.mrule_base.fuzzy_type() != fs.FUZZY_SETS.gt2 and all(rule_id in self._cached_rule_columns for rule_id in rules_key):
+                return self._cached_firing[:, [self._cached_rule_columns[rule_id] for rule_id in rules_key]]
+
         if self.time_moments is None:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-                self.X, precomputed_truth=self.precomputed_truth)
+            firing_strengths = self.mrule_base.compute_firing_strenghts(self.X, precomputed_truth=self.precomputed_truth)
         else:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-                self.X, self.time_moments)
+            firing_strengths = self.mrule_base.compute_firing_strenghts(self.X, self.time_moments)
+
+        # The rules are kept so that their ids are not reused while the cache is alive
+        self._cached_firing = firing_strengths
+        self._cached_rules = rules_list
+        self._cached_rules_key = rules_key
+        self._cached_rule_columns = {rule_id: ix for ix, rule_id in enumerate(rules_key)}
 
-        patterns = self._get_all_rules()
+        return firing_strengths
 
+
+    def _class_firing_sums(self, n_classes: int) -> tuple[np.array, np.array, np.array]:
+        '''
+        Computes, with one matrix product, the sum of the firing strengths of each rule for the samples of each class.
+
+        :param n_classes: number of classes to consider.
+        :return: tuple with the class sums (array classes x rules), the number of samples of each class and
+        the total firing strength of each rule. Both sums include the iv dimension, which has the given number of values per sample.
+        '''
+        firing_strengths = self._firing_strengths()
+        n_samples, n_rules = firing_strengths.shape[0], firing_strengths.shape[1]
+        flat_firing = firing_strengths.reshape((n_samples, n_rules, -1))
+
+        one_hot = np.equal(np.array(self.y)[:, np.newaxis], np.arange(n_classes)[np.newaxis, :]).astype(flat_firing.dtype)
+        class_sums = np.tensordot(one_hot, flat_firing, axes=(0, 0)).sum(axis=2)
+        class_counts = np.sum(one_hot, axis=0) * flat_firing.shape[2]
+        rule_totals = np.sum(flat_firing, axis=(0, 2))
+
+        return class_sums, class_counts, rule_totals
+
+
+    def _empty_rule_scores(self, n_rules: int, n_classes: int=None) -> np.array:
+        '''
+        Returns an array of zeros with the shape of the rule scores for the fuzzy set type of the rule base.
+        '''
+        shape = (n_rules, ) if n_classes is None else (n_rules, n_classes)
         if self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t1:
-            res = np.zeros((len(patterns), ))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t2:
-            res = np.zeros((len(patterns), 2))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.gt2:
-            res = np.zeros((len(patterns), 2))
+            return np.zeros(shape)
+        else:
+            return np.zeros(shape + (2, ))
 
-        for ix, pattern in enumerate(patterns):
-            consequent_match = np.equal(self.y , self.consequents[ix])
-            pattern_firing_strength = antecedent_memberships[:, ix]
 
-            if pattern_firing_strength[consequent_match].shape[0] > 0:
-                    res[ix] = np.mean(pattern_firing_strength[consequent_match])
-            
+    def _support_confidence(self) -> tuple[np.array, np.array]:
+        '''
+        Computes the support and the confidence of each rule for its consequent in a single pass over the firing strengths.
 
-        return res
+        :return: tuple with the supports and the confidences. Arrays of shape rules (x 2)
+        '''
+        # Rules may have been purged since this object was created.
+        self.consequents = self.mrule_base.get_consequents()
+        consequents = np.array(self.consequents, dtype=int)
+        n_rules = len(consequents)
+        supports = self._empty_rule_scores(n_rules)
+        confidences = self._empty_rule_scores(n_rules)
+        if n_rules == 0:
+            return supports, confidences
 
+        class_sums, class_counts, rule_totals = self._class_firing_sums(np.max(consequents) + 1)
+        rule_sums = class_sums[consequents, np.arange(n_rules)]
+        rule_counts = class_counts[consequents]
 
-    def compute_aux_pattern_support(self) -> np.array:
+        support = np.divide(rule_sums, rule_counts, out=np.zeros(n_rules), where=rule_counts > 0)
+        confidence = np.divide(rule_sums, rule_totals, out=np.zeros(n_rules), where=rule_totals != 0)
+        supports[:] = support.reshape((n_rules, ) + (1, ) * (supports.ndim - 1))
+        confidences[:] = confidence.reshape((n_rules, ) + (1, ) * (confidences.ndim - 1))
+
+        return supports, confidences
+
+
+    def _aux_support_confidence(self) -> tuple[np.array, np.array]:
         '''
-        Computes the pattern support for each of the rules for each of the classes for the given X.
+        Computes the support and the confidence of each rule for each of the classes in a single pass over the firing strengths.
+
+        :return: tuple with the supports and the confidences. Arrays of shape rules x classes (x 2)
+        '''
+        n_rules = len(self._get_all_rules())
+        n_classes = len(np.unique(self.y))
+        supports = self._empty_rule_scores(n_rules, n_classes)
+        confidences = self._empty_rule_scores(n_rules, n_classes)
+        if n_rules == 0:
+            return supports, confidences
+
+        class_sums, class_counts, rule_totals = self._class_firing_sums(n_classes)
+
+        support = np.divide(class_sums, class_counts[:, np.newaxis], out=np.zeros(class_sums.shape), where=class_counts[:, np.newaxis] > 0).T
+        confidence = np.divide(class_sums, rule_totals[np.newaxis, :], out=np.zeros(class_sums.shape), where=rule_totals[np.newaxis, :] != 0).T
+        supports[:] = support.reshape(support.shape + (1, ) * (supports.ndim - 2))
+        confidences[:] = confidence.reshape(confidence.shape + (1, ) * (confidences.ndim - 2))
+
+        return supports, confidences
+
+
+    def compute_pattern_support(self) -> np.array:
+        '''
+        Computes the pattern support for each of the rules for the given X.
         Each pattern support firing strength is the result of the tnorm for all the antecedent memeberships,
         dvided by their number.
 
         :return: array of shape rules x 2
         '''
-        if self.time_moments is None:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-                self.X)
-        else:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-                self.X, self.time_moments)
+        return self._support_confidence()[0]
 
-        patterns = self._get_all_rules()
-        n_classes = len(np.unique(self.y))
 
-        if self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t1:
-            res = np.zeros((len(patterns), n_classes, ))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t2:
-            res = np.zeros((len(patterns), n_classes, 2))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.gt2:
-            res = np.zeros((len(patterns), n_classes, 2))
-
-        for con_ix in range(n_classes):
-            for ix, pattern in enumerate(patterns):
-                consequent_match = self.y == con_ix
-                pattern_firing_strength = antecedent_memberships[:, ix]
-
-                # / pattern_firing_strength.shape[0]
-                if pattern_firing_strength[consequent_match].shape[0] > 0:
-                    res[ix, con_ix] = np.mean(pattern_firing_strength[consequent_match])
-                else:
-                    res[ix, con_ix] = pattern_firing_strength[consequent_match]
+    def compute_aux_pattern_support(self) -> np.array:
+        '''
+        Computes the pattern support for each of the rules for each of the classes for the given X.
+        Each pattern support firing strength is the result of the tnorm for all the antecedent memeberships,
+        dvided by their number.
 
-        return res
+        :return: array of shape rules x 2
+        '''
+        return self._aux_support_confidence()[0]
 
 
     def _get_all_rules(self) -> list[rules.RuleSimple]:
@@ -138,33 +204,7 @@ class evalRuleBase():
 
         :returns: array of shape 1 x rules 
         '''
-        if self.time_moments is None:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-            self.X, precomputed_truth=self.precomputed_truth)
-        else:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-            self.X, self.time_moments, precomputed_truth=self.precomputed_truth)
-
-        patterns = self._get_all_rules()
-
-        if self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t1:
-            res = np.zeros((len(patterns), ))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t2:
-            res = np.zeros((len(patterns), 2))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.gt2:
-            res = np.zeros((len(patterns), 2))
-
-        for ix, pattern in enumerate(patterns):
-            antecedent_consequent_match = np.equal(self.y, self.consequents[ix])
-            pattern_firing_strength = antecedent_memberships[:, ix]
-            dem = np.sum(pattern_firing_strength)
-            if dem == 0:
-                res[ix] = 0
-            else:
-                res[ix] = np.sum(
-                    pattern_firing_strength[antecedent_consequent_match]) / dem
-
-        return res
+        return self._support_confidence()[1]
 
 
     def compute_aux_pattern_confidence(self) -> np.array:
@@ -174,34 +214,7 @@ class evalRuleBase():
 
         :returns: array of shape rules x classes
         '''
-        if self.time_moments is None:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-            self.X)
-        else:
-            antecedent_memberships = self.mrule_base.compute_firing_strenghts(
-            self.X, self.time_moments)
-
-        patterns = self._get_all_rules()
-        n_classes = len(np.unique(self.y))
-        if self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t1:
-            res = np.zeros((len(patterns), n_classes, ))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.t2:
-            res = np.zeros((len(patterns), n_classes, 2))
-        elif self.mrule_base.fuzzy_type() == fs.FUZZY_SETS.gt2:
-            res = np.zeros((len(patterns), n_classes, 2))
-
-        for consequent in range(n_classes):
-            for ix, pattern in enumerate(patterns):
-                antecedent_consequent_match = self.y == consequent
-                pattern_firing_strength = antecedent_memberships[:, ix]
-                dem = np.sum(pattern_firing_strength)
-                if dem == 0:
-                    res[ix, consequent] = 0
-                else:
-                    res[ix, consequent] = np.sum(
-                        pattern_firing_strength[antecedent_consequent_match]) / dem
-
-        return res
+        return self._aux_support_confidence()[1]
 
 
     def dominance_scores(self) -> np.array:
@@ -210,7 +223,9 @@ class evalRuleBase():
 
         :return: array of shape rules x 2
         '''
-        return self.compute_pattern_confidence() * self.compute_pattern_support()
+        supports, confidences = self._support_confidence()
+
+        return confidences * supports
 
 
     def association_degree(self) -> np.array:
@@ -219,7 +234,7 @@ class evalRuleBase():
 
         :return: vector of shape rules
         '''
-        firing_strengths = self.mrule_base.compute_firing_strenghts(self.X)
+        firing_strengths = self._firing_strengths()
         res = self.dominance_scores() * firing_strengths
 
         if (self.mrule_base[0].fuzzy_type() == fs.FUZZY_SETS.t2) or (self.mrule_base[0].fuzzy_type() == fs.FUZZY_SETS.gt2):
@@ -234,16 +249,17 @@ class evalRuleBase():
 
         :return: array of shape rules x 2
         '''
-        return self.compute_aux_pattern_confidence() * self.compute_aux_pattern_support()
+        supports, confidences = self._aux_support_confidence()
+
+        return confidences * supports
 
 
     def add_rule_weights(self) -> None:
         '''
         Add dominance score field to each of the rules present in the master Rule Base.
         '''
-        supports = self.compute_pattern_support()
-        confidences = self.compute_pattern_confidence()
-        scores = self.dominance_scores()
+        supports, confidences = self._support_confidence()
+        scores = confidences * supports
 
         aux_counter = 0
         rules = self.mrule_base.get_rules()
@@ -260,9 +276,8 @@ class evalRuleBase():
         Add dominance score field to each of the rules present in the master Rule Base for each consequent.
         They are labeled as aux_score, aux_support and aux_confidence. (Because they are not the main rule weights)
         '''
-        supports = self.compute_aux_pattern_support()
-        confidences = self.compute_aux_pattern_confidence()
-        scores = self.aux_dominance_scores()
+        supports, confidences = self._aux_support_confidence()
+        scores = confidences * supports
 
         aux_counter = 0
         rules = self.mrule_base.get_rules()
@@ -297,8 +312,10 @@ class evalRuleBase():
             self.add_rule_weights()
 
         if self.time_moments is None:
-            winning_rules = self.mrule_base._winning_rules(actual_X, precomputed_truth=self.precomputed_truth, allow_unkown=self.mrule_base.allow_unknown)
-            preds = self.mrule_base.winning_rule_predict(actual_X, precomputed_truth=self.precomputed_truth)
+            # The firing strengths of the evaluation data are already computed
+            firing_strengths = self._firing_strengths() if X is None else None
+            winning_rules = self.mrule_base._winning_rules(actual_X, precomputed_truth=self.precomputed_truth, allow_unkown=self.mrule_base.allow_unknown, firing_strengths=firing_strengths)
+            preds = self.mrule_base.winning_rule_predict(actual_X, precomputed_truth=self.precomputed_truth, firing_strengths=firing_strengths)
         else:
             winning_rules = self.mrule_base._winning_rules(actual_X, self.time_moments)
             preds = self.mrule_base.winning_rule_predict(actual_X, self.time_moments)
@@ -311,15 +328,12 @@ class evalRuleBase():
                 preds = np.array([list(self.consequents_names).index(str(p)) for p in preds])
                 
         rules = self.mrule_base.get_rules()
+        fired = winning_rules >= 0
+        n_wins = np.bincount(winning_rules[fired], minlength=len(rules))
+        n_hits = np.bincount(winning_rules[fired], weights=np.equal(actual_y, preds)[fired], minlength=len(rules))
+        accuracies = np.divide(n_hits, n_wins, out=np.zeros(len(rules)), where=n_wins > 0)
         for jx in range(len(rules)):
-                relevant_samples = winning_rules == jx
-                if np.sum(relevant_samples) > 0:
-                    relevant_labels = actual_y[relevant_samples]
-                    relevant_preds = preds[relevant_samples]
-
-                    rules[jx].accuracy = accuracy_score(relevant_labels, relevant_preds)
-                else:
-                    rules[jx].accuracy = 0.0
+                rules[jx].accuracy = accuracies[jx]
                 
     
     def classification_eval(self) -> float:
@@ -329,11 +343,10 @@ class evalRuleBase():
 
         :return: mattews correlation coefficient. (float in [-1, 1])
         '''
-        from sklearn.metrics import matthews_corrcoef
         self.add_rule_weights()
-        preds = self.mrule_base.winning_rule_predict(self.X, precomputed_truth=self.precomputed_truth)
+        preds = self.mrule_base.winning_rule_predict(self.X, precomputed_truth=self.precomputed_truth, firing_strengths=self._firing_strengths())
 
-        return matthews_corrcoef(self.y, preds)
+        return matthews_corrcoef_batch(self.y, preds[np.newaxis, :])[0]
 
 
     def size_antecedents_eval(self, tolerance=0.1) -> float:
@@ -431,3 +444,36 @@ class evalRuleBase():
         self.add_rule_weights()
         self.add_classification_metrics()
         
+
+
+def matthews_corrcoef_batch(y: np.array, preds: np.array) -> np.array:
+    '''
+    Computes the matthews correlation coefficient of several predictions for the same labels at once.
+    Gives the same values as sklearn.metrics.matthews_corrcoef applied to each row of preds.
+
+    :param y: array shape samples. The true labels.
+    :param preds: array shape predictions x samples. Each row is a different prediction of the labels.
+    :return: array shape predictions with the mcc of each prediction.
+    '''
+    preds = np.atleast_2d(preds)
+    labels = np.unique(np.concatenate([np.ravel(y), np.ravel(preds)]))
+    n_labels = len(labels)
+    y_codes = np.searchsorted(labels, y)
+    preds_codes = np.searchsorted(labels, preds)
+
+    t_sum = np.bincount(y_codes, minlength=n_labels).astype(np.float64)
+    row_offsets = np.arange(preds.shape[0])[:, np.newaxis] * n_labels
+    p_sum = np.bincount((preds_codes + row_offsets).ravel(), minlength=preds.shape[0] * n_labels).reshape((preds.shape[0], n_labels)).astype(np.float64)
+    n_correct = np.sum(preds_codes == y_codes[np.newaxis, :], axis=1, dtype=np.float64)
+    n_samples = np.float64(len(y))
+
+    cov_ytyp = n_correct * n_samples - p_sum @ t_sum
+    cov_ypyp = n_samples**2 - np.sum(p_sum * p_sum, axis=1)
+    cov_ytyt = n_samples**2 - np.dot(t_sum, t_sum)
+
+    cov_ypyp_ytyt = cov_ypyp * cov_ytyt
+    res = np.zeros((preds.shape[0], ))
+    non_zero = cov_ypyp_ytyt != 0
+    res[non_zero] = cov_ytyp[non_zero] / np.sqrt(cov_ypyp_ytyt[non_zero])
+
+    return res
@@ -2,6 +2,8 @@
 This is a the source file that contains the class to train/fit the rulebase using a genetic algorithm.
 
 """
+import time
+
 import numpy as np
 import pandas as pd
 
@@ -17,20 +19,146 @@ from pymoo.operators.mutation.pm import PolynomialMutation
 from pymoo.core.variable import Integer
 from multiprocessing.pool import ThreadPool
 from pymoo.core.problem import StarmapParallelization
+from pymoo.core.callback import Callback
+from pymoo.core.termination import Termination
 
 try:
     from . import fuzzy_sets as fs
     from . import rules
     from . import eval_rules as evr
-    from . import vis_rules
     from . import maintenance as mnt
+    from . import parallel
+    from . import cache
 except ImportError:
     import fuzzy_sets as fs
     import rules
     import eval_rules as evr
-    import vis_rules
     import maintenance as mnt
+    import parallel
+    import cache
+
+
+
+def _cached_objective(problem: Problem, x: np.array, evaluate) -> np.array:
+    '''
+    Computes the objective values of a population using the fitness cache of the problem (if it has one).
+
+    :param problem: FitRuleBase or ExploreRuleBases problem.
+    :param x: array population x genes.
+    :param evaluate: function that computes the objective values of a population (array population x genes). (See cache.cached_fitness)
+    :return: array population with the objective values.
+    '''
+    return np.ravel(np.array(cache.cached_fitness(problem, x, evaluate), dtype=float))
+
+
+class _ResampleCallback(Callback):
+    '''
+    Draws a new mini-batch of training samples for the fitness every sample_period generations, and evaluates the population on it,
+    so that the parents and the offspring of the next generation are compared on the same samples.
+    '''
+
+    def __init__(self, problem, sample_period: int, termination=None) -> None:
+        '''
+        :param problem: FitRuleBase problem with fitness_sample.
+        :param sample_period: number of generations between draws.
+        :param termination: FitTermination of the optimization. It is told when the population is rescored.
+        '''
+        super().__init__()
+        self.problem = problem
+        self.sample_period = sample_period
+        self.termination = termination
+        self._generations = 0
+
+
+    def notify(self, algorithm) -> None:
+        self._generations += 1
+        if self.sample_period <= 0 or self._generations % self.sample_period != 0:
+            return
+
+        self.problem.resample()
+        algorithm.evaluator.eval(self.problem, algorithm.pop, skip_already_evaluated=False)
+        if self.termination is not None:
+            self.termination.rescored(algorithm)
+
 
+class FitTermination(Termination):
+    '''
+    Stops the genetic optimization after n_gen generations, or before if the time budget is spent, the best fitness has not improved
+    for a number of generations or it reaches a target value. The criteria are checked after each generation, so a generation already
+    started is always finished (the time budget can be exceeded by the duration of one generation).
+
+    When the fitness is computed on mini-batches, the values of different mini-batches are not comparable: each time the population is
+    scored on a new one (rescored), the best fitness is taken again from it, and improvements are counted against it. The target fitness
+    is only reached if the best individual also reaches it on the whole training data. (The best individual of a race is always
+    evaluated on the whole data, so races need neither)
+    '''
+
+    def __init__(self, n_gen: int, max_time: float=None, patience: int=None, target_fitness: float=None, start_time: float=None) -> None:
+        '''
+        :param n_gen: maximum number of generations.
+        :param max_time: seconds. Time budget, counted from start_time.
+        :param patience: number of generations without improvement of the best fitness before stopping.
+        :param target_fitness: stop when the best fitness (1 - the objective) is equal or higher than this value.
+        :param start_time: time.time() value from which the budget is counted. If None, the creation time of the object.
+        '''
+        super().__init__()
+        if max_time is not None and max_time <= 0:
+            raise ValueError('max_time has to be positive')
+        if patience is not None and patience < 1:
+            raise ValueError('patience has to be at least one generation')
+
+        self.n_gen = n_gen
+        self.max_time = max_time
+        self.patience = patience
+        self.target_fitness = target_fitness
+        self.start_time = time.time() if start_time is None else start_time
+
+        self.reason = None
+        self.n_gen_used = 0
+        self.best_fitness = -np.inf
+        self._best_generation = 0
+
+
+    def _update(self, algorithm) -> float:
+        self.n_gen_used = algorithm.n_gen
+        best_fitness = 1 - np.min(algorithm.pop.get('F'))
+        if best_fitness > self.best_fitness:
+            self.best_fitness = best_fitness
+            self._best_generation = self.n_gen_used
+
+        if self.target_fitness is not None and self.best_fitness >= self.target_fitness and self._full_data_target(algorithm):
+            self.reason = 'target_fitness'
+        elif self.patience is not None and self.n_gen_used - self._best_generation >= self.patience:
+            self.reason = 'no_improvement'
+        elif self.max_time is not None and time.time() - self.start_time >= self.max_time:
+            self.reason = 'max_time'
+        elif self.n_gen_used >= self.n_gen:
+            self.reason = 'n_gen'
+        else:
+            return self.n_gen_used / self.n_gen
+
+        return 1.0
+
+
+    def _full_data_target(self, algorithm) -> bool:
+        '''
+        Checks that the best individual reaches the target fitness on the whole training data, if the population was scored on a mini-batch.
+        '''
+        problem = algorithm.problem
+        if not isinstance(problem, FitRuleBase) or not problem.subsampled() or problem.race:
+            return True
+
+        best_individual = algorithm.pop.get('X')[np.argmin(algorithm.pop.get('F'))]
+        return problem.full_data_fitness(np.array(best_individual, dtype=int)[np.newaxis])[0] >= self.target_fitness
+
+
+    def rescored(self, algorithm) -> None:
+        '''
+        Takes the best fitness again from the population after it is scored on a new mini-batch. It does not count as an improvement.
+
+        :param algorithm: pymoo algorithm with the rescored population.
+        '''
+        self.best_fitness = 1 - np.min(algorithm.pop.get('F'))
 
 
 class BaseFuzzyRulesClassifier(ClassifierMixin):
@@ -40,7 +168,9 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
 
     def __init__(self,  nRules: int = 30, nAnts: int = 4, fuzzy_type: fs.FUZZY_SETS = fs.FUZZY_SETS.t1, tolerance: float = 0.0, class_names: list[str] = None,
                  n_linguistic_variables: list[int]|int = 3, verbose=False, linguistic_variables: list[fs.fuzzyVariable] = None,
-                 domain: list[float] = None, n_class: int=None, precomputed_rules: rules.MasterRuleBase=None, runner: int=1, ds_mode: int = 0, fuzzy_modifiers:bool=False, allow_unknown:bool=False) -> None:
+                 domain: list[float] = None, n_class: int=None, precomputed_rules: rules.MasterRuleBase=None, runner: int=1, ds_mode: int = 0, fuzzy_modifiers:bool=False, allow_unknown:bool=False,
+                 batch_fitness:bool=False, runner_backend:str='thread', fitness_cache:int=0, dtype=None, membership_store: cache.MembershipStore=None,
+                 firing_cache:int=0, membership_cache:int=0, fitness_sample:int=None, sample_period:int=1, race:bool=False, race_confidence:float=0.95) -> None:
         '''
         Inits the optimizer with the corresponding parameters.
 
@@ -54,10 +184,21 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
         :param domain: list of the limits for each variable. If None (default) the classifier will compute them empirically.
         :param n_class: names of the classes in the problem. If None (default) the classifier will compute it empirically.
         :param precomputed_rules: MasterRuleBase object. If not None, the classifier will use the rules in the object and ignore the conflicting parameters.
-        :param runner: number of threads to use. If None (default) the classifier will use 1 thread.
+        :param runner: number of threads (or processes) to use. If None (default) the classifier will use 1 thread. The pool evaluates one individual per task, so it cannot be used with batch_fitness.
         :param ds_mode: mode for the dominance score. 0: normal dominance score, 1: rules without weights, 2: weights optimized for each rule based on the data.
         :param fuzzy_modifiers: if True, the classifier will use the modifiers in the optimization process.
         :param allow_unknown: if True, the classifier will allow the unknown class in the classification process. (Which would be a -1 value)
+        :param batch_fitness: if True, the genetic algorithm evaluates the whole population at once with array operations instead of one rulebase at a time. (Only takes effect with precomputed t1/t2 linguistic variables)
+        :param runner_backend: 'thread' or 'process'. Kind of pool used to evaluate the individuals when runner > 1. The process pool shares the training data with the workers through memory mapped files, so that only the genes are sent to them.
+        :param fitness_cache: maximum number of fitness values remembered during the genetic optimization (0 disables the cache). Individuals that encode the same rulebase are only evaluated once.
+        :param dtype: floating point type of the memberships and firing strengths (np.float32 or np.float64). float32 halves the memory used by the precomputed memberships. If None, fuzzy_sets.get_default_dtype() is used.
+        :param membership_store: cache.MembershipStore. If given, the memberships of the data to the precomputed linguistic variables are read from it instead of computed in each fit.
+        :param firing_cache: maximum memory (in bytes) used to keep the firing strengths of the rules between generations when batch_fitness is used. Offspring only compute the rules that changed from their parents. (0 disables the cache)
+        :param membership_cache: maximum number of membership tables cached per variable when the linguistic variables are optimized (linguistic_variables is None). Individuals that share the membership parameters of a variable reuse its memberships. (0 disables the cache)
+        :param fitness_sample: if not None, the fitness is computed on a stratified mini-batch of this number of training samples instead of the whole data (for very big datasets). The individuals of the last generation are scored again with all the data to choose the best one. With race, it is the size of the first sample of the race.
+        :param sample_period: number of generations between the draws of a new mini-batch (0 keeps the first one). The population is evaluated again on each new mini-batch.
+        :param race: if True, each generation is evaluated racing the individuals on a growing sample of the data: individuals that are clearly worse than the best one are not evaluated on the bigger samples. Requires batch_fitness.
+        :param race_confidence: confidence used to decide that an individual is clearly worse than the best one in the race.
         '''
         if mnt.save_usage_flag:
             mnt.usage_data[mnt.usage_categories.Funcs]['fit'] += 1
@@ -69,6 +210,8 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
             self.nclasses_ = len(precomputed_rules.consequent_names)
             self.classes_names = precomputed_rules.consequent_names
             self.rule_base = precomputed_rules
+            if dtype is not None:
+                self.rule_base.set_dtype(dtype)
         else:
             self.nRules = nRules
             self.nAnts = nAnts
@@ -87,10 +230,29 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
         self.ds_mode = ds_mode
         self.fuzzy_modifiers = fuzzy_modifiers
         self.allow_unknown = allow_unknown
+        self.batch_fitness = batch_fitness
+        self.fitness_cache = fitness_cache
+        self.dtype = dtype
+        self.membership_store = membership_store
+        self.firing_cache = firing_cache
+        self.membership_cache = membership_cache
+        self.fitness_sample = fitness_sample
+        self.sample_period = sample_period
+        self.race = race
+        self.race_confidence = race_confidence
+
+        if runner_backend not in ('thread', 'process'):
+            raise ValueError('Unknown runner backend: ' + str(runner_backend) + '. Use "thread" or "process".')
+
+        if runner > 1 and batch_fitness:
+            raise ValueError('The runner only evaluates one individual at a time and batch_fitness evaluates the whole population at once. Use runner=1 with batch_fitness=True.')
 
         if runner > 1:
-            pool = ThreadPool(runner)
-            self.thread_runner = StarmapParallelization(pool.starmap)
+            if runner_backend == 'process':
+                self.thread_runner = parallel.ProcessRunner(runner)
+            else:
+                pool = ThreadPool(runner)
+                self.thread_runner = StarmapParallelization(pool.starmap)
         else:
             self.thread_runner = None
         
@@ -134,7 +296,8 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
 
     def fit(self, X: np.array, y: np.array, n_gen:int=70, pop_size:int=30,
             checkpoints:int=0, candidate_rules:rules.MasterRuleBase=None, initial_rules:rules.MasterRuleBase=None, random_state:int=33,
-            var_prob:float=0.3, sbx_eta:float=3.0, mutation_eta=7.0, tournament_size=3) -> None:
+            var_prob:float=0.3, sbx_eta:float=3.0, mutation_eta=7.0, tournament_size=3, max_time:float=None, patience:int=None,
+            target_fitness:float=None) -> None:
         '''
         Fits a fuzzy rule based classifier using a genetic algorithm to the given data.
 
@@ -150,8 +313,12 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
         :param sbx_eta: float. Eta parameter for the SBX crossover.
         :param mutation_eta: float. Eta parameter for the polynomial mutation.
         :param tournament_size: integer. Size of the tournament for the genetic algorithm.
-        :return: None. The classifier is fitted to the data.
+        :param max_time: float. Time budget in seconds for the whole fit. The optimization stops after the first generation that exceeds it. If None (default) there is no budget.
+        :param patience: integer. Stop when the best fitness has not improved for these generations. If None (default) it is not checked. (See FitTermination for mini-batches)
+        :param target_fitness: float. Stop when the best fitness reaches this value. If None (default) it is not checked.
+        :return: None. The classifier is fitted to the data. The reason to stop and the number of generations run are stored in stop_reason and n_gen_used.
         '''
+        termination = FitTermination(n_gen, max_time=max_time, patience=patience, target_fitness=target_fitness)
         if mnt.save_usage_flag:
             mnt.usage_data[mnt.usage_categories.Funcs]['fit'] += 1
             
@@ -186,17 +353,22 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
                 problem = FitRuleBase(X, y, nRules=self.nRules, nAnts=self.nAnts, tolerance=self.tolerance, n_classes=len(np.unique(y)),
                                     n_linguistic_variables=self.n_linguist_variables, fuzzy_type=self.fuzzy_type, domain=self.domain, thread_runner=self.thread_runner,
                                     alpha=self.alpha_, beta=self.beta_, ds_mode=self.ds_mode, encode_mods=self.fuzzy_modifiers,
-                                    allow_unknown=self.allow_unknown)
+                                    allow_unknown=self.allow_unknown, batch_fitness=self.batch_fitness, fitness_cache=self.fitness_cache, dtype=self.dtype,
+                                    firing_cache=self.firing_cache, membership_cache=self.membership_cache, fitness_sample=self.fitness_sample,
+                                    race=self.race, race_confidence=self.race_confidence, random_state=random_state)
             else:
                 # If Fuzzy variables are already precomputed.
                 problem = FitRuleBase(X, y, nRules=self.nRules, nAnts=self.nAnts, n_classes=len(np.unique(y)),
                                     linguistic_variables=self.lvs, domain=self.domain, tolerance=self.tolerance, thread_runner=self.thread_runner,
                                     alpha=self.alpha_, beta=self.beta_, ds_mode=self.ds_mode, encode_mods=self.fuzzy_modifiers,
-                                    allow_unknown=self.allow_unknown)
+                                    allow_unknown=self.allow_unknown, batch_fitness=self.batch_fitness, fitness_cache=self.fitness_cache, dtype=self.dtype,
+                                    membership_store=self.membership_store, firing_cache=self.firing_cache, fitness_sample=self.fitness_sample,
+                                    race=self.race, race_confidence=self.race_confidence, random_state=random_state)
         else:
             self.fuzzy_type = candidate_rules.fuzzy_type()
             self.n_linguist_variables = candidate_rules.n_linguistic_variables()
-            problem = ExploreRuleBases(X, y, n_classes=len(np.unique(y)), candidate_rules=candidate_rules, thread_runner=self.thread_runner, nRules=self.nRules)
+            problem = ExploreRuleBases(X, y, n_classes=len(np.unique(y)), candidate_rules=candidate_rules, thread_runner=self.thread_runner, nRules=self.nRules,
+                                       fitness_cache=self.fitness_cache, dtype=self.dtype, membership_store=self.membership_store, batch_fitness=self.batch_fitness)
 
         if self.custom_loss is not None:
             problem.fitness_func = self.custom_loss
@@ -214,6 +386,10 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
             tournament_size=tournament_size,
             sampling=rules_gene,
             eliminate_duplicates=False)
+
+        algorithm_options = {}
+        if isinstance(problem, FitRuleBase) and problem.fitness_sample is not None and not problem.race and problem.subsampled():
+            algorithm_options['callback'] = _ResampleCallback(problem, self.sample_period, termination)
         
 
         if checkpoints > 0:
@@ -221,8 +397,9 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
                 print('=================================================')
                 print('n_gen  |  n_eval  |     f_avg     |     f_min    ')
                 print('=================================================')
-            algorithm.setup(problem, seed=random_state, termination=('n_gen', n_gen)) 
-            for k in range(n_gen):
+            algorithm.setup(problem, seed=random_state, termination=termination, **algorithm_options)
+            k = 0
+            while algorithm.has_next():
                 algorithm.next()
                 res = algorithm
                 if self.verbose:
@@ -245,18 +422,49 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
                         rule_base.rename_cons(self.classes_names)
                         checkpoint_rules = rule_base.print_rules(True)
                         f.write(checkpoint_rules)     
+                k += 1
 
         else:
             res = minimize(problem,
                         algorithm,
-                        # termination,
-                        ("n_gen", n_gen),
+                        termination,
                         seed=random_state,
                         copy_algorithm=False,
+                        copy_termination=False,
                         save_history=False,
-                        verbose=self.verbose)
-        
+                        verbose=self.verbose,
+                        **algorithm_options)
+
+        self.stop_reason = termination.reason
+        self.n_gen_used = termination.n_gen_used
+        if self.verbose:
+            print('Optimization stopped after ' + str(self.n_gen_used) + ' generations (' + str(self.stop_reason) + ')')
+
         pop = res.pop
+        if isinstance(problem, FitRuleBase) and problem.subsampled():
+            # The fitness values come from samples of the data, so the last population is scored again with all of it
+            problem.use_full_data()
+            pop.set('F', problem.evaluate(pop.get('X'), return_values_of=['F']))
+
+        if isinstance(self.thread_runner, parallel.ProcessRunner):
+            # Release the worker processes and the shared training data
+            self.thread_runner.close()
+
+        if problem.fitness_cache is not None:
+            self.fitness_cache_stats = problem.fitness_cache.stats()
+            if self.verbose:
+                print('Fitness cache hit rate: %.2f (%d hits, %d misses)' % (self.fitness_cache_stats['hit_rate'], self.fitness_cache_stats['hits'], self.fitness_cache_stats['misses']))
+
+        if getattr(problem, 'membership_cache', None) is not None:
+            self.membership_cache_stats = problem.membership_cache_stats()
+            if self.verbose:
+                print('Membership cache hit rate: %.2f (%d hits, %d misses)' % (self.membership_cache_stats['hit_rate'], self.membership_cache_stats['hits'], self.membership_cache_stats['misses']))
+
+        if getattr(problem, 'firing_cache', None) is not None:
+            self.firing_cache_stats = problem.firing_cache.stats()
+            if self.verbose:
+                print('Firing cache hit rate: %.2f (%d columns reused, %d computed)' % (self.firing_cache_stats['hit_rate'], self.firing_cache_stats['hits'], self.firing_cache_stats['misses']))
+
         fitness_last_gen = pop.get('F')
         best_solution = np.argmin(fitness_last_gen)
         best_individual = pop.get('X')[best_solution, :]
@@ -327,6 +535,41 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
         return self.forward(X, out_class_names=out_class_names)
     
 
+    def iter_predict(self, X, chunk_size: int=10000, out_class_names=False, return_association_degrees=False):
+        '''
+        Returns the predicted class for the samples, chunk by chunk, so that the memory used does not depend on the number of samples.
+
+        :param X: np array samples x features, path to a .npy file (it is memory mapped), pandas dataframe or iterable of arrays/dataframes (for example, pandas.read_csv with chunksize).
+        :param chunk_size: maximum number of samples predicted at once.
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :param return_association_degrees: if True, the association degrees of each chunk are also returned.
+        :return: generator with the predictions of each chunk (and the association degrees if return_association_degrees).
+        '''
+        return self.rule_base.iter_predict(X, chunk_size, out_class_names=out_class_names, return_association_degrees=return_association_degrees)
+
+
+    def predict_chunked(self, X, chunk_size: int=10000, out_class_names=False) -> np.array:
+        '''
+        Returns the predicted class for each sample, computed chunk by chunk. (See iter_predict)
+
+        :param X: np array samples x features, path to a .npy file (it is memory mapped), pandas dataframe or iterable of arrays/dataframes.
+        :param chunk_size: maximum number of samples predicted at once.
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :return: np array samples with the predicted class.
+        '''
+        return self.rule_base.predict_chunked(X, chunk_size, out_class_names=out_class_names)
+
+
+    def compile(self):
+        '''
+        Returns a frozen version of the fitted rule base for fast inference.
+        It can be pickled and it gives the same predictions as the predict method.
+
+        :return: FrozenRuleModel object.
+        '''
+        return self.rule_base.compile()
+
+
     def predict_proba(self, X: np.array) -> np.array:
         '''
         Returns the predicted class probabilities for each sample.
@@ -353,6 +596,12 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
         '''
         Plot the fuzzy partitions in each fuzzy variable.
         '''
+        # Imported here: matplotlib and networkx are only loaded when something is plotted
+        try:
+            from . import vis_rules
+        except ImportError:
+            import vis_rules
+
         fuzzy_variables = self.rule_base.rule_bases[0].antecedents
 
         for ix, fv in enumerate(fuzzy_variables):
@@ -376,7 +625,7 @@ class BaseFuzzyRulesClassifier(ClassifierMixin):
                 for zx, fuzzy_set in enumerate(fv.linguistic_variables):
                     studied_fz = fuzzy_set.type()
                     
-                    if studied_fz == fs.FUZZY_SETS.temporal:
+                    if studied_fz.name == 'temporal': # (The temporal types are added to FUZZY_SETS when the temporal module is imported)
                         studied_fz = fuzzy_set.inside_type()
 
                     if studied_fz == fs.FUZZY_SETS.t1:
@@ -427,7 +676,8 @@ class ExploreRuleBases(Problem):
     Supports type 1 and t2.
     '''
 
-    def __init__(self, X: np.array, y: np.array, nRules: int, n_classes: int, candidate_rules: rules.MasterRuleBase, thread_runner: StarmapParallelization=None, tolerance:float = 0.01) -> None:
+    def __init__(self, X: np.array, y: np.array, nRules: int, n_classes: int, candidate_rules: rules.MasterRuleBase, thread_runner: StarmapParallelization=None, tolerance:float = 0.01,
+                 fitness_cache:int=0, dtype=None, membership_store: cache.MembershipStore=None, batch_fitness:bool=False) -> None:
         '''
         Cosntructor method. Initializes the classifier with the number of antecedents, linguist variables and the kind of fuzzy set desired.
 
@@ -435,6 +685,10 @@ class ExploreRuleBases(Problem):
         :param y: np vector containing the target classes. vector sample
         :param n_class: number of classes in the problem. If None (as default) it will be computed from the data.
         :param cancidate_rules: MasterRuleBase object. If not None, the classifier will use the rules in the object and ignore the conflicting parameters.
+        :param fitness_cache: maximum number of fitness values cached, using the chosen candidate rules as key. (0 disables the cache)
+        :param dtype: floating point type of the precomputed memberships and candidate firing strengths (np.float32 halves their memory). If None, the default one is used.
+        :param membership_store: cache.MembershipStore. If given, the memberships of the data to the candidate rules variables and the firing strengths of the candidate rules are read from it (as memory maps).
+        :param batch_fitness: if True, the whole population is evaluated at once (non elementwise problem). The thread_runner is not used, since it evaluates one individual at a time.
         '''
         try:
             self.var_names = list(X.columns)
@@ -450,9 +704,19 @@ class ExploreRuleBases(Problem):
         self.n_classes = n_classes
         self.candidate_rules = candidate_rules
         self.nRules = nRules
-        self._precomputed_truth = rules.compute_antecedents_memberships(candidate_rules.get_antecedents(), X)
+        self.dtype = dtype
+        self._precomputed_truth = rules.stack_antecedent_memberships(rules.compute_antecedents_memberships(candidate_rules.get_antecedents(), X, dtype=dtype, store=membership_store), dtype=dtype)
+        self.fitness_cache = cache.LRUCache(fitness_cache) if fitness_cache > 0 else None
 
         self.fuzzy_type = self.candidate_rules[0].antecedents[0].fuzzy_type()
+        self.candidate_consequents = np.array(self.candidate_rules.get_consequents(), dtype=int)
+        if self.fuzzy_type in (fs.FUZZY_SETS.t1, fs.FUZZY_SETS.t2):
+            self._candidate_firing = self._compute_candidate_firing(membership_store)
+            self._candidate_scores = self._candidate_dominance_scores()
+        else:
+            # gt2 firing strengths are scaled using all the rules in each rulebase, so they are computed for each individual
+            self._candidate_firing = None
+            self._candidate_scores = None
 
         self.min_bounds = np.min(self.X, axis=0)
         self.max_bounds = np.max(self.X, axis=0)
@@ -463,7 +727,16 @@ class ExploreRuleBases(Problem):
         varbound = np.array([[0, nTotalRules- 1]] * self.nRules)
 
         nVar = len(vars.keys())
-        if thread_runner is not None:
+        if batch_fitness:
+            super().__init__(
+                vars=vars,
+                n_var=nVar,
+                n_obj=1,
+                elementwise=False,
+                vtype=int,
+                xl=varbound[:, 0],
+                xu=varbound[:, 1])
+        elif thread_runner is not None:
             super().__init__(
                 vars=vars,
                 n_var=nVar,
@@ -484,6 +757,71 @@ class ExploreRuleBases(Problem):
                 xu=varbound[:, 1])
 
 
+    _batch_max_elements = 2**25 # Max size of the association degrees tensor computed at once.
+
+
+    def _compute_candidate_firing(self, membership_store: cache.MembershipStore=None) -> np.array:
+        '''
+        Computes the firing strengths of all the candidate rules for the training samples. They do not change during the optimization,
+        so the rulebases are evaluated selecting their columns.
+
+        :param membership_store: cache.MembershipStore. If given, the firing strengths are saved in it, and read as a memory map.
+        :return: array samples x candidate rules (x 2)
+        '''
+        if membership_store is not None:
+            key = cache.rules_firing_key(self.candidate_rules.get_antecedents(), self.candidate_rules.get_rules(), self.X, self.dtype)
+            firing = membership_store.get(key)
+            if firing is None:
+                firing = membership_store.put(key, self.candidate_rules.compute_firing_strenghts(self.X, precomputed_truth=self._precomputed_truth))
+
+            return firing
+
+        return self.candidate_rules.compute_firing_strenghts(self.X, precomputed_truth=self._precomputed_truth)
+
+
+    def _candidate_dominance_scores(self) -> np.array:
+        '''
+        Computes the dominance score of each candidate rule. (The same as evalRuleBase.add_rule_weights)
+        The score of a rule only depends on its own firing strengths and consequent, so it is the same in every rulebase that chooses it.
+
+        :return: array candidate rules with the scores.
+        '''
+        y = self._class_codes()
+        firing = self._candidate_firing
+        n_samples, n_candidates = firing.shape[0], firing.shape[1]
+        flat_firing = firing.reshape((n_samples, n_candidates, -1))
+
+        one_hot = np.equal(y[:, np.newaxis], np.arange(self._n_consequents())[np.newaxis, :]).astype(flat_firing.dtype)
+        class_sums = np.tensordot(one_hot, flat_firing, axes=(0, 0)).sum(axis=2)
+        class_counts = np.sum(one_hot, axis=0) * flat_firing.shape[2]
+        rule_totals = np.sum(flat_firing, axis=(0, 2))
+
+        rule_sums = class_sums[self.candidate_consequents, np.arange(n_candidates)]
+        rule_counts = class_counts[self.candidate_consequents]
+        supports = np.divide(rule_sums, rule_counts, out=np.zeros(n_candidates), where=rule_counts > 0)
+        confidences = np.divide(rule_sums, rule_totals, out=np.zeros(n_candidates), where=rule_totals != 0)
+
+        return (confidences * supports).astype(firing.dtype, copy=False)
+
+
+    def _class_codes(self) -> np.array:
+        '''
+        Returns the training labels as class indexes.
+        '''
+        y = np.asarray(self.y)
+        if isinstance(y[0], str):
+            y = np.unique(y, return_inverse=True)[1]
+
+        return y.astype(int)
+
+
+    def _n_consequents(self) -> int:
+        '''
+        Returns the number of classes of the rulebases: the classes of the problem, or the candidate rulebases if there are more of them.
+        '''
+        return max(self.n_classes, len(self.candidate_rules))
+
+
     def _construct_ruleBase(self, x: np.array, fuzzy_type: fs.FUZZY_SETS, ds_mode:int=0, allow_unknown:bool=False) -> rules.MasterRuleBase:
         '''
         Creates a valid rulebase from the given subject and the candidate rules.
@@ -496,37 +834,30 @@ class ExploreRuleBases(Problem):
         :return: a Master rulebase object.
         '''
         x = x.astype(int)
-        # Get all rules and their consequents
-        diff_consequents = np.arange(len(self.candidate_rules))
-        
         # Choose the selected ones in the gen
         total_rules = self.candidate_rules.get_rules()
-        chosen_rules = [total_rules[ix] for ix, val in enumerate(x)]
-        rule_consequents = sum([[ix] * len(rule) for ix, rule in enumerate(self.candidate_rules)], [])
-        chosen_rules_consequents = [rule_consequents[val] for ix, val in enumerate(x)]
         # Create a rule base for each consequent with the selected rules
-        rule_list = [[] for _ in range(self.n_classes)]
+        # (Consequents without selected rules keep an empty rule base, so that the rule bases and the consequents stay aligned)
+        rule_list = [[] for _ in range(self._n_consequents())]
+        for val in x:
+            rule_list[self.candidate_consequents[val]].append(total_rules[val])
+
         rule_bases = []
-        for ix, consequent in enumerate(diff_consequents):
-            for rx, rule in enumerate(chosen_rules):
-                if chosen_rules_consequents[rx] == consequent:
-                    rule_list[ix].append(rule)
-
-            if len(rule_list[ix]) > 0:
-                if fuzzy_type == fs.FUZZY_SETS.t1:
-                    rule_base_cons = rules.RuleBaseT1(
-                        self.candidate_rules[0].antecedents, rule_list[ix])
-                elif fuzzy_type == fs.FUZZY_SETS.t2:
-                    rule_base_cons = rules.RuleBaseT2(
-                        self.candidate_rules[0].antecedents, rule_list[ix])
-                elif fuzzy_type == fs.FUZZY_SETS.gt2:
-                    rule_base_cons = rules.RuleBaseGT2(
-                        self.candidate_rules[0].antecedents, rule_list[ix])
-                    
-                rule_bases.append(rule_base_cons)
-            
+        for consequent_rules in rule_list:
+            if fuzzy_type == fs.FUZZY_SETS.t1:
+                rule_base_cons = rules.RuleBaseT1(
+                    self.candidate_rules[0].antecedents, consequent_rules)
+            elif fuzzy_type == fs.FUZZY_SETS.t2:
+                rule_base_cons = rules.RuleBaseT2(
+                    self.candidate_rules[0].antecedents, consequent_rules)
+            elif fuzzy_type == fs.FUZZY_SETS.gt2:
+                rule_base_cons = rules.RuleBaseGT2(
+                    self.candidate_rules[0].antecedents, consequent_rules)
+
+            rule_bases.append(rule_base_cons)
+
         # Create the Master Rule Base object with the individual rule bases
-        newMasterRuleBase = rules.MasterRuleBase(rule_bases, diff_consequents, ds_mode=ds_mode, allow_unknown=allow_unknown)    
+        newMasterRuleBase = rules.MasterRuleBase(rule_bases, np.arange(len(rule_list)), ds_mode=ds_mode, allow_unknown=allow_unknown, dtype=self.dtype)
 
         return newMasterRuleBase
 
@@ -538,15 +869,85 @@ class ExploreRuleBases(Problem):
 
         :param out: dict where the F field is the fitness. It is used from the outside.
         '''
+        if not self.elementwise:
+            out["F"] = _cached_objective(self, np.array(x).astype(int), self._batch_objective)[:, np.newaxis]
+        else:
+            out["F"] = _cached_objective(self, np.array(x)[np.newaxis], self._batch_objective)[0]
+
+
+    def _batch_objective(self, x: np.array) -> np.array:
+        '''
+        Computes the objective value (1 - fitness) of a population. With t1/t2 candidate rules and the default fitness function,
+        the rulebases are evaluated over the precomputed candidate firing strengths. Otherwise, each rulebase is built and evaluated in turn.
+
+        :param x: integer array population x genes.
+        :return: array population with the objective values.
+        '''
+        x = np.array(x).astype(int)
+        if self._candidate_firing is not None and 'fitness_func' not in self.__dict__:
+            return 1 - self._population_fitness(x)
+
+        return np.array([self._individual_objective(individual) for individual in x])
+
+
+    def _population_fitness(self, x: np.array) -> np.array:
+        '''
+        Computes the fitness of the rulebases chosen by a population as column selections of the candidate firing strengths.
+        Gives the same values as fitness_func applied to each rulebase: the mcc of the winning rule predictions, where each rule
+        is weighted by its dominance score.
+
+        :param x: integer array population x genes.
+        :return: array population with the fitness of each individual.
+        '''
+        n_pop = x.shape[0]
+        y = self._class_codes()
+        firing = self._candidate_firing
+        t2 = firing.ndim == 3
+
+        # Rules are sorted by consequent, keeping the gene order, as in the MasterRuleBase
+        chosen = np.take_along_axis(x, np.argsort(self.candidate_consequents[x], axis=1, kind='stable'), axis=1)
+
+        preds = np.zeros((n_pop, firing.shape[0]), dtype=int)
+        individual_size = int(np.prod(firing.shape)) // max(firing.shape[1], 1) * x.shape[1]
+        chunk = max(1, ExploreRuleBases._batch_max_elements // max(individual_size, 1))
+        for start in range(0, n_pop, chunk):
+            chosen_chunk = chosen[start:start + chunk]
+            if t2:
+                association_degrees = np.mean(self._candidate_scores[chosen_chunk][:, np.newaxis, :, np.newaxis] * firing[:, chosen_chunk].swapaxes(0, 1), axis=3)
+            else:
+                association_degrees = self._candidate_scores[chosen_chunk][:, np.newaxis, :] * firing[:, chosen_chunk].swapaxes(0, 1)
+
+            winners = np.argmax(association_degrees, axis=2)
+            preds[start:start + chunk] = self.candidate_consequents[np.take_along_axis(chosen_chunk, winners, axis=1)]
+
+        return evr.matthews_corrcoef_batch(y, preds)
+
+
+    def _individual_objective(self, x: np.array) -> float:
+        '''
+        Builds the rulebase chosen by one gene and computes its objective value (1 - fitness).
+
+        :param x: gene of one individual.
+        :return: float. Objective value.
+        '''
         try:
             ruleBase = self._construct_ruleBase(x, self.fuzzy_type)
 
             score = self.fitness_func(ruleBase, self.X, self.y, self.tolerance, precomputed_truth=self._precomputed_truth)
-            
 
-            out["F"] = 1 - score
+            return 1 - score
         except rules.RuleError:
-            out["F"] = 1
+            return 1
+
+
+    def _fitness_keys(self, x: np.array) -> list[bytes]:
+        '''
+        Computes the fitness cache key of each individual: the multiset of the chosen candidate rules.
+
+        :param x: array population x genes.
+        :return: list with one key per individual.
+        '''
+        return [cache.array_key(np.sort(individual)) for individual in np.array(x).astype(int)]
 
     
     def fitness_func(self, ruleBase: rules.RuleBase, X:np.array, y:np.array, tolerance:float, alpha:float=0.0, beta:float=0.0, precomputed_truth=None) -> float:
@@ -594,19 +995,22 @@ class FitRuleBase(Problem):
         self.domain = domain
         self._precomputed_truth = None
 
-    def _init_precomputed_vl(self, linguist_variables: list[fs.fuzzyVariable], X: np.array):
+    def _init_precomputed_vl(self, linguist_variables: list[fs.fuzzyVariable], X: np.array, membership_store: cache.MembershipStore=None):
         '''
         Inits the corresponding fields if linguistic partitions for each variable are given.
 
         :param linguistic_variables: list of fuzzyVariables type.
         :param X: np array samples x features.
+        :param membership_store: cache.MembershipStore used to read the memberships. If None, they are computed.
         '''
         self.lvs = linguist_variables
         self.vl_names = [lv.linguistic_variable_names() for lv in self.lvs]
         self.n_lv_possible = [len(lv.linguistic_variable_names()) for lv in self.lvs]
         self.fuzzy_type = self.lvs[0].fs_type
         self.domain = None
-        self._precomputed_truth = rules.compute_antecedents_memberships(linguist_variables, X)
+        self._precomputed_truth = rules.stack_antecedent_memberships(rules.compute_antecedents_memberships(linguist_variables, X, dtype=self.dtype, store=membership_store), dtype=self.dtype)
+
+    _batch_max_elements = 2**25 # Max size of the association degrees tensor computed at once in batch_fitness mode.
 
     vl_names = [  # Linguistic variable names prenamed for some specific cases.
         [],
@@ -619,7 +1023,9 @@ class FitRuleBase(Problem):
 
     def __init__(self, X: np.array, y: np.array, nRules: int, nAnts: int, n_classes: int, thread_runner: StarmapParallelization=None, 
                  linguistic_variables:list[fs.fuzzyVariable]=None, n_linguistic_variables:int=3, fuzzy_type=fs.FUZZY_SETS.t1, domain:list=None,
-                 tolerance:float=0.01, alpha:float=0.0, beta:float=0.0, ds_mode: int =0, encode_mods: bool=False, allow_unknown:bool=False) -> None:
+                 tolerance:float=0.01, alpha:float=0.0, beta:float=0.0, ds_mode: int =0, encode_mods: bool=False, allow_unknown:bool=False,
+                 batch_fitness:bool=False, fitness_cache:int=0, dtype=None, membership_store: cache.MembershipStore=None, firing_cache:int=0,
+                 membership_cache:int=0, fitness_sample:int=None, race:bool=False, race_confidence:float=0.95, random_state:int=None) -> None:
         '''
         Cosntructor method. Initializes the classifier with the number of antecedents, linguist variables and the kind of fuzzy set desired.
 
@@ -638,6 +1044,16 @@ class FitRuleBase(Problem):
         :param ds_mode: int. Mode for the dominance score. 0: normal dominance score, 1: rules without weights, 2: weights optimized for each rule based on the data.
         :param encode_mods: bool. If True, the optimization process will include the modifiers for the membership functions.
         :param allow_unknown: if True, the classifier will allow the unknown class in the classification process. (Which would be a -1 value)
+        :param batch_fitness: if True, the whole population is evaluated at once (non elementwise problem), and the thread_runner is not used. Rules are decoded and scored with array operations when the linguistic variables are precomputed (t1 and t2 fs) and the default fitness function is used. Otherwise, each individual is evaluated in turn.
+        :param fitness_cache: maximum number of fitness values cached, using the decoded rulebase as key: its distinct rules and the membership parameters. (0 disables the cache)
+        :param dtype: floating point type of the memberships and firing strengths (np.float32 or np.float64). If None, the default one is used.
+        :param membership_store: cache.MembershipStore. If given, the memberships of the data to the linguistic variables are read from it (and saved in it if they were not there).
+        :param firing_cache: maximum memory (in bytes) used to keep the firing strengths of the rules between generations in batch_fitness mode, so that only the rules that changed are computed for each offspring. (0 disables the cache)
+        :param membership_cache: maximum number of membership tables cached per variable when the linguistic variables are optimized. The memberships of a variable are keyed by its membership parameters genes, so they are reused by the individuals (and generations) that share them. (0 disables the cache)
+        :param fitness_sample: if not None, number of training samples used to compute the fitness: a stratified mini-batch that is drawn again with resample(). With race, it is the size of the first sample of the race.
+        :param race: if True, each population is evaluated on a growing stratified sample (doubling its size up to the whole data), and the individuals that are clearly worse than the best one are dropped from the next rounds. Only for batch_fitness.
+        :param race_confidence: confidence of the bound used to drop individuals in the race. Higher values drop less individuals.
+        :param random_state: seed for the sampling of the training data.
         '''
         try:
             self.var_names = list(X.columns)
@@ -659,6 +1075,18 @@ class FitRuleBase(Problem):
         self.ds_mode = ds_mode
         self.encode_mods = encode_mods
         self.allow_unknown = allow_unknown
+        self.dtype = dtype
+        self.fitness_cache = cache.LRUCache(fitness_cache) if fitness_cache > 0 else None
+        self.firing_cache = cache.FiringCache(firing_cache) if firing_cache > 0 else None
+        self.membership_cache = [cache.LRUCache(membership_cache) for _ in range(self.X.shape[1])] if membership_cache > 0 and linguistic_variables is None else None
+        if race and not batch_fitness:
+            raise ValueError('The race needs the whole population at once. Use batch_fitness=True.')
+        if not 0 < race_confidence < 1:
+            raise ValueError('The race confidence must be in (0, 1).')
+        self.fitness_sample = fitness_sample
+        self.race = race
+        self.race_confidence = race_confidence
+        self._sampling_rng = np.random.default_rng(random_state)
 
         if n_classes is not None:
             self.n_classes = n_classes
@@ -666,7 +1094,7 @@ class FitRuleBase(Problem):
             self.n_classes = len(np.unique(y))
 
         if linguistic_variables is not None:
-            self._init_precomputed_vl(linguistic_variables, X)
+            self._init_precomputed_vl(linguistic_variables, X, membership_store)
         else:
             if isinstance(n_linguistic_variables, int):
                 n_linguistic_variables = [n_linguistic_variables] * self.X.shape[1]
@@ -754,7 +1182,16 @@ class FitRuleBase(Problem):
         self.alpha_ = alpha
         self.beta_ = beta
 
-        if thread_runner is not None:
+        if batch_fitness:
+            super().__init__(
+                vars=vars,
+                n_var=nVar,
+                n_obj=1,
+                elementwise=False,
+                vtype=int,
+                xl=varbound[:, 0],
+                xu=varbound[:, 1])
+        elif thread_runner is not None:
             super().__init__(
                 vars=vars,
                 n_var=nVar,
@@ -774,6 +1211,151 @@ class FitRuleBase(Problem):
                 xl=varbound[:, 0],
                 xu=varbound[:, 1])
 
+        # The full training data is kept when the fitness is computed on samples of it
+        self._full_data = (self.X, self.y, self._precomputed_truth)
+        self._sample_rows = None
+        if self.fitness_sample is not None and not self.race:
+            self.resample()
+
+
+    def subsampled(self) -> bool:
+        '''
+        Returns True if the fitness is computed on samples of the training data (mini-batches or races).
+        '''
+        return (self.fitness_sample is not None and self.fitness_sample < len(self._full_data[1])) or self.race
+
+
+    def _stratified_order(self) -> np.array:
+        '''
+        Returns a random permutation of the training samples where every prefix keeps (approximately) the class proportions of the data.
+
+        :return: integer array with the sample indexes.
+        '''
+        codes, counts = np.unique(np.asarray(self._full_data[1]), return_inverse=True, return_counts=True)[1:]
+        n_samples = len(codes)
+        shuffled = self._sampling_rng.permutation(n_samples)
+        by_class = shuffled[np.argsort(codes[shuffled], kind='stable')]
+        ranks = np.empty((n_samples, ))
+        ranks[by_class] = np.arange(n_samples) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        # Each class is spread evenly along the permutation
+        return np.argsort((ranks + self._sampling_rng.random(n_samples)) / counts[codes], kind='stable')
+
+
+    def _use_samples(self, rows: np.array) -> None:
+        '''
+        Sets the training samples used to compute the fitness. The caches that depend on the samples are emptied.
+        The indexes are kept in _sample_rows, so that the process runners send them to their workers.
+
+        :param rows: sorted indexes of the samples. If None, the whole training data is used.
+        '''
+        X, y, precomputed_truth = self._full_data
+        self._sample_rows = rows
+        if rows is None:
+            self.X, self.y, self._precomputed_truth = X, y, precomputed_truth
+        else:
+            self.X, self.y = X[rows], np.asarray(y)[rows]
+            self._precomputed_truth = rules.select_samples(precomputed_truth, rows) if precomputed_truth is not None else None
+
+        if self.firing_cache is not None:
+            self.firing_cache.clear(reset_stats=False)
+        if self.membership_cache is not None:
+            for variable_cache in self.membership_cache:
+                variable_cache.clear(reset_stats=False)
+
+
+    def resample(self) -> None:
+        '''
+        Draws a new stratified mini-batch of fitness_sample training samples. Fitness values computed on the previous one are forgotten.
+        '''
+        if self.fitness_sample is None or self.race:
+            return
+
+        self._use_samples(np.sort(self._stratified_order()[:self.fitness_sample]))
+        if self.fitness_cache is not None:
+            self.fitness_cache.clear(reset_stats=False)
+
+
+    def use_full_data(self) -> None:
+        '''
+        Stops the subsampling: from now on, the fitness is computed on the whole training data.
+        '''
+        self.fitness_sample = None
+        self.race = False
+        self._use_samples(None)
+        if self.fitness_cache is not None:
+            self.fitness_cache.clear(reset_stats=False)
+
+
+    def full_data_fitness(self, x: np.array) -> np.array:
+        '''
+        Computes the fitness of a population on the whole training data, also when the fitness is computed on samples of it.
+
+        :param x: integer array population x genes.
+        :return: array population with the fitness of each individual.
+        '''
+        rows = self._sample_rows
+        self._use_samples(None)
+        try:
+            return self._sample_fitness(x)
+        finally:
+            self._use_samples(rows)
+
+
+    def _race(self, x: np.array) -> tuple[np.array, np.array]:
+        '''
+        Computes the fitness of a population racing the individuals on a growing stratified sample of the training data.
+        The sample size starts at fitness_sample (1000 if it is None) and it is doubled until all the data is used. After each round,
+        the individuals whose fitness is lower than the best one by more than two times the Hoeffding bound of the sample are dropped.
+        When only one individual is left, it is evaluated on all the data at once.
+
+        The bound is only a heuristic: the mcc is not a mean of bounded iid terms, but the bound of a mean with its range ([-1, 1]) gives
+        the scale of its sampling error. (The size terms of the fitness do not depend on the samples, so they are not part of the range)
+        The survivors get their full data fitness. Dropped individuals get their last estimate, capped by the worst survivor fitness,
+        so that they never rank above a survivor.
+
+        :param x: integer array population x genes.
+        :return: array population with the fitness of each individual, and boolean array population with True for the survivors.
+        '''
+        n_samples = len(self._full_data[1])
+        order = self._stratified_order()
+        sample_size = min(n_samples, self.fitness_sample if self.fitness_sample is not None else 1000)
+        mcc_range = 2.0
+
+        fitness = np.zeros((x.shape[0], ))
+        alive = np.arange(x.shape[0])
+        try:
+            while True:
+                self._use_samples(np.sort(order[:sample_size]))
+                fitness[alive] = self._sample_fitness(x[alive])
+                if sample_size >= n_samples:
+                    break
+
+                bound = mcc_range * np.sqrt(np.log(2 / (1 - self.race_confidence)) / (2 * sample_size))
+                alive = alive[fitness[alive] >= np.max(fitness[alive]) - 2 * bound]
+                sample_size = n_samples if len(alive) <= 1 else min(n_samples, 2 * sample_size)
+        finally:
+            self._use_samples(None)
+
+        survivors = np.zeros((x.shape[0], ), dtype=bool)
+        survivors[alive] = True
+        fitness[~survivors] = np.minimum(fitness[~survivors], np.min(fitness[survivors]))
+
+        return fitness, survivors
+
+
+    def _sample_fitness(self, x: np.array) -> np.array:
+        '''
+        Computes the fitness of a population on the current training samples.
+
+        :param x: integer array population x genes.
+        :return: array population with the fitness of each individual.
+        '''
+        if self._batch_supported():
+            return self._population_fitness(x)
+
+        return np.array([self._individual_fitness(individual) for individual in x])
+
 
     def encode_rulebase(self, rule_base: rules.MasterRuleBase, optimize_lv: bool, encode_mods:bool=False) -> np.array:
         '''
@@ -901,10 +1483,7 @@ class FitRuleBase(Problem):
             # If no memberships are optimized.
             fourth_pointer = 2 * self.nAnts * self.nRules
 
-        if self.ds_mode == 2:
-            fifth_pointer = fourth_pointer + self.nRules
-        else:
-            fifth_pointer = fourth_pointer
+        fifth_pointer = fourth_pointer + self.nRules
 
         if self.ds_mode == 2:
             sixth_pointer = fifth_pointer + self.nRules
@@ -1011,7 +1590,7 @@ class FitRuleBase(Problem):
 
 
         for i in range(self.n_classes):
-            if fuzzy_type == fs.FUZZY_SETS.temporal:
+            if fuzzy_type.name == 'temporal':
                 fuzzy_type = self.lvs[0][0].inside_type()
 
             if fuzzy_type == fs.FUZZY_SETS.t1:
@@ -1023,7 +1602,7 @@ class FitRuleBase(Problem):
             
 
             if i == 0:
-                res = rules.MasterRuleBase([rule_base], self.classes_names, ds_mode=self.ds_mode, allow_unknown=self.allow_unknown)
+                res = rules.MasterRuleBase([rule_base], self.classes_names, ds_mode=self.ds_mode, allow_unknown=self.allow_unknown, dtype=self.dtype)
             else:
                 res.add_rule_base(rule_base)
 
@@ -1036,17 +1615,332 @@ class FitRuleBase(Problem):
         '''
         :param x: array of train samples. x shape = features
             those features are the parameters to optimize.
+            If the problem is not elementwise (batch_fitness), x shape = population x features.
 
         :param out: dict where the F field is the fitness. It is used from the outside.
         '''
+        if not self.elementwise:
+            out["F"] = _cached_objective(self, np.array(x).astype(int), self._batch_objective)[:, np.newaxis]
+        else:
+            try:
+                # subject might come as a dict.
+                x = np.array(list(x.values()))
+            except AttributeError:
+                pass
+
+            out["F"] = _cached_objective(self, np.array(x)[np.newaxis], lambda population: np.array([1 - self._individual_fitness(population[0])]))[0]
+
+
+    def _batch_objective(self, x: np.array):
+        '''
+        Computes the objective value (1 - fitness) of a whole population.
+
+        :param x: integer array population x genes.
+        :return: array population with the objective values. With race, also a boolean array with the values that can be cached. (See cache.cached_fitness)
+        '''
+        if self.race:
+            # Only the fitness of the survivors is computed with all the data, so the rest is not cached
+            scores, survivors = self._race(x)
+            return 1 - scores, survivors
+
+        return 1 - self._sample_fitness(x)
+
+
+    def _fitness_keys(self, x: np.array) -> list[bytes]:
+        '''
+        Computes the fitness cache key of each individual. The key is the canonical encoding of the decoded rulebase:
+        the sorted distinct rules (consequent, antecedents, weight and modifiers) and the membership parameters genes.
+
+        :param x: array population x genes.
+        :return: list with one key per individual.
+        '''
+        x = np.array(x).astype(int)
+        n_pop = x.shape[0]
+        antecedents, modifiers, consequents, weights, valid = self._decode_population(x)
+
+        rule_rows = [consequents[:, :, np.newaxis], antecedents, weights[:, :, np.newaxis]]
+        if modifiers is not None:
+            rule_rows.append(modifiers)
+        rule_rows = np.concatenate(rule_rows, axis=2).astype(float)
+
+        if self.lvs is None:
+            mf_size = 4 if self.fuzzy_type == fs.FUZZY_SETS.t1 else 8
+            third_pointer = 2 * self.nAnts * self.nRules
+            membership_genes = x[:, third_pointer:third_pointer + sum(self.n_lv_possible) * mf_size]
+        else:
+            membership_genes = np.zeros((n_pop, 0), dtype=int)
+
+        return [cache.array_key(membership_genes[ix], np.unique(rule_rows[ix][valid[ix]], axis=0)) for ix in range(n_pop)]
+
+
+    def _individual_fitness(self, x: np.array) -> float:
+        '''
+        Builds the rulebase encoded in one gene and computes its fitness.
+
+        :param x: gene of one individual.
+        :return: float. Fitness value (0 if the rulebase is empty).
+        '''
         ruleBase = self._construct_ruleBase(x, self.fuzzy_type)
 
         if len(ruleBase.get_rules()) > 0:
-            score = self.fitness_func(ruleBase, self.X, self.y, self.tolerance, self.alpha_, self.beta_, self._precomputed_truth)
+            precomputed_truth = self._precomputed_truth if self.lvs is not None else self._optimized_memberships(x, ruleBase)
+            score = self.fitness_func(ruleBase, self.X, self.y, self.tolerance, self.alpha_, self.beta_, precomputed_truth)
         else:
             score = 0.0
-        
-        out["F"] = 1 - score
+
+        return score
+
+
+    def _optimized_memberships(self, x: np.array, ruleBase: rules.MasterRuleBase) -> np.array:
+        '''
+        Computes the memberships of the data to the linguistic variables optimized in one gene, reading the ones of each variable
+        from the membership cache when its membership parameters genes were already seen.
+
+        :param x: gene of one individual.
+        :param ruleBase: rulebase built from the gene.
+        :return: stacked antecedent memberships, or None if there is no membership cache.
+        '''
+        if self.membership_cache is None:
+            return None
+
+        x = np.asarray(x).astype(int)
+        mf_size = 4 if self.fuzzy_type == fs.FUZZY_SETS.t1 else 8
+        pointer = 2 * self.nAnts * self.nRules
+        memberships = []
+        for ix, fuzzy_variable in enumerate(ruleBase[0].antecedents):
+            n_genes = self.n_lv_possible[ix] * mf_size
+            key = x[pointer:pointer + n_genes].tobytes()
+            pointer += n_genes
+
+            variable_memberships = self.membership_cache[ix].get(key)
+            if variable_memberships is None:
+                variable_memberships = fuzzy_variable.compute_memberships(self.X[:, ix], dtype=self.dtype, sparse=True)
+                self.membership_cache[ix].put(key, variable_memberships)
+            memberships.append(variable_memberships)
+
+        return rules.stack_antecedent_memberships(memberships, dtype=self.dtype)
+
+
+    def membership_cache_stats(self) -> dict:
+        '''
+        Returns the statistics of the membership cache, added over all the variables.
+        (With the process runner each worker fills its own cache, so only the lookups done in this process are counted)
+
+        :return: dictionary with the hits, misses, hit rate, number of cached tables and maximum number per variable. None if there is no membership cache.
+        '''
+        if self.membership_cache is None:
+            return None
+
+        hits = sum(variable_cache.hits for variable_cache in self.membership_cache)
+        misses = sum(variable_cache.misses for variable_cache in self.membership_cache)
+
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses > 0 else 0.0,
+                'size': sum(len(variable_cache) for variable_cache in self.membership_cache), 'maxsize': self.membership_cache[0].maxsize}
+
+
+    def _batch_supported(self) -> bool:
+        '''
+        Checks if the population can be scored with array operations: precomputed t1/t2 linguistic variables and the default fitness function.
+        '''
+        return self.lvs is not None and self.fuzzy_type in (fs.FUZZY_SETS.t1, fs.FUZZY_SETS.t2) and 'fitness_func' not in self.__dict__
+
+
+    def _decode_population(self, x: np.array) -> tuple[np.array, np.array, np.array, np.array, np.array]:
+        '''
+        Decodes the rules of all the individuals at once, following the same gene structure as _construct_ruleBase.
+        (The membership parameters are not decoded)
+
+        :param x: integer array population x genes.
+        :return: tuple with the antecedents (population x rules x features, -1 means dont care), the modifiers (same shape, None if they are not encoded),
+                 the consequents (population x rules), the weights (population x rules) and a boolean mask (population x rules) with the rules that are actually created.
+        '''
+        n_pop = x.shape[0]
+        ants_size = self.nAnts * self.nRules
+        fourth_pointer = 2 * ants_size
+        if self.lvs is None:
+            fourth_pointer += sum(self.n_lv_possible) * (4 if self.fuzzy_type == fs.FUZZY_SETS.t1 else 8)
+        fifth_pointer = fourth_pointer + self.nRules
+        sixth_pointer = fifth_pointer + self.nRules if self.ds_mode == 2 else fifth_pointer
+
+        chosen_ants = x[:, :ants_size].reshape((n_pop, self.nRules, self.nAnts))
+        ant_labels = x[:, ants_size:2 * ants_size].reshape((n_pop, self.nRules, self.nAnts))
+        ant_labels = np.minimum(ant_labels, np.array(self.n_lv_possible)[chosen_ants] - 1)
+
+        antecedents = -np.ones((n_pop, self.nRules, self.X.shape[1]), dtype=int)
+        if self.encode_mods:
+            modifiers = -np.ones(antecedents.shape)
+            modifier_values = np.array(list(rules.modifiers_names.keys()))
+            idx_mods = x[:, sixth_pointer:sixth_pointer + ants_size].reshape((n_pop, self.nRules, self.nAnts))
+        else:
+            modifiers = None
+
+        # Antecedents are written in gene order, so repeated variables keep the last value, as in _construct_ruleBase
+        for jx in range(self.nAnts):
+            np.put_along_axis(antecedents, chosen_ants[:, :, jx:jx+1], ant_labels[:, :, jx:jx+1], axis=2)
+            if self.encode_mods:
+                np.put_along_axis(modifiers, chosen_ants[:, :, jx:jx+1], modifier_values[idx_mods[:, :, jx:jx+1]], axis=2)
+
+        consequents = x[:, fourth_pointer:fourth_pointer + self.nRules]
+        assert np.all(consequents < self.n_classes), "Consequent class is not valid. Something in the gene is wrong."
+
+        if self.ds_mode == 2:
+            weights = x[:, fifth_pointer:fifth_pointer + self.nRules] / 100
+        else:
+            weights = np.ones((n_pop, self.nRules))
+
+        valid = (consequents != -1) & np.any(antecedents != -1, axis=2)
+
+        return antecedents, modifiers, consequents, weights, valid
+
+
+    def _population_fitness(self, x: np.array) -> np.array:
+        '''
+        Computes the fitness of all the individuals of a population with array operations.
+        Gives the same values as fitness_func applied to each individual rulebase: dominance scores,
+        rule accuracy, purge of bad rules, mcc and size terms are replicated, but only the firing
+        strengths of the distinct rules in the population are computed, and no rule objects are created.
+
+        :param x: integer array population x genes.
+        :return: array population with the fitness of each individual.
+        '''
+        n_pop = x.shape[0]
+        t2 = self.fuzzy_type == fs.FUZZY_SETS.t2
+        antecedents, modifiers, consequents, weights, valid = self._decode_population(x)
+
+        # Repeated rules in the same rulebase are only kept once (RuleBase.delete_rule_duplicates)
+        rule_keys = [np.repeat(np.arange(n_pop), self.nRules)[:, np.newaxis], consequents.reshape((-1, 1)), antecedents.reshape((n_pop * self.nRules, -1)), weights.reshape((-1, 1))]
+        if modifiers is not None:
+            rule_keys.append(modifiers.reshape((n_pop * self.nRules, -1)))
+        rule_keys = np.concatenate(rule_keys, axis=1)
+        valid_ix = np.flatnonzero(valid.ravel())
+        kept = np.zeros((n_pop * self.nRules, ), dtype=bool)
+        if len(valid_ix) > 0:
+            _, first_ix = np.unique(rule_keys[valid_ix], axis=0, return_index=True)
+            kept[valid_ix[first_ix]] = True
+        kept = kept.reshape((n_pop, self.nRules))
+
+        # Rules are sorted by consequent, keeping the gene order, as in the MasterRuleBase
+        order = np.argsort(np.where(kept, consequents, self.n_classes), axis=1, kind='stable')
+        kept = np.take_along_axis(kept, order, axis=1)
+        consequents = np.clip(np.take_along_axis(consequents, order, axis=1), 0, None)
+        weights = np.take_along_axis(weights, order, axis=1)
+        antecedents = np.take_along_axis(antecedents, order[:, :, np.newaxis], axis=1)
+        if modifiers is not None:
+            modifiers = np.take_along_axis(modifiers, order[:, :, np.newaxis], axis=1)
+
+        if not np.any(kept):
+            return np.zeros((n_pop, ))
+
+        # Firing strengths are computed once for each distinct rule in the population
+        signatures = antecedents.reshape((n_pop * self.nRules, -1))
+        if modifiers is not None:
+            signatures = np.concatenate([signatures, modifiers.reshape((n_pop * self.nRules, -1))], axis=1)
+        unique_signatures, rule_signature = np.unique(signatures[kept.ravel()], axis=0, return_inverse=True)
+        signature_ix = np.zeros((n_pop * self.nRules, ), dtype=int)
+        signature_ix[kept.ravel()] = np.ravel(rule_signature)
+        signature_ix = signature_ix.reshape((n_pop, self.nRules))
+
+        n_features = self.X.shape[1]
+        unique_modifiers = unique_signatures[:, n_features:] if modifiers is not None else None
+        if self.firing_cache is not None:
+            # Only the rules that are not in the cache (usually, the ones changed by crossover and mutation) are computed
+            firing = self.firing_cache.columns(unique_signatures, lambda missing: rules.compute_rules_firing(self._precomputed_truth, missing[:, :n_features],
+                                                                                                             missing[:, n_features:] if modifiers is not None else None))
+        else:
+            firing = rules.compute_rules_firing(self._precomputed_truth, unique_signatures[:, :n_features], unique_modifiers)
+
+        # Dominance scores for each distinct rule and consequent
+        # (In t2, both support and confidence are computed over the two iv memberships together)
+        y = np.asarray(self.y)
+        if isinstance(y[0], str):
+            y = np.unique(y, return_inverse=True)[1]
+        class_masks = np.array([np.equal(y, consequent) for consequent in range(self.n_classes)], dtype=firing.dtype)
+        class_sums = np.tensordot(class_masks, firing, axes=(1, 0))
+        if t2:
+            class_sums = np.sum(class_sums, axis=2)
+
+        support_dem = np.sum(class_masks, axis=1)[:, np.newaxis] * (2 if t2 else 1)
+        supports = np.divide(class_sums, support_dem, out=np.zeros(class_sums.shape), where=support_dem > 0)
+        confidence_dem = np.sum(firing.reshape((firing.shape[0], firing.shape[1], -1)), axis=(0, 2))
+        confidences = np.divide(class_sums, confidence_dem, out=np.zeros(class_sums.shape), where=confidence_dem != 0)
+        signature_scores = confidences * supports
+        if t2:
+            signature_scores = np.stack([signature_scores, signature_scores], axis=-1)
+
+        scores = signature_scores[consequents, signature_ix].astype(firing.dtype, copy=False)
+        mean_scores = np.mean(scores, axis=2) if t2 else scores
+        if self.ds_mode == 0:
+            rule_weights = scores
+        elif self.ds_mode == 1:
+            rule_weights = np.ones(scores.shape, dtype=firing.dtype)
+        else:
+            rule_weights = (weights[:, :, np.newaxis] if t2 else weights).astype(firing.dtype, copy=False)
+
+        # First pass: accuracy of each rule, used to purge the rulebase
+        winners = self._population_winning_rules(firing, signature_ix, rule_weights, kept)
+        preds = np.where(winners >= 0, np.take_along_axis(consequents, np.clip(winners, 0, None), axis=1), -1)
+        flat_winners = (winners + np.arange(n_pop)[:, np.newaxis] * self.nRules)[winners >= 0]
+        won = np.bincount(flat_winners, minlength=n_pop * self.nRules).reshape((n_pop, self.nRules))
+        correct_won = np.bincount(flat_winners, weights=(preds == y[np.newaxis, :])[winners >= 0], minlength=n_pop * self.nRules).reshape((n_pop, self.nRules))
+        accuracy = np.divide(correct_won, won, out=np.zeros(won.shape), where=won > 0)
+
+        purged = kept & ~(mean_scores < self.tolerance) & (accuracy != 0.0)
+        n_purged_rules = np.sum(purged, axis=1)
+        fitness = np.zeros((n_pop, ))
+        alive = n_purged_rules > 0
+        if not np.any(alive):
+            return fitness
+
+        # Second pass: classification performance of the purged rulebase
+        winners = self._population_winning_rules(firing, signature_ix[alive], rule_weights[alive], purged[alive])
+        preds = np.where(winners >= 0, np.take_along_axis(consequents[alive], np.clip(winners, 0, None), axis=1), -1)
+        score_acc = evr.matthews_corrcoef_batch(y, preds)
+
+        # Size terms. They are zero if some consequent has no rules.
+        all_classes = np.all(np.array([np.any(purged[alive] & (consequents[alive] == consequent), axis=1) for consequent in range(self.n_classes)]), axis=0)
+        relevant = purged[alive] & (mean_scores[alive] > self.tolerance)
+        n_antecedents = np.sum(antecedents[alive] != -1, axis=2)
+        possible_rule_size = np.sum(relevant, axis=1) * n_features
+        effective_rule_size = np.sum(n_antecedents * relevant, axis=1)
+        score_rules_size = np.divide(effective_rule_size, possible_rule_size, out=np.ones(possible_rule_size.shape), where=possible_rule_size > 0)
+        score_rules_size = np.where(all_classes & (possible_rule_size > 0), 1 - score_rules_size, 0.0)
+        score_nrules = np.where(all_classes, np.sum(relevant, axis=1) / n_purged_rules[alive], 0.0)
+
+        fitness[alive] = score_acc + score_rules_size * self.alpha_ + score_nrules * self.beta_
+
+        return fitness
+
+
+    def _population_winning_rules(self, firing: np.array, signature_ix: np.array, rule_weights: np.array, active: np.array) -> np.array:
+        '''
+        Computes the winning rule of each individual for each sample.
+        The association degrees are computed over a (population, samples, rules) tensor, split in chunks to bound the memory used.
+
+        :param firing: firing strengths of the distinct rules. Shape samples x distinct rules (x 2)
+        :param signature_ix: index of the distinct rule used by each rule of each individual. Shape population x rules
+        :param rule_weights: weight of each rule in the association degree. Shape population x rules (x 2)
+        :param active: boolean mask population x rules with the rules present in each rulebase.
+        :return: integer array population x samples with the winning rule index (-1 if unknown and allow_unknown).
+        '''
+        n_pop = signature_ix.shape[0]
+        sample_size = int(np.prod(firing.shape)) // max(firing.shape[1], 1) * self.nRules
+        chunk = max(1, FitRuleBase._batch_max_elements // max(sample_size, 1))
+
+        winners = np.zeros((n_pop, firing.shape[0]), dtype=int)
+        for start in range(0, n_pop, chunk):
+            end = min(start + chunk, n_pop)
+            association_degrees = np.moveaxis(firing[:, signature_ix[start:end]], 0, 1) * rule_weights[start:end, np.newaxis]
+            if association_degrees.ndim == 4:
+                association_degrees = np.mean(association_degrees, axis=3)
+
+            association_degrees = np.where(active[start:end, np.newaxis, :], association_degrees, -1.0)
+            chunk_winners = np.argmax(association_degrees, axis=2)
+            if self.allow_unknown:
+                chunk_winners[np.max(association_degrees, axis=2) == 0] = -1
+
+            winners[start:end] = chunk_winners
+
+        return winners
     
 
     def fitness_func(self, ruleBase: rules.RuleBase, X:np.array, y:np.array, tolerance:float, alpha:float=0.0, beta:float=0.0, precomputed_truth:np.array=None) -> float:
@@ -1062,7 +1956,7 @@ class FitRuleBase(Problem):
         :return: float. Fitness value.
         '''
         if precomputed_truth is None:
-            precomputed_truth = rules.compute_antecedents_memberships(ruleBase.antecedents, X)
+            precomputed_truth = rules.compute_antecedents_memberships(ruleBase.antecedents, X, dtype=self.dtype)
 
         ev_object = evr.evalRuleBase(ruleBase, X, y, precomputed_truth=precomputed_truth)
         ev_object.add_full_evaluation()
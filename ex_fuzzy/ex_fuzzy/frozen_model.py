@@ -0,0 +1,298 @@
+"""
+Frozen (compiled) version of a fitted rule base, to be used for fast inference.
+
+A frozen model stores all the information needed to predict in contiguous arrays: trapezoid parameters for each linguistic variable,
+the antecedent and modifier matrices of the rules, the rule weights and the consequents. Predicting does not traverse
+the fuzzy set or rule objects, and gives the same outputs as the MasterRuleBase it was created from.
+
+"""
+import numpy as np
+
+import numbers
+
+try:
+    from . import fuzzy_sets as fs
+    from . import rules
+    from . import kernels
+except ImportError:
+    import fuzzy_sets as fs
+    import rules
+    import kernels
+
+
+_epsilon = 10E-5 # Same value as the default one in fuzzy_sets.trapezoidal_membership
+
+
+def _trapezoid_table(fuzzy_variables: list[fs.fuzzyVariable], max_labels: int, parameter_name: str) -> np.array:
+    '''
+    Returns the trapezoid parameters of all the fuzzy sets of the variables, with the same corrections that
+    fuzzy_sets.trapezoidal_membership applies before computing the memberships.
+
+    :param fuzzy_variables: list of fuzzy variables.
+    :param max_labels: maximum number of linguistic variables in a fuzzy variable.
+    :param parameter_name: name of the attribute with the trapezoid parameters in the fuzzy sets.
+    :return: array of shape variables x labels x 5 (a, b, c, d, kind). kind is 1 for singletons and 0 otherwise. Unused positions are zeros.
+    '''
+    res = np.zeros((len(fuzzy_variables), max_labels, 5))
+    for ix, fuzzy_variable in enumerate(fuzzy_variables):
+        for jx, fuzzy_set in enumerate(fuzzy_variable):
+            if not hasattr(fuzzy_set, parameter_name):
+                continue
+
+            a, b, c, d = getattr(fuzzy_set, parameter_name)
+            singleton = a == d
+            if b == a:
+                b += _epsilon
+            if c == d:
+                d += _epsilon
+
+            res[ix, jx] = [a, b, c, d, singleton]
+
+    return res
+
+
+def _trapezoid_memberships(x: np.array, table: np.array) -> np.array:
+    '''
+    Computes the trapezoid memberships of all the fuzzy sets at once.
+
+    :param x: array of shape variables x samples.
+    :param table: array returned by _trapezoid_table.
+    :return: array of shape variables x labels x samples.
+    '''
+    x = x[:, np.newaxis, :]
+    a, b, c, d, kind = [table[:, :, ix, np.newaxis] for ix in range(5)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aux1 = (x - a) / (b - a)
+        aux2 = (d - x) / (d - c)
+        res = np.clip(np.minimum(aux1, aux2), 0.0, 1.0)
+
+    return np.where(kind == 1, np.equal(x, a).astype(float), res)
+
+
+class FrozenRuleModel():
+    '''
+    Inference only version of a MasterRuleBase that uses contiguous arrays instead of python objects.
+    Supports t1 and iv fuzzy sets with trapezoidal or categorical memberships.
+    '''
+
+    def __init__(self, master_rule_base: rules.MasterRuleBase) -> None:
+        '''
+        Flattens a fitted master rule base. (Dominance scores must have been already computed if ds_mode is 0)
+
+        :param master_rule_base: MasterRuleBase to freeze.
+        '''
+        fuzzy_type = master_rule_base.fuzzy_type()
+        if fuzzy_type not in (fs.FUZZY_SETS.t1, fs.FUZZY_SETS.t2):
+            raise ValueError('Only t1 and t2 rule bases can be frozen.')
+        # The fuzzy type is stored as a boolean so that the model can be pickled without the FUZZY_SETS enum
+        self.iv = fuzzy_type == fs.FUZZY_SETS.t2
+
+        fuzzy_variables = master_rule_base.antecedents
+        for rule_base in master_rule_base.get_rulebases():
+            same_variables = len(rule_base.antecedents) == len(fuzzy_variables) and all(a is b for a, b in zip(rule_base.antecedents, fuzzy_variables))
+            if len(rule_base) > 0 and not same_variables:
+                raise ValueError('All the rule bases must share the same fuzzy variables to be frozen.')
+
+        if self.iv:
+            trapezoid_class, categorical_class = fs.IVFS, fs.categoricalIVFS
+        else:
+            trapezoid_class, categorical_class = fs.FS, fs.categoricalFS
+
+        self.n_labels = np.array([len(fuzzy_variable) for fuzzy_variable in fuzzy_variables], dtype=int)
+        max_labels = int(np.max(self.n_labels))
+        self.categories = {}
+        lower_heights = np.ones((len(fuzzy_variables), max_labels))
+        for ix, fuzzy_variable in enumerate(fuzzy_variables):
+            for jx, fuzzy_set in enumerate(fuzzy_variable):
+                if type(fuzzy_set) is categorical_class:
+                    self.categories[(ix, jx)] = fuzzy_set.category
+                elif type(fuzzy_set) is trapezoid_class:
+                    if self.iv:
+                        lower_heights[ix, jx] = fuzzy_set.lower_height
+                else:
+                    raise ValueError('Fuzzy set ' + str(fuzzy_set.name) + ' can not be frozen: only trapezoidal and categorical sets are supported.')
+
+        self.label_mask = np.arange(max_labels)[np.newaxis, :] < self.n_labels[:, np.newaxis]
+        if self.iv:
+            self.lower_trapezoids = _trapezoid_table(fuzzy_variables, max_labels, 'secondMF_lower')
+            self.upper_trapezoids = _trapezoid_table(fuzzy_variables, max_labels, 'secondMF_upper')
+            self.lower_heights = lower_heights
+        else:
+            self.trapezoids = _trapezoid_table(fuzzy_variables, max_labels, 'membership_parameters')
+
+        # Tables for the fused kernels: categories are stored as kind 2 sets (only if they are numbers)
+        tables = [self.lower_trapezoids, self.upper_trapezoids] if self.iv else [self.trapezoids]
+        if all(isinstance(category, numbers.Number) for category in self.categories.values()):
+            self.fused_tables = np.stack(tables)
+            for (ix, jx), category in self.categories.items():
+                self.fused_tables[:, ix, jx] = [category, 0.0, 0.0, 0.0, 2]
+            self.fused_heights = np.stack([lower_heights, np.ones(lower_heights.shape)]) if self.iv else np.ones((1, ) + lower_heights.shape)
+        else:
+            self.fused_tables = None
+            self.fused_heights = None
+
+        # Each rule base is kept as a block, so that the firing strengths are computed exactly as in the rule base objects
+        self.antecedents = []
+        self.modifiers = []
+        self.tnorms = []
+        for rule_base in master_rule_base.get_rulebases():
+            if len(rule_base) > 0:
+                antecedent_matrix, modifiers_matrix = rule_base._rules_matrices()
+                self.antecedents.append(np.ascontiguousarray(antecedent_matrix))
+                self.modifiers.append(modifiers_matrix)
+                self.tnorms.append(rule_base.tnorm)
+        self.tnorm_codes = [kernels.tnorm_code(tnorm) for tnorm in self.tnorms]
+
+        self.consequents = master_rule_base._consequents_index().copy()
+        if len(self.consequents) == 0:
+            raise rules.RuleError('No rules to predict!')
+
+        self.consequent_names = list(master_rule_base.consequent_names)
+        self.ds_mode = master_rule_base.ds_mode
+        self.allow_unknown = master_rule_base.allow_unknown
+
+        if self.ds_mode == 0:
+            self.rule_weights = master_rule_base.get_scores()
+            if self.iv and len(self.rule_weights.shape) == 1:
+                self.rule_weights = self.rule_weights[None, :, None]
+        elif self.ds_mode == 2:
+            self.rule_weights = master_rule_base.get_weights()
+            if self.iv:
+                self.rule_weights = self.rule_weights[None, :, None]
+        else:
+            self.rule_weights = None
+
+
+    def compute_memberships(self, X: np.array) -> np.array:
+        '''
+        Computes the memberships of the samples to all the linguistic variables.
+
+        :param X: array samples x features.
+        :return: array with the layout of rules.stack_antecedent_memberships.
+        '''
+        x = np.asarray(X).T
+        if self.iv:
+            lower = _trapezoid_memberships(x, self.lower_trapezoids) * self.lower_heights[:, :, np.newaxis]
+            upper = _trapezoid_memberships(x, self.upper_trapezoids)
+            memberships = np.stack([lower, upper], axis=-1)
+        else:
+            memberships = _trapezoid_memberships(x, self.trapezoids)
+
+        for (ix, jx), category in self.categories.items():
+            category_membership = np.equal(x[ix], category).astype(float)
+            memberships[ix, jx] = category_membership[:, np.newaxis] if self.iv else category_membership
+
+        mask = self.label_mask.reshape(self.label_mask.shape + (1, ) * (memberships.ndim - 2))
+        memberships = np.where(mask, memberships, 0.0)
+        # Neutral slot for the don't care antecedents
+        neutral = np.ones((memberships.shape[0], 1) + memberships.shape[2:])
+
+        return np.concatenate([memberships, neutral], axis=1)
+
+
+    def compute_firing_strenghts(self, X: np.array) -> np.array:
+        '''
+        Computes the firing strength of each rule for each sample.
+
+        :param X: array samples x features.
+        :return: array samples x rules (x 2)
+        '''
+        X = np.asarray(X)
+        if kernels.use_numba() and self.fused_tables is not None and min(self.tnorm_codes) >= 0 and X.dtype.kind in 'biuf':
+            # Memberships, modifiers and t-norm in one pass
+            firing_strengths = [kernels.fused_rules_firing(X, self.fused_tables, self.fused_heights, antecedents, modifiers, tnorm_code)
+                                for antecedents, modifiers, tnorm_code in zip(self.antecedents, self.modifiers, self.tnorm_codes)]
+            firing_strengths = np.concatenate(firing_strengths, axis=1)
+
+            return firing_strengths if self.iv else firing_strengths[:, :, 0]
+
+        memberships = self.compute_memberships(X)
+        firing_strengths = [rules.compute_rules_firing(memberships, antecedents, modifiers, tnorm) for antecedents, modifiers, tnorm in zip(self.antecedents, self.modifiers, self.tnorms)]
+
+        return np.concatenate(firing_strengths, axis=1)
+
+
+    def compute_association_degrees(self, X: np.array) -> np.array:
+        '''
+        Computes the association degree of each rule for each sample.
+
+        :param X: array samples x features.
+        :return: array samples x rules.
+        '''
+        firing_strengths = self.compute_firing_strenghts(X)
+        if self.rule_weights is None:
+            association_degrees = firing_strengths
+        else:
+            association_degrees = self.rule_weights * firing_strengths
+
+        if self.iv:
+            association_degrees = np.mean(association_degrees, axis=2)
+
+        return association_degrees
+
+
+    def predict(self, X: np.array, out_class_names=False) -> np.array:
+        '''
+        Returns the predicted class for each sample.
+
+        :param X: array samples x features. (It can also be a pandas dataframe)
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :return: array with the predicted class for each sample.
+        '''
+        try:
+            X = X.values  # If X was a pandas dataframe
+        except AttributeError:
+            pass
+
+        return self._predict_from_degrees(self.compute_association_degrees(X), out_class_names)
+
+
+    def _predict_from_degrees(self, association_degrees: np.array, out_class_names=False) -> np.array:
+        '''
+        Returns the predicted class for each sample from the association degrees of the rules.
+
+        :param association_degrees: array samples x rules.
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :return: array with the predicted class for each sample.
+        '''
+        winning_rules = np.argmax(association_degrees, axis=1)
+        if self.allow_unknown:
+            # If there is no rule that fires, we set the consequent to -1
+            winning_rules[np.max(association_degrees, axis=1) == 0] = -1
+
+        if out_class_names:
+            names = self.consequent_names + (['Unknown'] if np.any(winning_rules == -1) else [])
+            return np.array(names)[np.append(self.consequents, len(names) - 1)[winning_rules]]
+        else:
+            return np.append(self.consequents, -1).astype(np.float64)[winning_rules]
+
+
+    def iter_predict(self, X, chunk_size: int=10000, out_class_names=False, return_association_degrees=False):
+        '''
+        Predicts the samples chunk by chunk. The memory used is bounded by the chunk size, not by the number of samples.
+
+        :param X: array samples x features, path to a .npy file (it is memory mapped), pandas dataframe or iterable of arrays/dataframes.
+        :param chunk_size: maximum number of samples predicted at once.
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :param return_association_degrees: if True, the association degrees (chunk samples x rules) are also returned.
+        :return: generator with the predictions of each chunk (and the association degrees if return_association_degrees).
+        '''
+        for chunk in rules.iter_chunks(X, chunk_size):
+            association_degrees = self.compute_association_degrees(chunk)
+            predictions = self._predict_from_degrees(association_degrees, out_class_names)
+
+            if return_association_degrees:
+                yield predictions, association_degrees
+            else:
+                yield predictions
+
+
+    def __call__(self, X: np.array) -> np.array:
+        '''
+        Gives the prediction for each sample (same as predict)
+
+        :param X: array samples x features.
+        :return: array with the predicted class for each sample.
+        '''
+        return self.predict(X)
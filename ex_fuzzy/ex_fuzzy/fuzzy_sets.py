@@ -3,23 +3,40 @@ This is a the source file that contains the class of GT2 fuzzy set and its most
 like computing the FM function, etc.
 
 """
+import sys
 import enum
+import importlib.util
 from typing import Generator
 
 import numpy as np
-import pandas as pd
 
 try:
     from . import maintenance as mnt
+    from . import kernels
 except:
     import maintenance as mnt
+    import kernels
 
-# You dont require torch to use this module, however, we need to import it to give support in case you feed these methods with torch tensors.
-try:
-    import torch
-    torch_available = True
-except:
-    torch_available = False
+# You dont require torch or pandas to use this module, but these methods support their tensors and series.
+# They are not imported here, so that loading the module stays cheap: if they have not been imported yet, x can not be one of their objects.
+torch_available = importlib.util.find_spec('torch') is not None
+
+
+def _torch(x):
+    '''
+    Returns the torch module if x is a torch tensor, None otherwise.
+    '''
+    torch = sys.modules.get('torch')
+    if torch is not None and isinstance(x, torch.Tensor):
+        return torch
+
+
+def _is_series(x) -> bool:
+    '''
+    Checks if x is a pandas series.
+    '''
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(x, pd.Series)
 
 
 ''' Enum that defines the fuzzy set types.'''
@@ -33,6 +50,84 @@ class FUZZY_SETS(enum.Enum):
         return self.value == __value.value
 
 
+    def __hash__(self) -> int:
+        # Same hash as the members of the enums that extend this one (temporal, utils.extend_fuzzy_sets_enum), which compare equal to them
+        return hash(self._name_)
+
+
+_default_dtype = np.dtype(np.float64)
+
+
+def set_default_dtype(dtype) -> None:
+    '''
+    Sets the floating point type of the memberships, firing strengths and association degrees.
+    float32 uses half the memory, and it is precise enough for classification. (Models can also set their own dtype)
+
+    :param dtype: numpy floating point type. (np.float32 or np.float64)
+    '''
+    global _default_dtype
+
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError('The dtype must be a floating point type, got ' + str(dtype))
+
+    _default_dtype = dtype
+
+
+def get_default_dtype() -> np.dtype:
+    '''
+    Returns the floating point type used for the memberships, firing strengths and association degrees.
+
+    :return: numpy dtype.
+    '''
+    return _default_dtype
+
+
+class categoricalMemberships():
+    '''
+    Memberships of a categorical variable, stored as the index of the category of each sample instead of one dense array per category.
+    It behaves as the list returned by fuzzyVariable.compute_memberships: the dense membership of a category is only computed when it is accessed.
+    '''
+
+    def __init__(self, codes: np.array, n_labels: int, iv: bool=False, dtype=None) -> None:
+        '''
+        :param codes: integer array with the index of the category of each sample (-1 if it does not belong to any).
+        :param n_labels: number of categories.
+        :param iv: if True, the dense memberships have the iv shape (samples x 2).
+        :param dtype: floating point type of the dense memberships. If None, the default one is used.
+        '''
+        self.codes = codes
+        self.n_labels = n_labels
+        self.iv = iv
+        self.dtype = _default_dtype if dtype is None else np.dtype(dtype)
+
+
+    def __len__(self) -> int:
+        return self.n_labels
+
+
+    def __getitem__(self, label: int) -> np.array:
+        '''
+        Returns the dense membership of the samples to a category.
+
+        :param label: index of the category.
+        :return: array samples (x 2 if iv).
+        '''
+        if label < 0:
+            label += self.n_labels
+        if label < 0 or label >= self.n_labels:
+            raise IndexError('Category index out of range')
+
+        res = np.equal(self.codes, label).astype(self.dtype)
+
+        return np.stack([res, res], axis=-1) if self.iv else res
+
+
+    def __iter__(self):
+        for label in range(self.n_labels):
+            yield self[label]
+
+
 def trapezoidal_membership(x: np.array, params: list[float], epsilon=10E-5) -> np.array:
     '''
     Trapezoidal membership functions.
@@ -48,9 +143,9 @@ def trapezoidal_membership(x: np.array, params: list[float], epsilon=10E-5) -> n
         # If they are numpy arrays, we need to use the numpy function
         if isinstance(x, np.ndarray):
             return np.equal(x, a).astype(float)
-        if torch_available:
-            if isinstance(x, torch.Tensor):
-                return torch.eq(x, a).float()
+        torch = _torch(x)
+        if torch is not None:
+            return torch.eq(x, a).float()
             
 
     if b == a:
@@ -58,19 +153,20 @@ def trapezoidal_membership(x: np.array, params: list[float], epsilon=10E-5) -> n
     if c == d:
         d += epsilon
 
+    if kernels.use_numba() and isinstance(x, np.ndarray) and x.dtype == np.float64:
+        return kernels.trapezoid(x, a, b, c, d)
+
     aux1 = (x - a) / (b - a)
     aux2 = (d - x) / (d - c)
-    try:
-        if isinstance(x, torch.Tensor):
-            return torch.clamp(torch.min(aux1, aux2), 0.0, 1.0) 
-    except NameError:
-        pass
+    torch = _torch(x)
+    if torch is not None:
+        return torch.clamp(torch.min(aux1, aux2), 0.0, 1.0)
 
     if isinstance(x, np.ndarray):
         return np.clip(np.minimum(aux1, aux2), 0.0, 1.0)        
     elif isinstance(x, list):
         return [np.clip(min(aux1, aux2), 0.0, 1.0) for elem in x]
-    elif isinstance(x, pd.Series):
+    elif _is_series(x):
         return np.clip(np.minimum(aux1, aux2), 0.0, 1.0)
     else: # Single value
         return np.clip(min(aux1, aux2), 0.0, 1.0)
@@ -175,13 +271,13 @@ class categoricalFS(FS):
         '''
         if isinstance(x, np.ndarray):
             res = np.equal(x, self.category).astype(float)
-        elif isinstance(x, torch.Tensor):
-            res = torch.eq(x, self.category).float()
+        elif _torch(x) is not None:
+            res = _torch(x).eq(x, self.category).float()
         elif isinstance(x, list):
             res = [1.0 if elem == self.category else 0.0 for elem in x]
         elif isinstance(x, float) or isinstance(x, int):
             res = 1.0 if x == self.category else 0.0
-        elif isinstance(x, pd.Series):
+        elif _is_series(x):
             res = x.apply(lambda elem: 1.0 if elem == self.category else 0.0)
             
         return res
@@ -302,16 +398,16 @@ class categoricalIVFS(IVFS):
         if isinstance(x, np.ndarray):
             res = np.equal(x, self.category).astype(float)
             res = np.stack([res, res], axis=-1)
-        elif isinstance(x, torch.Tensor):
-            res = torch.eq(x, self.category).float()
-            res = torch.stack([res, res], axis=-1)
+        elif _torch(x) is not None:
+            res = _torch(x).eq(x, self.category).float()
+            res = _torch(x).stack([res, res], axis=-1)
         elif isinstance(x, list):
             res = [1.0 if elem == self.category else 0.0 for elem in x]
             res = np.stack([res, res], axis=-1)
         elif isinstance(x, float) or isinstance(x, int):
             res = 1.0 if x == self.category else 0.0
             res = np.array([res, res])
-        elif isinstance(x, pd.Series):
+        elif _is_series(x):
             res = x.apply(lambda elem: 1.0 if elem == self.category else 0.0)
             res = np.stack([res, res], axis=-1)
         
@@ -405,6 +501,32 @@ class GT2(FS):
 
             self.iv_secondary_memberships[alpha_cut] = array_level_memberships
 
+        self._build_lookup_tables()
+
+
+    def _build_lookup_tables(self) -> None:
+        '''
+        Builds the lookup tables of the memberships: one contiguous table (domain points x alpha_cuts x 2) with the alpha cut
+        intervals, and another one (domain points x 2) with the alpha reduction already applied.
+        '''
+        self.alpha_table = np.ascontiguousarray(np.stack([self.iv_secondary_memberships[alpha] for alpha in self.alpha_cuts], axis=1))
+        alpha_weights = np.array(self.alpha_cuts) / np.sum(self.alpha_cuts)
+        self.reduced_table = np.ascontiguousarray(np.sum(alpha_weights[np.newaxis, :, np.newaxis] * self.alpha_table, axis=1))
+
+
+    def _domain_indexes(self, x: np.array) -> np.array:
+        '''
+        Locates the inputs in the lookup tables. Inputs out of the domain take the value of the closest end of the domain.
+
+        :param x: input values in the fuzzy set referencial domain.
+        :return: indexes of the rows of the lookup tables.
+        '''
+        if not hasattr(self, 'alpha_table'): # Sets pickled before the lookup tables existed
+            self._build_lookup_tables()
+
+        formatted_x = (np.asarray(x) * 10**self.significant_decimals).astype(int) - self.domain_init
+        return np.clip(formatted_x, 0, self.alpha_table.shape[0] - 1)
+
 
     def membership(self, x: np.array) -> np.array:
         '''
@@ -413,22 +535,18 @@ class GT2(FS):
         :param x: input values in the fuzzy set referencial domain.
         :return: np array samples x alpha_cuts x 2
         '''
-        x = np.array(x)
-        # locate the x in the secondary membership
-        formatted_x = (
-            x * 10**self.significant_decimals).astype(int) - self.domain_init
+        return self.alpha_table[self._domain_indexes(x)]
 
-        # Once the x is located we compute the function for each alpha cut
-        alpha_cut_memberships = []
-        for ix, alpha in enumerate(self.alpha_cuts):
-            ivfs = np.squeeze(
-                np.array(self.iv_secondary_memberships[alpha][formatted_x]))
-            alpha_cut_memberships.append(np.squeeze(ivfs))
 
-        alpha_cut_memberships = np.array(alpha_cut_memberships)
+    def reduced_membership(self, x: np.array) -> np.array:
+        '''
+        Computes the alpha reduction of the memberships of a point, without computing the memberships of each alpha cut.
+        (Same as alpha_reduction(membership(x)))
 
-        # So that the result is samples x alpha_cuts x 2
-        return np.swapaxes(alpha_cut_memberships, 0, 1)
+        :param x: input values in the fuzzy set referencial domain.
+        :return: np array samples x 2
+        '''
+        return self.reduced_table[self._domain_indexes(x)]
 
 
     def type(self) -> FUZZY_SETS:
@@ -439,15 +557,11 @@ class GT2(FS):
         '''
         Computes the type reduction to reduce the alpha cuts to one value.
 
-        :param x: array with the values of the inputs.
-        :return: array with the memberships of the consequents for each sample.
+        :param x: array with the alpha cut memberships (samples x alpha_cuts x 2, or alpha_cuts x 2 for one point).
+        :return: array with the iv memberships for each sample.
         '''
-        if len(x.shape) == 3:
-            formatted = np.expand_dims(np.expand_dims(
-                np.array(self.alpha_cuts), axis=1), axis=0)
-        else:
-            formatted = self.alpha_cuts
-        return np.sum(formatted * x, axis=-1) / np.sum(self.alpha_cuts)
+        alpha_weights = np.array(self.alpha_cuts)[:, np.newaxis] / np.sum(self.alpha_cuts)
+        return np.sum(alpha_weights * x, axis=-2)
     
 
     def alpha_reduction(self, x) -> np.array:
@@ -557,21 +671,66 @@ class fuzzyVariable():
         return self.linguistic_variables
 
 
-    def compute_memberships(self, x: np.array) -> list:
+    def compute_memberships(self, x: np.array, dtype=None, sparse=False) -> list:
         '''
         Computes the membership to each of the FS in the fuzzy variables.
 
         :param x: numeric value or array. Computes the membership to each of the FS in the fuzzy variables.
+        :param dtype: floating point type of the membership arrays. If None, the default one is used. (See set_default_dtype)
+        :param sparse: if True and the variable is categorical, a categoricalMemberships object is returned instead of one dense array per category.
         :return: list of floats. Membership to each of the FS in the fuzzy variables.
         '''
         res = []
+        dtype = _default_dtype if dtype is None else np.dtype(dtype)
+
+        if sparse and isinstance(x, np.ndarray) and self.is_categorical():
+            return categoricalMemberships(self.compute_categorical_codes(x), len(self), self.fs_type == FUZZY_SETS.t2, dtype)
 
         for fuzzy_set in self.linguistic_variables:
-            res.append(fuzzy_set.membership(x))
+            membership = fuzzy_set.membership(x)
+            if isinstance(membership, np.ndarray) and membership.dtype.kind == 'f':
+                membership = membership.astype(dtype, copy=False)
+            res.append(membership)
 
         return res
 
 
+    def is_categorical(self) -> bool:
+        '''
+        Returns True if all the fuzzy sets of the variable are categorical sets of different categories.
+
+        :return: bool.
+        '''
+        categorical = all(type(fuzzy_set) in (categoricalFS, categoricalIVFS) for fuzzy_set in self.linguistic_variables)
+        if not categorical:
+            return False
+
+        try:
+            return len(set(fuzzy_set.category for fuzzy_set in self.linguistic_variables)) == len(self)
+        except TypeError:
+            # Unhashable categories
+            return False
+
+
+    def compute_categorical_codes(self, x: np.array) -> np.array:
+        '''
+        Computes the index of the fuzzy set whose category is equal to each value. (Only for categorical variables)
+
+        :param x: array with the values of the variable.
+        :return: integer array with the same shape as x. -1 if the value does not belong to any category.
+        '''
+        category_index = {fuzzy_set.category: ix for ix, fuzzy_set in enumerate(self.linguistic_variables)}
+        try:
+            values, inverse = np.unique(x, return_inverse=True)
+        except TypeError:
+            # Values that can not be sorted
+            return np.array([category_index.get(value, -1) for value in np.ravel(x)], dtype=np.int64).reshape(np.shape(x))
+
+        value_codes = np.array([category_index.get(value, -1) for value in values], dtype=np.int64)
+
+        return value_codes[inverse].reshape(np.shape(x))
+
+
     def domain(self) -> list[float]:
         '''
         Returns the domain of the fuzzy variable.
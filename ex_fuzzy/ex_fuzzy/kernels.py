@@ -0,0 +1,269 @@
+"""
+Optional accelerated kernels for the membership and t-norm computations.
+
+If numba is installed, the kernels are compiled and used by default. They fuse the trapezoid membership, the modifier exponent
+and the product/minimum t-norm in one pass per sample, without intermediate arrays. Otherwise (or after calling set_backend('numpy'))
+the numpy implementations are used. Both backends give the same results, except for the rules with modifiers:
+numpy uses a vectorized power function that can differ in the last bit from the scalar one used by the kernels.
+
+"""
+import numpy as np
+
+# You dont require numba to use this module, but if it is available the kernels are compiled.
+try:
+    import numba
+    numba_available = True
+except ImportError:
+    numba_available = False
+
+
+_backend = 'numba' if numba_available else 'numpy'
+
+
+def set_backend(backend: str) -> None:
+    '''
+    Sets the backend used to compute the memberships and the rule firing strengths.
+
+    :param backend: 'numba' or 'numpy'.
+    '''
+    global _backend
+
+    if backend not in ('numba', 'numpy'):
+        raise ValueError('Unknown backend: ' + str(backend) + '. Use "numba" or "numpy".')
+    if backend == 'numba' and not numba_available:
+        raise ValueError('The numba backend requires numba to be installed.')
+
+    _backend = backend
+
+
+def get_backend() -> str:
+    '''
+    Returns the backend used to compute the memberships and the rule firing strengths.
+
+    :return: 'numba' or 'numpy'.
+    '''
+    return _backend
+
+
+def use_numba() -> bool:
+    '''
+    Returns True if the numba kernels are being used.
+    '''
+    return _backend == 'numba'
+
+
+def tnorm_code(tnorm) -> int:
+    '''
+    Returns the code of the t-norm for the kernels.
+
+    :param tnorm: t-norm function.
+    :return: 0 for the product, 1 for the minimum and -1 if the t-norm is not supported by the kernels.
+    '''
+    if tnorm is np.prod:
+        return 0
+    elif tnorm is np.min or tnorm is np.amin:
+        return 1
+    else:
+        return -1
+
+
+def _clipped_minimum(aux1: float, aux2: float) -> float:
+    '''
+    Same as np.clip(np.minimum(aux1, aux2), 0.0, 1.0) for scalars.
+    '''
+    if aux1 != aux1 or aux2 != aux2:
+        return np.nan
+
+    res = aux1 if aux1 <= aux2 else aux2
+    if res < 0.0:
+        return 0.0
+    elif res > 1.0:
+        return 1.0
+    else:
+        return res
+
+
+def _trapezoid_kernel(x: np.array, a: float, b: float, c: float, d: float, out: np.array) -> None:
+    '''
+    Trapezoid membership of a vector. (The singleton and epsilon corrections must be already applied)
+    '''
+    for ix in range(x.shape[0]):
+        out[ix] = _clipped_minimum((x[ix] - a) / (b - a), (d - x[ix]) / (d - c))
+
+
+def _set_membership(x: float, parameters: np.array) -> float:
+    '''
+    Membership of a value to a fuzzy set given as a row of a membership table. (a, b, c, d, kind)
+    kind is 0 for trapezoids, 1 for singletons and 2 for categories (the category is stored in a).
+    '''
+    kind = parameters[4]
+    if kind == 0:
+        return _clipped_minimum((x - parameters[0]) / (parameters[1] - parameters[0]), (parameters[3] - x) / (parameters[3] - parameters[2]))
+    else:
+        return 1.0 if x == parameters[0] else 0.0
+
+
+def _combine(acc: float, membership: float, tnorm: int) -> float:
+    '''
+    Combines a membership with the accumulated t-norm value.
+    '''
+    if tnorm == 0:
+        return acc * membership
+    elif membership < acc or membership != membership:
+        return membership
+    else:
+        return acc
+
+
+def _rules_firing_kernel(stacked_memberships: np.array, antecedents: np.array, modifiers: np.array, tnorm: int, n_slots: int, out: np.array) -> None:
+    '''
+    Firing strengths from the stacked memberships. stacked_memberships has shape features x labels x samples x k,
+    and out samples x rules x k.
+    '''
+    n_rules, n_features = antecedents.shape
+    for sx in range(out.shape[0]):
+        for rx in range(n_rules):
+            for kx in range(out.shape[2]):
+                acc = 1.0
+                n_active = 0
+                for fx in range(n_features):
+                    label = antecedents[rx, fx]
+                    if label < 0:
+                        continue
+
+                    membership = stacked_memberships[fx, label, sx, kx]
+                    if modifiers[rx, fx] != -1:
+                        membership = membership ** modifiers[rx, fx]
+                    acc = membership if n_active == 0 else _combine(acc, membership, tnorm)
+                    n_active += 1
+
+                if n_active == 0:
+                    out[sx, rx, kx] = 0.0
+                else:
+                    if n_active < n_slots:
+                        # Neutral padding of the numpy implementation
+                        acc = _combine(acc, 1.0, tnorm)
+                    out[sx, rx, kx] = acc
+
+
+def _fused_firing_kernel(X: np.array, tables: np.array, heights: np.array, antecedents: np.array, modifiers: np.array, tnorm: int, n_slots: int, out: np.array) -> None:
+    '''
+    Firing strengths directly from the inputs: the memberships are computed when needed, and they are not stored.
+    tables has shape k x features x labels x 5, heights k x features x labels, and out samples x rules x k.
+    '''
+    n_rules, n_features = antecedents.shape
+    for sx in range(X.shape[0]):
+        for rx in range(n_rules):
+            for kx in range(out.shape[2]):
+                acc = 1.0
+                n_active = 0
+                for fx in range(n_features):
+                    label = antecedents[rx, fx]
+                    if label < 0:
+                        continue
+
+                    membership = _set_membership(X[sx, fx], tables[kx, fx, label])
+                    if tables[kx, fx, label, 4] != 2:
+                        membership = membership * heights[kx, fx, label]
+                    if modifiers[rx, fx] != -1:
+                        membership = membership ** modifiers[rx, fx]
+                    acc = membership if n_active == 0 else _combine(acc, membership, tnorm)
+                    n_active += 1
+
+                if n_active == 0:
+                    out[sx, rx, kx] = 0.0
+                else:
+                    if n_active < n_slots:
+                        acc = _combine(acc, 1.0, tnorm)
+                    out[sx, rx, kx] = acc
+
+
+if numba_available:
+    _clipped_minimum = numba.njit(cache=True)(_clipped_minimum)
+    _set_membership = numba.njit(cache=True)(_set_membership)
+    _combine = numba.njit(cache=True)(_combine)
+    _trapezoid_kernel = numba.njit(cache=True)(_trapezoid_kernel)
+    _rules_firing_kernel = numba.njit(cache=True)(_rules_firing_kernel)
+    _fused_firing_kernel = numba.njit(cache=True)(_fused_firing_kernel)
+
+
+def trapezoid(x: np.array, a: float, b: float, c: float, d: float) -> np.array:
+    '''
+    Computes the trapezoid membership of an array. (The singleton and epsilon corrections must be already applied)
+
+    :param x: float64 array with any shape.
+    :param a: start of the trapezoid.
+    :param b: start of the plateau.
+    :param c: end of the plateau.
+    :param d: end of the trapezoid.
+    :return: array with the same shape as x.
+    '''
+    if use_numba():
+        flat_x = np.ascontiguousarray(x).reshape(-1)
+        res = np.empty(flat_x.shape)
+        _trapezoid_kernel(flat_x, float(a), float(b), float(c), float(d), res)
+
+        return res.reshape(np.shape(x))
+    else:
+        aux1 = (x - a) / (b - a)
+        aux2 = (d - x) / (d - c)
+
+        return np.clip(np.minimum(aux1, aux2), 0.0, 1.0)
+
+
+def _n_slots(antecedents: np.array) -> int:
+    '''
+    Number of t-norm slots used by the numpy implementation: the largest number of active antecedents in a rule.
+    '''
+    return max(int(np.max(np.sum(antecedents >= 0, axis=1))), 1)
+
+
+def _modifiers_matrix(modifiers: np.array, shape: tuple) -> np.array:
+    '''
+    Returns the modifiers as a float matrix, with -1 (no modifier) when there are none.
+    '''
+    if modifiers is None:
+        return np.full(shape, -1.0)
+
+    return np.ascontiguousarray(np.asarray(modifiers, dtype=np.float64).reshape(shape))
+
+
+def rules_firing(stacked_memberships: np.array, antecedents: np.array, modifiers: np.array, tnorm: int) -> np.array:
+    '''
+    Computes the firing strength of the rules with the numba kernel. Same results as rules.compute_rules_firing.
+
+    :param stacked_memberships: float64 array returned by rules.stack_antecedent_memberships.
+    :param antecedents: integer matrix rules x features (-1 for don't care).
+    :param modifiers: matrix rules x features with the modifier exponents (-1 means no modifier) or None.
+    :param tnorm: t-norm code returned by tnorm_code.
+    :return: array in shape samples x rules (x 2) (x alpha_cuts x 2)
+    '''
+    sample_shape = stacked_memberships.shape[2:]
+    flat_memberships = np.ascontiguousarray(stacked_memberships).reshape(stacked_memberships.shape[:3] + (-1, ))
+    antecedents = np.ascontiguousarray(antecedents, dtype=np.int64)
+    res = np.empty((sample_shape[0], antecedents.shape[0], flat_memberships.shape[3]))
+
+    _rules_firing_kernel(flat_memberships, antecedents, _modifiers_matrix(modifiers, antecedents.shape), tnorm, _n_slots(antecedents), res)
+
+    return res.reshape((sample_shape[0], antecedents.shape[0]) + sample_shape[1:])
+
+
+def fused_rules_firing(X: np.array, tables: np.array, heights: np.array, antecedents: np.array, modifiers: np.array, tnorm: int) -> np.array:
+    '''
+    Computes the firing strength of the rules directly from the inputs with the numba kernel.
+
+    :param X: array samples x features.
+    :param tables: membership tables (k x features x labels x 5). k is 1 for t1 and 2 (lower, upper) for iv sets.
+    :param heights: heights of the fuzzy sets (k x features x labels).
+    :param antecedents: integer matrix rules x features (-1 for don't care).
+    :param modifiers: matrix rules x features with the modifier exponents (-1 means no modifier) or None.
+    :param tnorm: t-norm code returned by tnorm_code.
+    :return: array samples x rules x k.
+    '''
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    antecedents = np.ascontiguousarray(antecedents, dtype=np.int64)
+    res = np.empty((X.shape[0], antecedents.shape[0], tables.shape[0]))
+
+    _fused_firing_kernel(X, np.ascontiguousarray(tables), np.ascontiguousarray(heights), antecedents, _modifiers_matrix(modifiers, antecedents.shape), tnorm, _n_slots(antecedents), res)
+
+    return res
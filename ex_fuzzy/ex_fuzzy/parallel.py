@@ -0,0 +1,247 @@
+"""
+Process based parallelization for the fitness evaluation of the genetic optimization.
+
+The big arrays of a problem (training data, labels and precomputed memberships) are published once as memory mapped files,
+and each worker process receives a copy of the problem without them. After that, only the gene vectors are sent to the workers.
+When the fitness is computed on mini-batches of the data, only the indexes of the samples of each new mini-batch are published.
+
+"""
+import copy
+import functools
+import os
+import shutil
+import tempfile
+import weakref
+import multiprocessing
+
+import numpy as np
+
+try:
+    from . import cache
+except ImportError:
+    import cache
+
+
+shared_attributes = ('X', 'y', '_precomputed_truth') # Problem attributes that are published instead of copied to each worker.
+
+_worker_problem = None
+_worker_args = ()
+_worker_kwargs = {}
+_worker_rows_path = None
+
+
+def publish_arrays(arrays: dict[str, np.array], folder: str) -> dict[str, str]:
+    '''
+    Saves the arrays in the given folder so that they can be memory mapped from other processes.
+
+    :param arrays: dictionary with the name and the value of each array.
+    :param folder: folder where the arrays are saved.
+    :return: dictionary with the name and the path of each saved array.
+    '''
+    paths = {}
+    for name, array in arrays.items():
+        path = os.path.join(folder, name + '.npy')
+        np.save(path, np.ascontiguousarray(array))
+        paths[name] = path
+
+    return paths
+
+
+def load_published_arrays(paths: dict[str, str]) -> dict[str, np.array]:
+    '''
+    Opens the arrays published by publish_arrays as read-only memory maps. The memory is shared among all the processes that open them.
+
+    :param paths: dictionary with the name and the path of each array.
+    :return: dictionary with the name and the memory mapped array.
+    '''
+    return {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+
+
+def _init_worker(problem, paths: dict[str, str], args: tuple, kwargs: dict) -> None:
+    '''
+    Initializes a worker process: restores the published arrays in its copy of the problem.
+    '''
+    global _worker_problem, _worker_args, _worker_kwargs, _worker_rows_path
+
+    arrays = load_published_arrays(paths)
+    for name, array in arrays.items():
+        setattr(problem, name, array)
+    if getattr(problem, '_full_data', None) is not None:
+        # The published arrays are the whole training data, the samples are chosen with the published rows
+        problem._full_data = tuple(arrays.get(name, value) for name, value in zip(shared_attributes, problem._full_data))
+
+    _worker_problem = problem
+    _worker_args = args
+    _worker_kwargs = kwargs
+    _worker_rows_path = None
+
+
+def _worker_evaluate(x: np.array, rows_path: str=None) -> dict:
+    '''
+    Evaluates one individual in a worker process.
+
+    :param x: gene of the individual.
+    :param rows_path: path of the published indexes of the training samples used by the problem. (None for all the samples)
+    '''
+    global _worker_rows_path
+
+    if rows_path != _worker_rows_path:
+        _worker_problem._use_samples(None if rows_path is None else np.load(rows_path))
+        _worker_rows_path = rows_path
+
+    out = {}
+    _worker_problem._evaluate(x, out, *_worker_args, **_worker_kwargs)
+
+    return out
+
+
+class ProcessRunner():
+    '''
+    Elementwise runner for pymoo problems that evaluates the individuals in a pool of processes.
+    The pool is created the first time a problem is evaluated, and it is kept until close() is called or another problem is evaluated.
+    If the problem computes the fitness on samples of its training data (_sample_rows), the whole data is published once and
+    the workers are sent the indexes of the current samples.
+    '''
+
+    def __init__(self, n_processes: int, start_method: str=None) -> None:
+        '''
+        :param n_processes: number of worker processes.
+        :param start_method: multiprocessing start method ('fork', 'spawn' or 'forkserver'). If None, the platform default is used.
+        '''
+        self.n_processes = n_processes
+        self.start_method = start_method
+        self.pool = None
+        self._problem = None
+        self._folder = None
+        self._finalizer = None
+        self._rows = None
+        self._rows_path = None
+        self._n_rows_published = 0
+
+
+    def __call__(self, f, X: np.array) -> list[dict]:
+        '''
+        Evaluates a population. (pymoo elementwise runner interface)
+
+        :param f: pymoo elementwise evaluation function. Contains the problem and its extra arguments.
+        :param X: array population x genes.
+        :return: list with the output dictionary of each individual.
+        '''
+        if self.pool is None or f.problem is not self._problem:
+            self.start(f.problem, f.args, f.kwargs)
+        self._publish_rows(getattr(f.problem, '_sample_rows', None))
+
+        if getattr(f.problem, 'fitness_cache', None) is None:
+            return self._map(list(X))
+
+        # Cache lookups are done here, so only the individuals not seen before are sent to the workers
+        values = cache.cached_fitness(f.problem, np.asarray(X), lambda pending: [out['F'] for out in self._map(list(pending))])
+
+        return [{'F': value} for value in values]
+
+
+    def _map(self, X: list[np.array]) -> list[dict]:
+        '''
+        Evaluates a list of individuals in the worker processes.
+        '''
+        if len(X) == 0:
+            return []
+
+        chunksize = max(1, len(X) // (4 * self.n_processes))
+        return self.pool.map(functools.partial(_worker_evaluate, rows_path=self._rows_path), X, chunksize=chunksize)
+
+
+    def _publish_rows(self, rows: np.array) -> None:
+        '''
+        Publishes the indexes of the training samples used by the problem, if they changed since the last evaluation.
+
+        :param rows: indexes of the samples, or None if the problem uses all of them.
+        '''
+        if rows is self._rows:
+            return
+
+        previous_path = self._rows_path
+        if rows is None:
+            self._rows_path = None
+        else:
+            self._n_rows_published += 1
+            self._rows_path = publish_arrays({'rows_' + str(self._n_rows_published): rows}, self._folder)['rows_' + str(self._n_rows_published)]
+        self._rows = rows
+
+        if previous_path is not None:
+            # The workers read the rows when they receive the first individual after the change, so the old ones are no longer used
+            os.remove(previous_path)
+
+
+    def start(self, problem, args: tuple=(), kwargs: dict=None) -> None:
+        '''
+        Publishes the big arrays of the problem and starts the worker processes.
+
+        :param problem: pymoo problem to evaluate.
+        :param args: extra positional arguments for the problem evaluation.
+        :param kwargs: extra keyword arguments for the problem evaluation.
+        '''
+        self.close()
+
+        self._folder = tempfile.mkdtemp(prefix='ex_fuzzy_')
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self._folder, True)
+
+        worker_problem = copy.copy(problem)
+        worker_problem.elementwise_runner = None
+        if hasattr(worker_problem, 'fitness_cache'):
+            # The fitness cache is kept in the main process
+            worker_problem.fitness_cache = None
+        if getattr(worker_problem, 'membership_cache', None) is not None:
+            # Each worker fills its own membership cache
+            worker_problem.membership_cache = [type(variable_cache)(variable_cache.maxsize) for variable_cache in problem.membership_cache]
+        # If the problem uses samples of its training data, the whole data is published once
+        full_data = getattr(problem, '_full_data', None)
+        values = dict(zip(shared_attributes, full_data)) if full_data is not None else {name: getattr(problem, name, None) for name in shared_attributes}
+        arrays = {}
+        for name, value in values.items():
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                arrays[name] = value
+                setattr(worker_problem, name, None)
+        if full_data is not None:
+            worker_problem._full_data = tuple(None if name in arrays else value for name, value in values.items())
+
+        paths = publish_arrays(arrays, self._folder)
+        context = multiprocessing.get_context(self.start_method)
+        self.pool = context.Pool(self.n_processes, initializer=_init_worker, initargs=(worker_problem, paths, tuple(args), dict(kwargs or {})))
+        self._problem = problem
+        self._rows = None
+        self._rows_path = None
+
+
+    def close(self) -> None:
+        '''
+        Stops the worker processes and deletes the published arrays.
+        '''
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+
+        self._folder = None
+        self._problem = None
+        self._rows = None
+        self._rows_path = None
+
+
+    def __getstate__(self) -> dict:
+        '''
+        The pool and the published arrays are not copied along with the runner.
+        '''
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['_problem'] = None
+        state['_folder'] = None
+        state['_finalizer'] = None
+        state['_rows'] = None
+        state['_rows_path'] = None
+
+        return state
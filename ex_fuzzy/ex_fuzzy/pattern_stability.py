@@ -65,7 +65,7 @@ class pattern_stabilizer():
     def __init__(self,  X, y, nRules: int = 30, nAnts: int = 4, fuzzy_type: fs.FUZZY_SETS = fs.FUZZY_SETS.t1, tolerance: float = 0.0, class_names: list[str] = None,
                  n_linguistic_variables: int = 3, verbose=False, linguistic_variables: list[fs.fuzzyVariable] = None,
                  domain: list[float] = None, n_class: int=None, runner: int=1, ds_mode:int=0, allow_unkown:bool=False,
-                 fuzzy_modifiers:bool=False) -> None:
+                 fuzzy_modifiers:bool=False, membership_store=None) -> None:
         
         '''
         Inits the optimizer with the corresponding parameters.
@@ -81,6 +81,7 @@ class pattern_stabilizer():
         :param n_class: names of the classes in the problem. If None (default) the classifier will compute it empirically.
         :param precomputed_rules: MasterRuleBase object. If not None, the classifier will use the rules in the object and ignore the conflicting parameters.
         :param runner: number of threads to use. If None (default) the classifier will use 1 thread.
+        :param membership_store: cache.MembershipStore. If given (and the linguistic variables are precomputed), the memberships of each training split are saved in it, so that repeating the study reads them instead of computing them again.
         '''
         self.nRules = nRules
         self.nAnts = nAnts
@@ -101,6 +102,7 @@ class pattern_stabilizer():
         self.allow_unknown = allow_unkown
         self.fuzzy_modifiers = fuzzy_modifiers
         self.runner = runner
+        self.membership_store = membership_store
         
         if linguistic_variables is not None:
             # If the linguistic variables are precomputed then we act accordingly
@@ -129,7 +131,7 @@ class pattern_stabilizer():
         use_names = not isinstance(self.classes_names[0], numbers.Number)
 
         for ix in range(n):
-            fl_classifier = evf.BaseFuzzyRulesClassifier(nRules=self.nRules, linguistic_variables=self.lvs, nAnts=self.nAnts, n_linguistic_variables=self.n_linguist_variables, fuzzy_type=self.fuzzy_type, verbose=False, tolerance=self.tolerance, runner=self.runner, ds_mode=self.ds_mode, fuzzy_modifiers=self.fuzzy_modifiers, allow_unknown=self.allow_unknown)
+            fl_classifier = evf.BaseFuzzyRulesClassifier(nRules=self.nRules, linguistic_variables=self.lvs, nAnts=self.nAnts, n_linguistic_variables=self.n_linguist_variables, fuzzy_type=self.fuzzy_type, verbose=False, tolerance=self.tolerance, runner=self.runner, ds_mode=self.ds_mode, fuzzy_modifiers=self.fuzzy_modifiers, allow_unknown=self.allow_unknown, membership_store=self.membership_store)
             
             X_train, X_test, y_train, y_test = train_test_split(self.X, self.y, test_size=0.33, random_state=ix)
             fl_classifier.fit(X_train, np.array(y_train), n_gen=n_gen, pop_size=pop_size, checkpoints=0)
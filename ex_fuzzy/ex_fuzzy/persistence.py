@@ -1,7 +1,14 @@
 '''
 Load the rules of a fuzzy rules system using plain text format.
 
+Models can also be saved in a binary .npz format (save_model/load_model) that stores the rule matrix, modifiers, weights, scores,
+consequents and the fuzzy set parameter tables as arrays. Loading it does not parse any text, and the arrays can be memory mapped.
+
 '''
+import json
+import struct
+import zipfile
+
 import numpy as np
 import re
 
@@ -264,4 +271,469 @@ def save_fuzzy_variables(fuzzy_variables: list) -> str:
     for fvar in fuzzy_variables:
         fuzzy_variables_printed += print_fuzzy_variable(fvar) + '\n'
 
-    return fuzzy_variables_printed
\ No newline at end of file
+    return fuzzy_variables_printed
+
+model_format_version = 2 # Version of the binary model format written by save_model. (2: GT2 fuzzy sets)
+
+_fuzzy_set_classes = ['FS', 'gaussianFS', 'categoricalFS', 'IVFS', 'gaussianIVFS', 'categoricalIVFS', 'GT2'] # Fuzzy sets supported by the binary format. (Code: position in the list)
+
+_tnorm_names = {'prod': np.prod, 'min': np.min}
+
+_wrapper_classifiers = {'RuleMineClassifier': 'fl_classifier', 'FuzzyRulesClassifier': 'fl_classifier2', 'RuleFineTuneClassifier': 'fl_classifier2'} # Attribute with the classifier that predicts.
+
+_classifier_attributes = ['nRules', 'nAnts', 'tolerance', 'ds_mode', 'fuzzy_modifiers', 'allow_unknown', 'classes_names', 'nclasses_', 'var_names']
+
+
+def _json_value(value):
+    '''
+    Converts numpy values to python ones, so that they can be written as json.
+    '''
+    if isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, np.ndarray):
+        return [_json_value(elem) for elem in value.tolist()]
+    elif isinstance(value, (list, tuple)):
+        return [_json_value(elem) for elem in value]
+    elif isinstance(value, dict):
+        return {str(key): _json_value(elem) for key, elem in value.items()}
+    else:
+        return value
+
+
+def _gt2_tables(gt2_sets: dict[tuple[int, int], fs.GT2], shape: tuple[int, int]) -> dict:
+    '''
+    Returns the GT2 fuzzy sets as arrays. The points of the domain of all the sets are stored one after the other, with the start and number of
+    points of each set: their values, the trapezoidal secondary memberships and the alpha cut intervals (points x alpha cuts x 2).
+    '''
+    offsets = np.zeros(shape + (2, ), dtype=np.int64)
+    settings = np.full(shape + (3, ), np.nan) # Significant decimals, unit resolution and first index of the domain
+    n_alpha_cuts = max(len(fuzzy_set.alpha_cuts) for fuzzy_set in gt2_sets.values())
+    alpha_cuts = np.full(shape + (n_alpha_cuts, ), np.nan)
+    points, secondary_parameters, secondary_domains, alpha_tables = [], [], [], []
+
+    start = 0
+    for (ix, jx), fuzzy_set in gt2_sets.items():
+        for secondary_membership in fuzzy_set.secondary_memberships.values():
+            if type(secondary_membership) is not fs.FS:
+                raise ValueError('GT2 fuzzy set ' + str(fuzzy_set.name) + ' has secondary memberships of type ' + type(secondary_membership).__name__ +
+                                 '. Only trapezoidal secondary memberships can be saved in the binary format.')
+
+        if not hasattr(fuzzy_set, 'alpha_table'): # Sets pickled before the lookup tables existed
+            fuzzy_set._build_lookup_tables()
+
+        n_points = len(fuzzy_set.secondary_memberships)
+        offsets[ix, jx] = start, n_points
+        settings[ix, jx] = fuzzy_set.significant_decimals, fuzzy_set.unit_resolution, fuzzy_set.domain_init
+        alpha_cuts[ix, jx, :len(fuzzy_set.alpha_cuts)] = fuzzy_set.alpha_cuts
+        points.append(np.array([float(key) for key in fuzzy_set.secondary_memberships.keys()]))
+        secondary_parameters.append(np.array([secondary_membership.membership_parameters for secondary_membership in fuzzy_set.secondary_memberships.values()], dtype=float))
+        secondary_domains.append(np.array([secondary_membership.domain for secondary_membership in fuzzy_set.secondary_memberships.values()], dtype=float))
+        alpha_table = np.full((n_points, n_alpha_cuts, 2), np.nan)
+        alpha_table[:, :len(fuzzy_set.alpha_cuts)] = fuzzy_set.alpha_table
+        alpha_tables.append(alpha_table)
+        start += n_points
+
+    return {'gt2_offsets': offsets, 'gt2_settings': settings, 'gt2_alpha_cuts': alpha_cuts, 'gt2_points': np.concatenate(points),
+            'gt2_secondary_parameters': np.concatenate(secondary_parameters), 'gt2_secondary_domains': np.concatenate(secondary_domains),
+            'gt2_alpha_tables': np.concatenate(alpha_tables)}
+
+
+def _load_gt2(arrays: dict, ix: int, jx: int, name: str, domain: list[float]) -> fs.GT2:
+    '''
+    Builds a GT2 fuzzy set saved by _gt2_tables. The alpha cut intervals are read from the file instead of computed from the secondary memberships.
+    '''
+    start, n_points = arrays['gt2_offsets'][ix, jx].tolist()
+    significant_decimals, unit_resolution, domain_init = arrays['gt2_settings'][ix, jx].tolist()
+    alpha_cuts = arrays['gt2_alpha_cuts'][ix, jx]
+    alpha_cuts = alpha_cuts[~np.isnan(alpha_cuts)].tolist()
+    alpha_table = arrays['gt2_alpha_tables'][start:start + n_points, :len(alpha_cuts)]
+
+    key_format = '%.' + str(int(significant_decimals)) + 'f'
+    secondary_memberships = {}
+    for point, parameters, secondary_domain in zip(arrays['gt2_points'][start:start + n_points].tolist(), arrays['gt2_secondary_parameters'][start:start + n_points].tolist(),
+                                                    arrays['gt2_secondary_domains'][start:start + n_points].tolist()):
+        secondary_memberships[key_format % point] = fs.FS(key_format % point, parameters, secondary_domain)
+
+    # The constructor would compute the alpha cut intervals again, so the attributes it sets are restored here
+    fuzzy_set = fs.GT2.__new__(fs.GT2)
+    fuzzy_set.name = name
+    fuzzy_set.domain = domain
+    fuzzy_set.secondary_memberships = secondary_memberships
+    fuzzy_set.alpha_cuts = alpha_cuts
+    fuzzy_set.unit_resolution = unit_resolution
+    fuzzy_set.significant_decimals = int(significant_decimals)
+    fuzzy_set.domain_init = int(domain_init)
+    fuzzy_set.sample_unit_domain = np.arange(0, 1 + unit_resolution, unit_resolution)
+    fuzzy_set.iv_secondary_memberships = {alpha_cut: np.array(alpha_table[:, kx]) for kx, alpha_cut in enumerate(alpha_cuts)}
+    fuzzy_set._build_lookup_tables()
+
+    return fuzzy_set
+
+
+def _fuzzy_variables_tables(fuzzy_variables: list[fs.fuzzyVariable]) -> tuple[dict, dict]:
+    '''
+    Returns the parameters of the fuzzy sets of the variables as arrays, and their names and categories as metadata.
+    Temporal fuzzy sets are stored as the standard set plus the temporal weights, and GT2 sets in their own tables. (See _gt2_tables)
+    '''
+    n_labels = max(len(fuzzy_variable) for fuzzy_variable in fuzzy_variables)
+    shape = (len(fuzzy_variables), n_labels)
+    kinds = np.full(shape, -1, dtype=np.int8)
+    domains = np.full(shape + (2, ), np.nan)
+    heights = np.ones(shape)
+    parameters = [[None] * n_labels for _ in fuzzy_variables]
+    temporal_weights = {}
+    gt2_sets = {}
+    categories = []
+
+    for ix, fuzzy_variable in enumerate(fuzzy_variables):
+        variable_categories = None
+        for jx, fuzzy_set in enumerate(fuzzy_variable):
+            if hasattr(fuzzy_set, 'tmp_function'):
+                temporal_weights[(ix, jx)] = np.asarray(fuzzy_set.tmp_function, dtype=float)
+                fuzzy_set = fuzzy_set.std_set
+
+            class_name = type(fuzzy_set).__name__
+            if class_name not in _fuzzy_set_classes:
+                raise ValueError('Fuzzy set ' + str(fuzzy_set.name) + ' of type ' + class_name + ' can not be saved in the binary format.')
+            kinds[ix, jx] = _fuzzy_set_classes.index(class_name)
+
+            if class_name.startswith('categorical'):
+                variable_categories = [None] * len(fuzzy_variable) if variable_categories is None else variable_categories
+                variable_categories[jx] = _json_value(fuzzy_set.category)
+                continue
+
+            domains[ix, jx] = fuzzy_set.domain
+            if isinstance(fuzzy_set, fs.GT2):
+                gt2_sets[(ix, jx)] = fuzzy_set
+            elif isinstance(fuzzy_set, fs.IVFS):
+                parameters[ix][jx] = [fuzzy_set.secondMF_lower, fuzzy_set.secondMF_upper]
+                heights[ix, jx] = fuzzy_set.lower_height
+            else:
+                parameters[ix][jx] = [fuzzy_set.membership_parameters]
+        categories.append(variable_categories)
+
+    n_parameters = max([len(params) for variable in parameters for set_params in variable if set_params is not None for params in set_params] + [0])
+    parameter_table = np.full(shape + (2, n_parameters), np.nan)
+    for ix, variable in enumerate(parameters):
+        for jx, set_params in enumerate(variable):
+            for kx, params in enumerate(set_params or []):
+                parameter_table[ix, jx, kx, :len(params)] = params
+
+    arrays = {'fs_kinds': kinds, 'fs_parameters': parameter_table, 'fs_domains': domains, 'fs_heights': heights}
+    if len(temporal_weights) > 0:
+        n_times = max(len(weights) for weights in temporal_weights.values())
+        arrays['fs_temporal_weights'] = np.full(shape + (n_times, ), np.nan)
+        for (ix, jx), weights in temporal_weights.items():
+            arrays['fs_temporal_weights'][ix, jx, :len(weights)] = weights
+    if len(gt2_sets) > 0:
+        arrays.update(_gt2_tables(gt2_sets, shape))
+
+    metadata = {'variable_names': [fuzzy_variable.name for fuzzy_variable in fuzzy_variables],
+                'variable_units': [getattr(fuzzy_variable, 'units', None) for fuzzy_variable in fuzzy_variables],
+                'set_names': [fuzzy_variable.linguistic_variable_names() for fuzzy_variable in fuzzy_variables],
+                'categories': categories}
+
+    return arrays, metadata
+
+
+def _load_fuzzy_variables_tables(arrays: dict, metadata: dict) -> list[fs.fuzzyVariable]:
+    '''
+    Builds the fuzzy variables saved by _fuzzy_variables_tables.
+    '''
+    kinds = arrays['fs_kinds']
+    parameter_table = arrays['fs_parameters']
+    temporal_weights = arrays.get('fs_temporal_weights')
+    if temporal_weights is not None:
+        # Imported here: the temporal module extends the FUZZY_SETS enum when it is imported
+        try:
+            from . import temporal
+        except ImportError:
+            import temporal
+
+    fuzzy_variables = []
+    for ix, (variable_name, set_names) in enumerate(zip(metadata['variable_names'], metadata['set_names'])):
+        fuzzy_sets = []
+        for jx, set_name in enumerate(set_names):
+            class_name = _fuzzy_set_classes[kinds[ix, jx]]
+            fuzzy_set_class = getattr(fs, class_name)
+            if class_name.startswith('categorical'):
+                fuzzy_set = fuzzy_set_class(set_name, metadata['categories'][ix][jx])
+            else:
+                params = [parameter_table[ix, jx, kx][~np.isnan(parameter_table[ix, jx, kx])].tolist() for kx in range(2)]
+                domain = arrays['fs_domains'][ix, jx].tolist()
+                if issubclass(fuzzy_set_class, fs.GT2):
+                    fuzzy_set = _load_gt2(arrays, ix, jx, set_name, domain)
+                elif issubclass(fuzzy_set_class, fs.IVFS):
+                    fuzzy_set = fuzzy_set_class(set_name, params[0], params[1], domain, float(arrays['fs_heights'][ix, jx]))
+                else:
+                    fuzzy_set = fuzzy_set_class(set_name, params[0], domain)
+
+            if temporal_weights is not None:
+                weights = temporal_weights[ix, jx]
+                fuzzy_set = temporal.temporalFS(fuzzy_set, np.array(weights[~np.isnan(weights)]))
+            fuzzy_sets.append(fuzzy_set)
+
+        if temporal_weights is not None:
+            fuzzy_variables.append(temporal.temporalFuzzyVariable(variable_name, fuzzy_sets))
+        else:
+            fuzzy_variables.append(fs.fuzzyVariable(variable_name, fuzzy_sets, metadata['variable_units'][ix]))
+
+    return fuzzy_variables
+
+
+def _rules_tables(rule_bases: list[rules.RuleBase]) -> dict:
+    '''
+    Returns the rules of the rule bases as arrays: one row per rule, in order.
+    '''
+    rule_list = [rule for rule_base in rule_bases for rule in rule_base]
+    n_features = len(rule_bases[0].antecedents)
+    antecedents = np.array([rule.antecedents for rule in rule_list], dtype=np.int32).reshape((len(rule_list), n_features))
+    modifiers = np.full((len(rule_list), n_features), np.nan)
+    has_modifiers = np.zeros((len(rule_list), ), dtype=bool)
+    score_ndims = np.full((len(rule_list), ), -1, dtype=np.int8) # -1: no score, 0: scalar score, 1: one score per membership bound
+    scores = []
+    stats = np.full((len(rule_list), 2), np.nan)
+    has_stats = np.zeros((len(rule_list), 2), dtype=bool)
+
+    for ix, rule in enumerate(rule_list):
+        if rule.modifiers is not None:
+            modifiers[ix] = rule.modifiers
+            has_modifiers[ix] = True
+        if hasattr(rule, 'score'):
+            score_ndims[ix] = np.ndim(rule.score)
+            scores.append(np.ravel(rule.score))
+        else:
+            scores.append(np.zeros((0, )))
+        for jx, stat in enumerate(['weight', 'accuracy']):
+            if hasattr(rule, stat):
+                stats[ix, jx] = getattr(rule, stat)
+                has_stats[ix, jx] = True
+
+    score_sizes = np.array([len(score) for score in scores], dtype=np.int32)
+    score_table = np.full((len(rule_list), max([len(score) for score in scores] + [1])), np.nan)
+    for ix, score in enumerate(scores):
+        score_table[ix, :len(score)] = score
+
+    return {'rule_antecedents': antecedents, 'rule_consequents': np.array([rule.consequent for rule in rule_list], dtype=np.int32),
+            'rule_modifiers': modifiers, 'rule_has_modifiers': has_modifiers, 'rule_scores': score_table, 'rule_score_ndims': score_ndims, 'rule_score_sizes': score_sizes,
+            'rule_stats': stats, 'rule_has_stats': has_stats, 'rule_base_sizes': np.array([len(rule_base) for rule_base in rule_bases], dtype=np.int64)}
+
+
+def _load_rules_tables(arrays: dict, rule_base_metadata: list[dict], fuzzy_variables: list) -> list[rules.RuleBase]:
+    '''
+    Builds the rule bases saved by _rules_tables. fuzzy_variables has the antecedents of each rule base.
+    '''
+    antecedents = arrays['rule_antecedents'].tolist()
+    consequents = arrays['rule_consequents'].tolist()
+    modifiers = arrays['rule_modifiers']
+    has_modifiers = arrays['rule_has_modifiers']
+    scores = arrays['rule_scores']
+    score_ndims = arrays['rule_score_ndims']
+    score_sizes = arrays['rule_score_sizes']
+    stats = arrays['rule_stats'].tolist()
+    has_stats = arrays['rule_has_stats']
+
+    rule_list = []
+    for ix in range(len(antecedents)):
+        rule = rules.RuleSimple(antecedents[ix], consequents[ix], np.array(modifiers[ix]) if has_modifiers[ix] else None)
+        if score_ndims[ix] == 0:
+            rule.score = scores[ix, 0]
+        elif score_ndims[ix] > 0:
+            rule.score = np.array(scores[ix, :score_sizes[ix]])
+        if has_stats[ix, 0]:
+            rule.weight = stats[ix][0]
+        if has_stats[ix, 1]:
+            rule.accuracy = stats[ix][1]
+        rule_list.append(rule)
+
+    rule_bases = []
+    start = 0
+    for size, rule_base_info, antecedent_variables in zip(arrays['rule_base_sizes'].tolist(), rule_base_metadata, fuzzy_variables):
+        rule_base_class = getattr(rules, rule_base_info['class'])
+        rule_bases.append(rule_base_class(antecedent_variables, rule_list[start:start + size], tnorm=_tnorm_names[rule_base_info['tnorm']]))
+        start += size
+
+    return rule_bases
+
+
+def _master_rule_base_tables(mrule_base: rules.MasterRuleBase) -> tuple[dict, dict]:
+    '''
+    Returns the arrays and the metadata of a (temporal) master rule base.
+    '''
+    temporal = hasattr(mrule_base, 'time_mrule_bases')
+    master_rule_bases = mrule_base.time_mrule_bases if temporal else [mrule_base]
+    rule_bases = [rule_base for master_rule_base in master_rule_bases for rule_base in master_rule_base.rule_bases]
+
+    fuzzy_variables = master_rule_bases[0].antecedents
+    for rule_base in rule_bases:
+        if len(rule_base.antecedents) != len(fuzzy_variables) or (not temporal and len(rule_base) > 0 and not all(a is b for a, b in zip(rule_base.antecedents, fuzzy_variables))):
+            raise ValueError('All the rule bases must share the same fuzzy variables to be saved in the binary format.')
+        if rule_base.consequent is not None:
+            raise ValueError('Rule bases with fuzzy consequents can not be saved in the binary format.')
+
+    tnorm_names = {tnorm: name for name, tnorm in _tnorm_names.items()}
+    for rule_base in rule_bases:
+        if rule_base.tnorm not in tnorm_names:
+            raise ValueError('Only the product and minimum t-norms can be saved in the binary format.')
+
+    arrays, metadata = _fuzzy_variables_tables(fuzzy_variables)
+    arrays.update(_rules_tables(rule_bases))
+    metadata['rule_bases'] = [{'class': type(rule_base).__name__, 'tnorm': tnorm_names[rule_base.tnorm]} for rule_base in rule_bases]
+    metadata['master_rule_bases'] = [{'n_rule_bases': len(master_rule_base.rule_bases), 'consequent_names': _json_value(master_rule_base.consequent_names),
+                                      'ds_mode': master_rule_base.ds_mode, 'allow_unknown': master_rule_base.allow_unknown,
+                                      'dtype': None if master_rule_base.dtype is None else np.dtype(master_rule_base.dtype).str} for master_rule_base in master_rule_bases]
+    if temporal:
+        metadata['temporal'] = {'time_step_names': _json_value(mrule_base.time_step_names), 'consequent_names': _json_value(mrule_base.consequent_names)}
+
+    return arrays, metadata
+
+
+def _load_master_rule_base(arrays: dict, metadata: dict) -> tuple[rules.MasterRuleBase, list[fs.fuzzyVariable]]:
+    '''
+    Builds the (temporal) master rule base saved by _master_rule_base_tables. Also returns a copy of its fuzzy variables.
+    '''
+    master_info = metadata['master_rule_bases']
+    # Each time step of a temporal rule base fixes the time of its own copy of the fuzzy variables
+    n_copies = len(master_info) + 1 if 'temporal' in metadata else 1
+    variable_copies = [_load_fuzzy_variables_tables(arrays, metadata) for _ in range(n_copies)]
+    rule_base_variables = [variable_copies[ix] for ix, info in enumerate(master_info) for _ in range(info['n_rule_bases'])]
+    rule_bases = _load_rules_tables(arrays, metadata['rule_bases'], rule_base_variables)
+
+    master_rule_bases = []
+    start = 0
+    for info in master_info:
+        master_rule_base = rules.MasterRuleBase(rule_bases[start:start + info['n_rule_bases']], info['consequent_names'], ds_mode=info['ds_mode'],
+                                                allow_unknown=info['allow_unknown'], dtype=None if info['dtype'] is None else np.dtype(info['dtype']))
+        master_rule_bases.append(master_rule_base)
+        start += info['n_rule_bases']
+
+    if 'temporal' not in metadata:
+        return master_rule_bases[0], variable_copies[0]
+
+    try:
+        from . import temporal
+    except ImportError:
+        import temporal
+    mrule_base = temporal.temporalMasterRuleBase(master_rule_bases, metadata['temporal']['time_step_names'])
+    mrule_base.consequent_names = metadata['temporal']['consequent_names']
+
+    return mrule_base, variable_copies[-1]
+
+
+def _read_npz(path: str, mmap_mode: str=None) -> dict[str, np.array]:
+    '''
+    Reads all the arrays of a .npz file. If mmap_mode is given, the arrays stored without compression are memory mapped.
+    '''
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if mmap_mode is not None and info.compress_type == zipfile.ZIP_STORED:
+                # Data starts after the local file header of the member and the .npy header
+                file.seek(info.header_offset)
+                local_header = file.read(30)
+                name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+                file.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(file)
+                read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+                shape, fortran_order, dtype = read_header(file)
+                if not dtype.hasobject and len(shape) > 0 and np.prod(shape) > 0:
+                    arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=file.tell(), shape=shape, order='F' if fortran_order else 'C')
+                    continue
+
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+
+    return arrays
+
+
+def save_model(model, path: str) -> None:
+    '''
+    Saves a model in the binary (.npz) format: the rule matrix, modifiers, weights, scores, consequents and the fuzzy set parameter tables are
+    stored as arrays, and the names and settings in a json header.
+    Supports MasterRuleBase, BaseFuzzyRulesClassifier (and the classifiers in the classifiers module) and their temporal versions,
+    with t1 and t2 trapezoidal, gaussian and categorical fuzzy sets, and GT2 fuzzy sets with trapezoidal secondary memberships.
+
+    :param model: model to save.
+    :param path: path of the file. (It is used as it is, so give it the .npz extension)
+    '''
+    if mnt.save_usage_flag:
+        mnt.usage_data[mnt.usage_categories.Persistence]['persistence_write'] += 1
+
+    model_class = type(model).__name__
+    classifier = getattr(model, _wrapper_classifiers[model_class]) if model_class in _wrapper_classifiers else model
+
+    if isinstance(classifier, rules.MasterRuleBase):
+        arrays, metadata = _master_rule_base_tables(classifier)
+    elif hasattr(classifier, 'rule_base') and hasattr(classifier, 'lvs'):
+        # Checked by attributes, not isinstance: importing evolutionary_fit would load the training dependencies (pymoo, sklearn)
+        arrays, metadata = _master_rule_base_tables(classifier.rule_base)
+        metadata['classifier'] = {name: _json_value(getattr(classifier, name)) for name in _classifier_attributes if hasattr(classifier, name)}
+        metadata['classifier']['precomputed_lvs'] = classifier.lvs is not None
+        metadata['classifier']['dtype'] = None if classifier.dtype is None else np.dtype(classifier.dtype).str
+        if hasattr(classifier, 'performance'):
+            metadata['classifier']['performance'] = _json_value(classifier.performance)
+    else:
+        raise ValueError('Models of type ' + model_class + ' can not be saved in the binary format.')
+
+    metadata['model'] = model_class
+    metadata['version'] = model_format_version
+    arrays['metadata'] = np.array(json.dumps(metadata))
+
+    with open(path, 'wb') as file:
+        np.savez(file, **arrays)
+
+
+def load_model(path: str, mmap_mode: str=None):
+    '''
+    Loads a model saved with save_model.
+
+    :param path: path of the file.
+    :param mmap_mode: if not None ('r' or 'c'), the rule and fuzzy set tables are memory mapped instead of read into memory.
+    :return: the model, of the same class as the saved one.
+    '''
+    if mnt.save_usage_flag:
+        mnt.usage_data[mnt.usage_categories.Persistence]['persistence_read'] += 1
+
+    arrays = _read_npz(path, mmap_mode)
+    metadata = json.loads(str(arrays.pop('metadata')))
+    if metadata['version'] > model_format_version:
+        raise ValueError('Model saved with format version ' + str(metadata['version']) + ', but this version of ex_fuzzy reads up to version ' + str(model_format_version) + '.')
+
+    mrule_base, fuzzy_variables = _load_master_rule_base(arrays, metadata)
+    if 'classifier' not in metadata:
+        return mrule_base
+
+    attributes = metadata['classifier']
+    linguistic_variables = fuzzy_variables if attributes['precomputed_lvs'] else None
+    dtype = None if attributes['dtype'] is None else np.dtype(attributes['dtype'])
+    if 'temporal' in metadata:
+        try:
+            from . import temporal
+        except ImportError:
+            import temporal
+        classifier = temporal.TemporalFuzzyRulesClassifier(linguistic_variables=linguistic_variables, precomputed_rules=mrule_base)
+        if 'performance' in attributes:
+            classifier.performance = {int(key): value for key, value in attributes['performance'].items()}
+    else:
+        try:
+            from . import evolutionary_fit as evf
+        except ImportError:
+            import evolutionary_fit as evf
+        classifier = evf.BaseFuzzyRulesClassifier(linguistic_variables=linguistic_variables, precomputed_rules=mrule_base, dtype=dtype)
+    for name in _classifier_attributes:
+        if name in attributes:
+            setattr(classifier, name, attributes[name])
+
+    model_class = metadata['model']
+    if model_class not in _wrapper_classifiers:
+        return classifier
+
+    try:
+        from . import classifiers
+    except ImportError:
+        import classifiers
+    model = getattr(classifiers, model_class)(nRules=classifier.nRules, nAnts=classifier.nAnts, tolerance=classifier.tolerance, linguistic_variables=linguistic_variables)
+    setattr(model, _wrapper_classifiers[model_class], classifier)
+
+    return model
@@ -3,8 +3,12 @@ Module to perform rule mining in a pandas dataframe or numpy array. The methods
 rule candidates. It can be used then by a Genetic optimizator from evolutionary_fit module to search the optimal combination of them.
 
 """
+import heapq
+import itertools
+import multiprocessing
+import shutil
+import tempfile
 import typing
-from itertools import product, combinations
 
 import pandas as pd
 import numpy as np
@@ -14,73 +18,467 @@ try:
     from . import fuzzy_sets as fs
     from . import maintenance as mnt
     from . import utils
+    from . import parallel
 except ImportError:
     import utils
     import rules as rl
     import fuzzy_sets as fs
     import maintenance as mnt
+    import parallel
 
 
-def _generate_combinations(lists: list, k: int) -> typing.Iterator:
+def _itemset_supports(min_memberships: np.array) -> np.array:
     '''
-    Generate all the combinations between elements of different lists of length k without repeting elements of the same list.
+    Computes the support of a batch of itemsets from their min-memberships. For iv fuzzy sets, the support
+    of the lower and upper memberships are averaged.
 
-    :param lists: list of lists.
-    :param k: integer with the length of the combinations.
-    :return: a list with all the combinations.
+    :param min_memberships: array itemsets x samples (x 2) with the minimum membership of the items of each itemset. It can have no itemsets.
+    :return: vector with the support of each itemset.
     '''
-    # Get all combinations of elements for k
-    all_combs = combinations(np.arange(len(lists)), k)
-    
-    # For those elements, get the cartesian product between them
-    for comb in all_combs:
-        selected_lists = [lists[x] for x in comb]
-        all_combinations = product(*selected_lists)
+    # The row size is explicit because it cannot be inferred from an empty batch
+    return np.mean(min_memberships.reshape((min_memberships.shape[0], int(np.prod(min_memberships.shape[1:])))), axis=1)
+
+
+class ItemMemberships():
+    '''
+    Membership of each sample to each item (variable, linguistic variable), used to mine the itemsets.
+    The items of the categorical variables are stored as the category index of each sample instead of one dense vector per category,
+    and the supports of their itemsets are computed from those indexes.
+    '''
+
+    def __init__(self, items: list[tuple[int, int]], dense: np.array, codes: np.array, dense_rows: np.array, code_rows: np.array, sample_shape: tuple) -> None:
+        '''
+        :param items: (variable, linguistic variable) of each item.
+        :param dense: array dense items x samples (x 2) with the memberships of the non categorical items.
+        :param codes: integer array categorical variables x samples with the category index of each sample (-1 for no category).
+        :param dense_rows: row of each item in dense (-1 for categorical items).
+        :param code_rows: row of each item in codes (-1 for non categorical items).
+        :param sample_shape: shape of the membership vector of one item.
+        '''
+        self.items = items
+        self.dense = dense
+        self.codes = codes
+        self.dense_rows = np.asarray(dense_rows)
+        self.code_rows = np.asarray(code_rows)
+        self.sample_shape = tuple(sample_shape)
+        self.item_vars = np.array([item_var for item_var, _ in items], dtype=int)
+        self.item_labels = np.array([item_vl for _, item_vl in items], dtype=int)
+
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.dense.dtype
+
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+    def select_samples(self, samples: np.array) -> 'ItemMemberships':
+        '''
+        Returns the table restricted to some samples.
+
+        :param samples: boolean vector with the selected samples.
+        '''
+        dense = self.dense[:, samples]
+
+        return ItemMemberships(self.items, dense, self.codes[:, samples], self.dense_rows, self.code_rows, dense.shape[1:])
+
+
+    def rows(self, item_indexes: list[int]) -> np.array:
+        '''
+        Returns the dense memberships of some items.
+
+        :param item_indexes: list with the index of each item.
+        :return: array items x samples (x 2)
+        '''
+        item_indexes = np.asarray(item_indexes, dtype=int)
+        res = np.empty((len(item_indexes), ) + self.sample_shape, dtype=self.dtype)
+        is_dense = self.dense_rows[item_indexes] >= 0
+        res[is_dense] = self.dense[self.dense_rows[item_indexes[is_dense]]]
+        if not np.all(is_dense):
+            categorical = item_indexes[~is_dense]
+            memberships = np.equal(self.codes[self.code_rows[categorical]], self.item_labels[categorical][:, np.newaxis])
+            res[~is_dense] = memberships.reshape(memberships.shape + (1, ) * (len(self.sample_shape) - 1))
+
+        return res
+
+
+    def _code_supports(self, code_row: int, labels: np.array, weights: np.array=None) -> np.array:
+        '''
+        Support of the categories of a categorical variable, weighting each sample. (The min with a category is the weight for its samples and 0 for the rest)
+        '''
+        n_samples = self.sample_shape[0]
+        sums = np.bincount(self.codes[code_row] + 1, weights=weights, minlength=np.max(labels) + 2)
+
+        return sums[np.asarray(labels) + 1] / n_samples
+
+
+    def supports(self) -> np.array:
+        '''
+        Returns the support of each item.
+        '''
+        res = np.zeros((len(self.items), ))
+        is_dense = self.dense_rows >= 0
+        res[is_dense] = _itemset_supports(self.dense[self.dense_rows[is_dense]])
+        for code_row in np.unique(self.code_rows[~is_dense]):
+            variable_items = np.where(self.code_rows == code_row)[0]
+            res[variable_items] = self._code_supports(code_row, self.item_labels[variable_items])
+
+        return res
+
+
+    def extend(self, parent_min: np.array, candidates: list[int]) -> tuple[np.array, typing.Callable]:
+        '''
+        Computes the support of the itemsets formed by a parent itemset and each of the candidate items.
+        The support of the categorical candidates is computed without their min-membership vectors.
+
+        :param parent_min: min-membership vector of the parent itemset.
+        :param candidates: list with the index of each candidate item.
+        :return: vector with the supports and a function that returns the min-membership vectors of the selected candidates (given as positions in candidates).
+        '''
+        candidates = np.asarray(candidates, dtype=int)
+        supports = np.zeros((len(candidates), ))
+        is_dense = self.dense_rows[candidates] >= 0
+        dense_mins = np.minimum(parent_min[np.newaxis], self.dense[self.dense_rows[candidates[is_dense]]])
+        supports[is_dense] = _itemset_supports(dense_mins)
+
+        if not np.all(is_dense):
+            weights = parent_min.reshape((parent_min.shape[0], -1)).mean(axis=1)
+            for code_row in np.unique(self.code_rows[candidates[~is_dense]]):
+                positions = np.where(self.code_rows[candidates] == code_row)[0]
+                supports[positions] = self._code_supports(code_row, self.item_labels[candidates[positions]], weights)
+
+        dense_position = np.cumsum(is_dense) - 1
+
+        def candidate_mins(selected: np.array) -> np.array:
+            selected = np.asarray(selected, dtype=int)
+            res = np.empty((len(selected), ) + parent_min.shape, dtype=parent_min.dtype)
+            selected_dense = is_dense[selected]
+            res[selected_dense] = dense_mins[dense_position[selected[selected_dense]]]
+            for ix in np.where(~selected_dense)[0]:
+                candidate = candidates[selected[ix]]
+                in_category = np.equal(self.codes[self.code_rows[candidate]], self.item_labels[candidate])
+                res[ix] = np.where(in_category.reshape(in_category.shape + (1, ) * (parent_min.ndim - 1)), parent_min, 0.0)
+
+            return res
+
+        return supports, candidate_mins
+
+
+    def itemset_min(self, itemset: tuple[int]) -> np.array:
+        '''
+        Returns the min-membership vector of an itemset.
+        '''
+        return np.min(self.rows(list(itemset)), axis=0)
+
 
-        # Add them to the global combination list
-        yield all_combinations
+    def arrays(self) -> dict[str, np.array]:
+        '''
+        Returns the arrays of the table, so that they can be published for other processes. (See parallel.publish_arrays)
+        '''
+        return {'dense': self.dense, 'codes': self.codes}
 
 
-def rule_search(data: pd.DataFrame, fuzzy_variables: dict[fs.fuzzyVariable], support_threshold:float=0.05, max_depth:int=None) -> list:
+    def metadata(self) -> dict:
+        '''
+        Returns the arguments of the constructor that are not arrays.
+        '''
+        return {'items': self.items, 'dense_rows': self.dense_rows, 'code_rows': self.code_rows, 'sample_shape': self.sample_shape}
+
+
+def compute_item_memberships(data: pd.DataFrame, fuzzy_variables: list[fs.fuzzyVariable]) -> ItemMemberships:
     '''
-    Computes the apriori algorithm for the given dataframe and threshold the support.
-    
+    Computes the membership table used to mine the itemsets: the membership of each sample to each item (variable, linguistic variable).
+    Categorical variables are stored as the category index of each sample.
+
     :param data: Dataframe of shape: samples x features
-    :param fuzzy variables: dict that maps each feature name with a fuzzy variable.
-    :param support_threshold: minimum support to consider frequent an itemset.
-    :return: all the frequent itemsets as a list.
+    :param fuzzy_variables: list of the fuzzy variables for each of the input variables.
+    :return: ItemMemberships object.
     '''
-    list_possible_vars = []
+    try:
+        data = data.values
+    except AttributeError:
+        data = np.asarray(data)
+
+    dtype = fs.get_default_dtype()
+    items = []
+    dense = []
+    codes = []
+    dense_rows = []
+    code_rows = []
+    sample_shape = None
     for ix, fuzzy_variable in enumerate(fuzzy_variables):
-        list_possible_vars.append([(ix, ax) for ax in range(len(fuzzy_variable))])
+        memberships = fuzzy_variable.compute_memberships(data[:, ix], dtype=dtype, sparse=True)
+        if isinstance(memberships, fs.categoricalMemberships):
+            codes.append(memberships.codes)
+            for ax in range(len(memberships)):
+                items.append((ix, ax))
+                dense_rows.append(-1)
+                code_rows.append(len(codes) - 1)
+            if memberships.iv:
+                sample_shape = memberships.codes.shape + (2, )
+        else:
+            for ax, membership in enumerate(memberships):
+                items.append((ix, ax))
+                dense_rows.append(len(dense))
+                code_rows.append(-1)
+                dense.append(np.asarray(membership, dtype=dtype))
+
+    if len(dense) > 0:
+        sample_shape = dense[0].shape
+    elif sample_shape is None:
+        sample_shape = (data.shape[0], )
+    dense = np.array(dense, dtype=dtype).reshape((len(dense), ) + tuple(sample_shape))
+    codes = np.array(codes, dtype=np.int64).reshape((len(codes), data.shape[0]))
+
+    return ItemMemberships(items, dense, codes, dense_rows, code_rows, sample_shape)
+
+
+class _ItemsetLevel():
+    '''
+    Frequent itemsets of one level of the search, with their support and min-membership vector.
+    If a capacity is given, at most that number of min-membership vectors is stored: when it is full, only the itemsets
+    with the highest support are kept, and the support threshold is raised to the one of the discarded itemsets.
+    '''
+
+    def __init__(self, row_shape: tuple, dtype: np.dtype, capacity: int=None) -> None:
+        '''
+        :param row_shape: shape of the min-membership vector of one itemset.
+        :param dtype: dtype of the min-membership vectors.
+        :param capacity: maximum number of itemsets stored. If None, there is no limit.
+        '''
+        self.capacity = capacity
+        if capacity is None:
+            self.itemsets = []
+            self.supports = []
+            self.mins = []
+        else:
+            # Memory pages are only used when the rows are written
+            self.itemsets = [None] * capacity
+            self.supports = np.full((capacity, ), -np.inf)
+            self.mins = np.empty((capacity, ) + row_shape, dtype=dtype)
+            self.n_stored = 0
+
+
+    def add(self, itemsets: list[tuple[int]], supports: np.array, mins: np.array, threshold: float) -> float:
+        '''
+        Adds a batch of itemsets. Only the ones with support higher than the threshold are stored.
+
+        :param itemsets: list of tuples with the item indexes of each itemset.
+        :param supports: vector with the support of each itemset.
+        :param mins: array itemsets x samples (x 2) with the min-membership of each itemset.
+        :param threshold: current support threshold.
+        :return: the support threshold, raised if the capacity has been reached.
+        '''
+        selected = np.where(supports > threshold)[0]
+        if len(selected) == 0:
+            return threshold
+
+        if self.capacity is None:
+            self.itemsets.extend([itemsets[ix] for ix in selected])
+            self.supports.append(supports[selected])
+            self.mins.append(mins[selected])
+
+            return threshold
+
+        free_slots = np.where(self.supports == -np.inf)[0]
+        if len(selected) > len(free_slots):
+            # Keep the itemsets with the highest support between the stored ones and the new ones
+            all_supports = np.concatenate([self.supports, supports[selected]])
+            order = np.argsort(-all_supports, kind='stable')
+            threshold = max(threshold, float(np.max(all_supports[order[self.capacity:]])))
+            kept = order[:self.capacity]
+            kept = kept[all_supports[kept] > threshold]
+
+            discarded_slots = np.setdiff1d(np.arange(self.capacity), kept)
+            self.supports[discarded_slots] = -np.inf
+            for slot in discarded_slots:
+                self.itemsets[slot] = None
+            free_slots = np.where(self.supports == -np.inf)[0]
+            selected = selected[kept[kept >= self.capacity] - self.capacity]
+
+        slots = free_slots[:len(selected)]
+        self.mins[slots] = mins[selected]
+        self.supports[slots] = supports[selected]
+        for slot, ix in zip(slots, selected):
+            self.itemsets[slot] = itemsets[ix]
+
+        return threshold
+
+
+    def entries(self) -> tuple[list[tuple[int]], np.array, typing.Iterator[np.array]]:
+        '''
+        Returns the stored itemsets.
+
+        :return: list of itemsets, vector with their supports and iterator over their min-membership vectors.
+        '''
+        if self.capacity is None:
+            supports = np.concatenate(self.supports) if len(self.supports) > 0 else np.zeros((0, ))
+            return self.itemsets, supports, itertools.chain.from_iterable(self.mins)
+        else:
+            stored = np.where(self.supports > -np.inf)[0]
+            return [self.itemsets[ix] for ix in stored], self.supports[stored], (self.mins[ix] for ix in stored)
+
+
+def _itemset_sort_key(items: list[tuple[int, int]]):
+    '''
+    Returns the function used to sort the itemsets by length, variables and linguistic variables.
+    '''
+    return lambda itemset: (len(itemset), tuple(items[item][0] for item in itemset), tuple(items[item][1] for item in itemset))
+
+
+def _iter_frequent_itemsets(item_memberships: ItemMemberships, support_threshold:float, max_depth:int,
+                            top_k:int=None, memory_limit:float=None) -> typing.Iterator[tuple[tuple[int], float]]:
+    '''
+    Level-wise search of the frequent itemsets in a membership table.
+
+    :param item_memberships: ItemMemberships returned by compute_item_memberships.
+    :param support_threshold: minimum support to consider frequent an itemset.
+    :param max_depth: maximum number of items per itemset.
+    :param top_k: if not None, only the top_k itemsets with the highest support are returned. The threshold is raised to the support of the worst one as the heap fills.
+    :param memory_limit: maximum megabytes used to store the min-membership vectors of the itemsets that are extended. If it is reached, the threshold is raised so that only the ones with the highest support are extended.
+    :return: generator of (item indexes, support) tuples. They are sorted by length, variables and linguistic variables, or by decreasing support if top_k is given.
+    '''
+    items = item_memberships.items
+    item_vars = item_memberships.item_vars
+    sort_key = _itemset_sort_key(items)
+    row_shape = item_memberships.sample_shape
+    if memory_limit is not None:
+        # Half of the memory for the parents and half for the new level
+        row_bytes = int(np.prod(row_shape)) * item_memberships.dtype.itemsize
+        capacity = max(1, int(memory_limit * 2**20) // (2 * row_bytes))
+    else:
+        capacity = None
+
+    threshold = support_threshold
+    heap = []
+
+    def _accept(itemsets, supports):
+        # Updates the top k heap and returns the new threshold
+        if top_k is None:
+            return threshold
+
+        new_threshold = threshold
+        for ix in np.argsort(-supports, kind='stable'):
+            if supports[ix] <= new_threshold:
+                break
+            if len(heap) < top_k:
+                heapq.heappush(heap, (float(supports[ix]), itemsets[ix]))
+            else:
+                heapq.heappushpop(heap, (float(supports[ix]), itemsets[ix]))
+            if len(heap) == top_k:
+                new_threshold = max(new_threshold, heap[0][0])
+
+        return new_threshold
+
+    # First level: the single items
+    level = _ItemsetLevel(row_shape, item_memberships.dtype, capacity)
+    supports = item_memberships.supports()
+    singletons = [(ix, ) for ix in range(len(items))]
+    threshold = _accept(singletons, supports)
+    selected = np.where(supports > threshold)[0]
+    threshold = level.add([singletons[ix] for ix in selected], supports[selected], item_memberships.rows(selected), threshold)
+
+    for depth in range(1, max_depth + 1):
+        frequent, frequent_supports, frequent_mins = level.entries()
+        if top_k is None:
+            for itemset, support in sorted(zip(frequent, frequent_supports), key=lambda entry: sort_key(entry[0])):
+                if support > threshold:
+                    yield itemset, float(support)
+        if depth == max_depth or len(frequent) == 0:
+            break
+
+        frequent_set = set(frequent)
+        level = _ItemsetLevel(row_shape, item_memberships.dtype, capacity)
+        for parent, parent_support, parent_min in zip(frequent, frequent_supports, frequent_mins):
+            if parent_support <= threshold:
+                # The threshold has been raised since the parent was found
+                continue
+
+            # Only items of the following variables, so that each itemset is generated once
+            candidates = np.where(item_vars > item_vars[parent[-1]])[0]
+            # Apriori pruning: the candidate is discarded if any of its subsets is not frequent
+            candidates = [int(candidate) for candidate in candidates
+                          if all(parent[:jx] + parent[jx + 1:] + (candidate, ) in frequent_set for jx in range(depth))]
+            if len(candidates) == 0:
+                continue
+
+            candidate_supports, candidate_mins = item_memberships.extend(parent_min, candidates)
+            candidate_itemsets = [parent + (candidate, ) for candidate in candidates]
+
+            threshold = _accept(candidate_itemsets, candidate_supports)
+            selected = np.where(candidate_supports > threshold)[0]
+            if len(selected) > 0:
+                threshold = level.add([candidate_itemsets[ix] for ix in selected], candidate_supports[selected], candidate_mins(selected), threshold)
+
+        del frequent_mins
+    if top_k is not None:
+        for support, itemset in sorted(heap, key=lambda entry: (-entry[0], sort_key(entry[1]))):
+            yield itemset, support
+
+
+def _confidence_lift(item_memberships: ItemMemberships, itemsets: list[tuple[int]], class_samples: np.array) -> tuple[np.array, np.array]:
+    '''
+    Computes the confidence and lift of the rules that have the itemsets as antecedents and a class as consequent.
+
+    :param item_memberships: ItemMemberships returned by compute_item_memberships.
+    :param itemsets: list of tuples with the item indexes of each itemset.
+    :param class_samples: boolean vector with the samples of the class.
+    :return: vectors with the confidence and lift of each rule.
+    '''
+    if len(itemsets) == 0:
+        return np.zeros((0, )), np.zeros((0, ))
+
+    min_memberships = np.array([item_memberships.itemset_min(itemset) for itemset in itemsets])
+    global_support = _itemset_supports(min_memberships)
+    class_support = _itemset_supports(min_memberships[:, class_samples])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        confidence = class_support / global_support
+        lift = confidence / np.mean(class_samples)
 
-    memberships = [fuzzy_variables[ix](data.iloc[:, ix].values) for ix in range(data.shape[1])]
-    freq_itemsets = []
+    return confidence, lift
 
+
+def iter_rule_search(data: pd.DataFrame, fuzzy_variables: list[fs.fuzzyVariable], support_threshold:float=0.05, max_depth:int=None, top_k:int=None,
+                     memory_limit:float=None) -> typing.Iterator[tuple]:
+    '''
+    Generator version of rule_search. The itemsets of each level are returned as soon as the level is finished, so they do not need to be stored.
+
+    :param data: Dataframe of shape: samples x features
+    :param fuzzy variables: list of the fuzzy variables for each of the input variables.
+    :param support_threshold: minimum support to consider frequent an itemset.
+    :param max_depth: maximum number of antecedents per itemset.
+    :param top_k: if not None, only the top_k itemsets with the highest support are returned (in decreasing support order).
+    :param memory_limit: maximum megabytes used to store the itemsets that are extended to the next level. If it is reached, only the ones with the highest support are extended.
+    :return: generator of itemsets, as tuples of (antecedent, linguistic variable value).
+    '''
     if max_depth is None:
         max_depth = data.shape[1]
-    
-    # For all possible lengths
-    for r in range(max_depth):
-        all_r_combs = _generate_combinations(list_possible_vars, r+1)
 
-        # Iterate through the possible itemsets
-        for itemsets in all_r_combs:
-            for ix, itemset in enumerate(itemsets):
-                relevant_memberships = []
-                for item in itemset:
-                    item_var, item_vl = item
-                    relevant_memberships.append([memberships[item_var][item_vl]])
-                
-                array_membership = np.array(relevant_memberships).T[:,0,:]
-                support = np.mean(np.min(array_membership, axis=1))
-                if fuzzy_variables[0].fuzzy_type == fs.FUZZY_SETS.t2 or fuzzy_variables[0].fuzzy_type == fs.FUZZY_SETS.gt2:
-                    support = np.mean(support, axis=1)
+    item_memberships = compute_item_memberships(data, fuzzy_variables)
+    for itemset, _ in _iter_frequent_itemsets(item_memberships, support_threshold, max_depth, top_k=top_k, memory_limit=memory_limit):
+        yield tuple(item_memberships.items[item] for item in itemset)
+
 
-                if support > support_threshold:
-                    freq_itemsets.append(itemset) 
+def rule_search(data: pd.DataFrame, fuzzy_variables: dict[fs.fuzzyVariable], support_threshold:float=0.05, max_depth:int=None, top_k:int=None,
+                memory_limit:float=None) -> list:
+    '''
+    Computes the apriori algorithm for the given dataframe and threshold the support.
 
-    return freq_itemsets
+    The search is level-wise: the candidates of length k are only generated from the frequent itemsets of length k-1, and
+    all their subsets must be frequent. The min-membership of each frequent itemset is kept, so that the support of each candidate
+    costs one np.minimum with the membership of the new item.
+    
+    :param data: Dataframe of shape: samples x features
+    :param fuzzy variables: dict that maps each feature name with a fuzzy variable.
+    :param support_threshold: minimum support to consider frequent an itemset.
+    :param top_k: if not None, only the top_k itemsets with the highest support are returned.
+    :param memory_limit: maximum megabytes used to store the itemsets that are extended to the next level.
+    :return: all the frequent itemsets as a list.
+    '''
+    return list(iter_rule_search(data, fuzzy_variables, support_threshold, max_depth, top_k=top_k, memory_limit=memory_limit))
 
 
 def generate_rules_from_itemsets(itemsets:list, nAnts:int) -> list[rl.RuleSimple]:
@@ -103,7 +501,8 @@ def generate_rules_from_itemsets(itemsets:list, nAnts:int) -> list[rl.RuleSimple
     return rules
 
 
-def mine_rulebase_support(x: pd.DataFrame, fuzzy_variables:list[fs.fuzzyVariable], support_threshold:float=0.05, max_depth:int=3) -> rl.RuleBase:
+def mine_rulebase_support(x: pd.DataFrame, fuzzy_variables:list[fs.fuzzyVariable], support_threshold:float=0.05, max_depth:int=3, top_k:int=None,
+                          memory_limit:float=None) -> rl.RuleBase:
     '''
     Search the data for associations that are frequent given a list of fuzzy variables for each antecedent.
 
@@ -111,14 +510,28 @@ def mine_rulebase_support(x: pd.DataFrame, fuzzy_variables:list[fs.fuzzyVariable
     :param fuzzy_variables: list of the fuzzy variables for each of the input variables.
     :param support_threshold: minimum threshold to decide if prune or not the rule.
     :param max_depth: maximum number of antecedents per rule.
+    :param top_k: if not None, only the top_k rules with the highest support are kept.
+    :param memory_limit: maximum megabytes used to store the itemsets that are extended during the search. If it is reached, only the ones with the highest support are extended.
     :return: a rulebase object with the rules denoted as good.
     '''
     
     if mnt.save_usage_flag:
             mnt.usage_data[mnt.usage_categories.RuleMining]['mine_rulebase'] += 1
             
-    freq_itemsets = rule_search(x, fuzzy_variables, support_threshold, max_depth)
-    rule_list = generate_rules_from_itemsets(freq_itemsets, len(fuzzy_variables))
+    freq_itemsets = iter_rule_search(x, fuzzy_variables, support_threshold, max_depth, top_k=top_k, memory_limit=memory_limit)
+
+    return _itemsets_rulebase(freq_itemsets, fuzzy_variables)
+
+
+def _itemsets_rulebase(itemsets: list, fuzzy_variables: list[fs.fuzzyVariable]) -> rl.RuleBase:
+    '''
+    Creates a rulebase with one rule for each itemset.
+
+    :param itemsets: list of tuple (antecedent, linguistic variable value)
+    :param fuzzy_variables: list of the fuzzy variables for each of the input variables.
+    :return: a rulebase object of the type of the fuzzy variables.
+    '''
+    rule_list = generate_rules_from_itemsets(itemsets, len(fuzzy_variables))
 
     fuzzy_type = fuzzy_variables[0].fs_type
 
@@ -133,7 +546,7 @@ def mine_rulebase_support(x: pd.DataFrame, fuzzy_variables:list[fs.fuzzyVariable
 
 
 def prune_rules_confidence_lift(x: pd.DataFrame, y:np.array, rules: rl.MasterRuleBase, fuzzy_variables: list[fs.fuzzyVariable], confidence_threshold:float=0.5, 
-                                lift_threshold:float=1.05):
+                                lift_threshold:float=1.05, item_memberships: ItemMemberships=None):
     '''
     Removes the rules from the rule base that do not meet a minimum value for confidence and lift measures.
 
@@ -146,36 +559,17 @@ def prune_rules_confidence_lift(x: pd.DataFrame, y:np.array, rules: rl.MasterRul
     :param fuzzy_variables: a list of the fuzzy variables per antecedent.
     :param confidence_threshold: minimum confidence required to the rules.
     :param lift_threshold: minimum lift required to the rules.
+    :param item_memberships: membership table returned by compute_item_memberships. If None, it is computed from x.
     '''
+    table = compute_item_memberships(x, fuzzy_variables) if item_memberships is None else item_memberships
+    item_index = {item: ix for ix, item in enumerate(table.items)}
+
     for ix, rule_base in enumerate(rules):
-        delete_list = []
         relevant_class = ix
-        relevant_class_samples = x.loc[np.equal(y, relevant_class), :]
-
-        for jx, rule in enumerate(rule_base):
-            real_nAnts = sum([ant != -1 for ant in rule])
-            global_membership_array = np.zeros((x.shape[0], real_nAnts))
-            class_samples_membership_array = np.zeros((relevant_class_samples.shape[0], real_nAnts))
-            ant_counter = 0
-            for zx, antecedent in enumerate(rule):
-                if antecedent != -1:
-                    global_membership_array[:, ant_counter] = fuzzy_variables[zx](x[fuzzy_variables[zx].name])[antecedent]
-                    class_samples_membership_array[:, ant_counter] = fuzzy_variables[zx](relevant_class_samples[fuzzy_variables[zx].name])[antecedent]
-                    ant_counter += 1
-
-            # Compute rule confidence
-            global_support = np.mean(np.min(global_membership_array, axis=1), axis=0)
-            class_support = np.mean(np.min(class_samples_membership_array, axis=1), axis=0)
-            if fuzzy_variables[0].fuzzy_type == fs.FUZZY_SETS.t2 or fuzzy_variables[0].fuzzy_type == fs.FUZZY_SETS.gt2:
-                    global_support = np.mean(global_support, axis=1)
-                    class_support = np.mean(class_support, axis=1)
-
-            rule_confidence = class_support / global_support
-            rule_lift = rule_confidence / np.mean(np.equal(relevant_class, y))
-
-            if rule_confidence < confidence_threshold or rule_lift < lift_threshold:
-                delete_list.append(jx)
+        itemsets = [tuple(item_index[(zx, int(antecedent))] for zx, antecedent in enumerate(rule) if antecedent != -1) for rule in rule_base]
+        rule_confidence, rule_lift = _confidence_lift(table, itemsets, np.equal(y, relevant_class))
 
+        delete_list = list(np.where((rule_confidence < confidence_threshold) | (rule_lift < lift_threshold))[0])
         rule_base.remove_rules(delete_list)
 
 
@@ -194,36 +588,118 @@ def simple_mine_rulebase(x: pd.DataFrame, fuzzy_type:fs.FUZZY_SETS=fs.FUZZY_SETS
     return mine_rulebase_support(x, precomputed_partitions, support_threshold, max_depth)
 
 
+_worker_memberships = None
+
+
+def _init_mining_worker(metadata: dict, paths: dict[str, str]) -> None:
+    '''
+    Initializes a mining worker process: opens the shared membership table.
+    '''
+    global _worker_memberships
+
+    _worker_memberships = ItemMemberships(**metadata, **parallel.load_published_arrays(paths))
+
+
+_class_batch_size = 4096 # Number of itemsets whose confidence and lift are computed at once.
+
+
+def _mine_class(class_samples: np.array, support_threshold:float, max_depth:int, confidence_threshold:float, lift_threshold:float,
+                top_k:int=None, top_k_by:str='confidence', memory_limit:float=None, item_memberships: ItemMemberships=None) -> list:
+    '''
+    Mines the frequent itemsets of a class and removes the ones that do not meet the confidence and lift thresholds.
+
+    :param class_samples: boolean vector with the samples of the class.
+    :param top_k: if not None, only the top_k itemsets with the best top_k_by value are kept.
+    :param top_k_by: 'support', 'confidence' or 'lift'.
+    :param memory_limit: maximum megabytes used to store the itemsets that are extended during the search.
+    :param item_memberships: membership table of all the samples. If None, the one of the worker process is used.
+    :return: list of the selected itemsets as tuples of (antecedent, linguistic variable value).
+    '''
+    if item_memberships is None:
+        item_memberships = _worker_memberships
+    items = item_memberships.items
+
+    search = _iter_frequent_itemsets(item_memberships.select_samples(class_samples), support_threshold, max_depth, memory_limit=memory_limit)
+    res = []
+    while True:
+        batch = list(itertools.islice(search, _class_batch_size))
+        if len(batch) == 0:
+            break
+
+        itemsets = [itemset for itemset, _ in batch]
+        rule_confidence, rule_lift = _confidence_lift(item_memberships, itemsets, class_samples)
+        selected = np.where(~((rule_confidence < confidence_threshold) | (rule_lift < lift_threshold)))[0]
+        if top_k is None:
+            res.extend([itemsets[ix] for ix in selected])
+        else:
+            scores = {'support': np.array([support for _, support in batch]), 'confidence': rule_confidence, 'lift': rule_lift}[top_k_by]
+            for ix in selected:
+                if len(res) < top_k:
+                    heapq.heappush(res, (float(scores[ix]), itemsets[ix]))
+                elif scores[ix] > res[0][0]:
+                    heapq.heapreplace(res, (float(scores[ix]), itemsets[ix]))
+
+    if top_k is not None:
+        sort_key = _itemset_sort_key(items)
+        res = [itemset for _, itemset in sorted(res, key=lambda entry: (-entry[0], sort_key(entry[1])))]
+
+    return [tuple(items[item] for item in itemset) for itemset in res]
+
+
+def _mine_class_worker(args: tuple) -> list:
+    '''
+    Mines one class in a worker process.
+    '''
+    return _mine_class(*args)
+
+
 def multiclass_mine_rulebase(x: pd.DataFrame, y: np.array, fuzzy_variables:list[fs.fuzzyVariable], support_threshold:float=0.05, max_depth:int=3,
-                             confidence_threshold:float=0.05, lift_threshold:float=1.05) -> rl.MasterRuleBase:
+                             confidence_threshold:float=0.05, lift_threshold:float=1.05, runner:int=1, top_k:int=None, top_k_by:str='confidence',
+                             memory_limit:float=None) -> rl.MasterRuleBase:
     '''
     Search the data for associations that are frequent and have good confidence/lift values given a list of fuzzy variables for each antecedent. Computes a different ruleBase for each 
     class and then uses them to form a MasterRuleBase.
 
+    The memberships of all the samples are computed once. The mining and the confidence/lift pruning of each class can be run in a pool of processes,
+    that share the membership table through a memory mapped file.
+
     :param x: the data to mine. Dims: samples x features.
     :param fuzzy_variables: list of the fuzzy variables for each of the input variables.
     :param support_threshold: minimum threshold to decide if prune or not the rule.
     :param max_depth: maximum number of antecedents per rule.
     :param confidence_threshold: minimum confidence value.
     :param lift_threshold: 
+    :param runner: number of processes used to mine the classes. If 1 (default) the classes are mined in the calling process.
+    :param top_k: if not None, only the top_k rules of each class with the best top_k_by value are kept.
+    :param top_k_by: 'confidence' (default), 'lift' or 'support'.
+    :param memory_limit: maximum megabytes used to store the itemsets that are extended during the search of each class. If it is reached, only the ones with the highest support are extended.
     :return: a rulebase object with the rules denoted as good.
     '''
+    if top_k_by not in ('support', 'confidence', 'lift'):
+        raise ValueError('Unknown top_k_by: ' + str(top_k_by) + '. Use "support", "confidence" or "lift".')
+
     unique_classes = np.unique(y)
-    rulebases = []
-    for yclass in unique_classes:
-        selected_samples = np.equal(yclass, y) 
-        selected_x = x.loc[selected_samples, :]
+    item_memberships = compute_item_memberships(x, fuzzy_variables)
+    tasks = [(np.equal(yclass, y), support_threshold, max_depth, confidence_threshold, lift_threshold, top_k, top_k_by, memory_limit) for yclass in unique_classes]
+
+    if runner > 1 and len(tasks) > 1:
+        folder = tempfile.mkdtemp(prefix='ex_fuzzy_')
+        try:
+            paths = parallel.publish_arrays(item_memberships.arrays(), folder)
+            with multiprocessing.get_context().Pool(min(runner, len(tasks)), initializer=_init_mining_worker, initargs=(item_memberships.metadata(), paths)) as pool:
+                class_itemsets = pool.map(_mine_class_worker, tasks)
+        finally:
+            shutil.rmtree(folder, True)
+    else:
+        class_itemsets = [_mine_class(*task, item_memberships=item_memberships) for task in tasks]
 
-        rulebase = mine_rulebase_support(selected_x, fuzzy_variables, support_threshold, max_depth)
-        rulebases.append(rulebase)
+    rulebases = [_itemsets_rulebase(itemsets, fuzzy_variables) for itemsets in class_itemsets]
 
-    master_rulebase = rl.MasterRuleBase(rulebases, list(map(str, unique_classes)))
-    prune_rules_confidence_lift(x, y, master_rulebase, fuzzy_variables, confidence_threshold, lift_threshold)
-    return master_rulebase
+    return rl.MasterRuleBase(rulebases, list(map(str, unique_classes)))
 
 
 def simple_multiclass_mine_rulebase(x: pd.DataFrame, y: np.array, fuzzy_type:fs.FUZZY_SETS, support_threshold:float=0.05, max_depth:int=3,
-                                    confidence_threshold:float=0.5, lift_threshold:float=1.1) -> rl.MasterRuleBase:
+                                    confidence_threshold:float=0.5, lift_threshold:float=1.1, runner:int=1) -> rl.MasterRuleBase:
     '''
     Search the data for associations that are frequent and have good confidence/lift values given a list of fuzzy variables for each antecedent. 
     Computes a different ruleBase for each class and then uses them to form a MasterRuleBase.
@@ -234,13 +710,9 @@ def simple_multiclass_mine_rulebase(x: pd.DataFrame, y: np.array, fuzzy_type:fs.
     :param fuzzy_type: fuzzy type to use.
     :param support_threshold: minimum threshold to decide if prune or not the rule.
     :param max_depth: maximum number of antecedents per rule.
+    :param runner: number of processes used to mine the classes.
     :return: a rulebase object with the rules denoted as good.
     '''
     precomputed_partitions = utils.construct_partitions(x, fuzzy_type)
     return multiclass_mine_rulebase(x, y, precomputed_partitions, support_threshold, max_depth, 
-                                    confidence_threshold=confidence_threshold, lift_threshold=lift_threshold)
-
-
-
-
-
+                                    confidence_threshold=confidence_threshold, lift_threshold=lift_threshold, runner=runner)
@@ -5,35 +5,229 @@ This is a the source file that contains the Rule, RuleBase and MasterRuleBase cl
 """
 import abc
 import numbers
+from typing import Generator
 
 import numpy as np
 try:
     from . import fuzzy_sets as fs
     from . import centroid
+    from . import kernels
 except ImportError:
     import fuzzy_sets as fs
     import centroid
+    import kernels
 
 modifiers_names = {0.5: 'Somewhat', 1.0: '', 1.3: 'A little', 1.7: 'Slightly', 2.0: 'Very', 3.0: 'Extremely', 4.0: 'Very very'}
 
-def compute_antecedents_memberships(antecedents: list[fs.fuzzyVariable], x: np.array) -> list[dict]:
+def compute_antecedents_memberships(antecedents: list[fs.fuzzyVariable], x: np.array, dtype=None, store=None) -> list[dict]:
         '''
         Returns a list of of dictionaries that contains the memberships for each x value to the ith antecedents, nth linguistic variable.
         x must be a vector (only one sample)
 
         :param x: vector with the values of the inputs.
-        :return: a list with the antecedent truth values for each one. Each list is comprised of a list with n elements, where n is the number of linguistic variables in each variable.
+        :param dtype: floating point type of the memberships. If None, the default one is used. (See fuzzy_sets.set_default_dtype)
+        :param store: cache.MembershipStore. If given, the memberships of each variable are read from it (and saved in it if they were not there).
+        :return: a list with the antecedent truth values for each one. Each list is comprised of a list with n elements, where n is the number of linguistic variables in each variable. (Categorical variables are given as fuzzy_sets.categoricalMemberships)
         '''
         x = np.array(x)
         cache_antecedent_memberships = []
 
         for ix, antecedent in enumerate(antecedents):
-            cache_antecedent_memberships.append(
-                antecedent.compute_memberships(x[:, ix]))
+            if store is not None:
+                cache_antecedent_memberships.append(store.compute_memberships(antecedent, x[:, ix], dtype=dtype))
+            else:
+                cache_antecedent_memberships.append(
+                    antecedent.compute_memberships(x[:, ix], dtype=dtype, sparse=True))
 
         return cache_antecedent_memberships
 
-        
+
+class StackedMemberships():
+    '''
+    Stacked memberships of a set of variables where some of them are categorical.
+    The categorical variables are stored as the index of the category of each sample, and their slots in the dense tensor are empty.
+    '''
+
+    def __init__(self, dense: np.array, codes: np.array, categorical: np.array) -> None:
+        '''
+        :param dense: array features x (max_labels + 1) x samples (x 2) with the memberships of the non categorical variables.
+        :param codes: integer array features x samples with the category index of the categorical variables (-1 for no category).
+        :param categorical: boolean vector with the categorical variables.
+        '''
+        self.dense = dense
+        self.codes = codes
+        self.categorical = categorical
+
+
+    @property
+    def shape(self) -> tuple:
+        return self.dense.shape
+
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.dense.dtype
+
+
+    def astype(self, dtype, copy=True) -> 'StackedMemberships':
+        return StackedMemberships(self.dense.astype(dtype, copy=copy), self.codes, self.categorical)
+
+
+def stack_antecedent_memberships(antecedents_memberships: list[list[np.array]], dtype=None) -> np.array:
+    '''
+    Stacks the memberships computed by compute_antecedents_memberships into one single tensor.
+
+    The result has shape features x (max_labels + 1) x samples (x 2 for t2) (x alpha_cuts x 2 for gt2).
+    Variables with less linguistic variables than the maximum are padded with zeros, and the
+    last slot of the label axis is filled with ones, so that the -1 (don't care) antecedent code
+    indexes a neutral membership for the t-norm.
+
+    If some variables are categorical (given as fuzzy_sets.categoricalMemberships), the result is a StackedMemberships object:
+    their category codes are kept instead of one dense slot per category, so that their number of categories does not increase the size of the tensor.
+
+    :param antecedents_memberships: list with the memberships of each variable. Each element is a list with one array per linguistic variable.
+    :param dtype: floating point type of the result. If None, arrays are returned as they are and lists are stacked with the default dtype. (See fuzzy_sets.set_default_dtype)
+    :return: array with the stacked memberships.
+    '''
+    if isinstance(antecedents_memberships, (np.ndarray, StackedMemberships)):
+        return antecedents_memberships if dtype is None else antecedents_memberships.astype(dtype, copy=False)
+
+    dtype = fs.get_default_dtype() if dtype is None else np.dtype(dtype)
+    categorical = np.array([isinstance(variable, fs.categoricalMemberships) for variable in antecedents_memberships], dtype=bool)
+    memberships = [[] if categorical[ix] else [np.asarray(membership, dtype=dtype) for membership in variable] for ix, variable in enumerate(antecedents_memberships)]
+    max_labels = max(len(variable) for variable in memberships)
+    if np.all(categorical):
+        first = antecedents_memberships[0]
+        sample_shape = first.codes.shape + ((2, ) if first.iv else ())
+    else:
+        sample_shape = memberships[np.argmin(categorical)][0].shape
+
+    stacked = np.zeros((len(memberships), max_labels + 1) + sample_shape, dtype=dtype)
+    for ix, variable in enumerate(memberships):
+        for jx, membership in enumerate(variable):
+            stacked[ix, jx] = membership
+
+    stacked[:, -1] = 1.0
+
+    if not np.any(categorical):
+        return stacked
+
+    codes = np.zeros((len(memberships), sample_shape[0]), dtype=np.int64)
+    for ix in np.where(categorical)[0]:
+        codes[ix] = antecedents_memberships[ix].codes
+
+    return StackedMemberships(stacked, codes, categorical)
+
+
+def select_samples(stacked_memberships: np.array, rows: np.array) -> np.array:
+    '''
+    Returns the stacked antecedent memberships of a subset of the samples.
+
+    :param stacked_memberships: array (or StackedMemberships) returned by stack_antecedent_memberships.
+    :param rows: indexes (or boolean mask) of the samples to keep.
+    :return: stacked memberships of the selected samples, of the same kind as the given ones.
+    '''
+    if isinstance(stacked_memberships, StackedMemberships):
+        return StackedMemberships(stacked_memberships.dense[:, :, rows], stacked_memberships.codes[:, rows], stacked_memberships.categorical)
+
+    return stacked_memberships[:, :, rows]
+
+
+def compute_rules_firing(stacked_memberships: np.array, antecedents: np.array, modifiers: np.array=None, tnorm=np.prod) -> np.array:
+    '''
+    Computes the firing strength of a set of rules using the stacked antecedent memberships.
+
+    Only the active antecedents of each rule are gathered (padded up to the largest rule with the neutral slot),
+    so all the rules are computed with one gather and one t-norm reduction.
+    If the numba backend is active (see the kernels module) and the t-norm is the product or the minimum, a compiled kernel
+    computes the same values without the gathered array.
+
+    :param stacked_memberships: array (or StackedMemberships) returned by stack_antecedent_memberships.
+    :param antecedents: integer matrix rules x features with the linguistic variable of each antecedent (-1 for don't care).
+    :param modifiers: matrix rules x features with the modifier exponent of each antecedent (-1 means no modifier). None means no modifiers at all.
+    :param tnorm: t-norm to use. It must accept an axis parameter.
+    :return: array in shape samples x rules (x 2) (x alpha_cuts x 2)
+    '''
+    antecedents = np.asarray(antecedents, dtype=int).reshape((-1, stacked_memberships.shape[0]))
+    n_rules = antecedents.shape[0]
+    sample_shape = stacked_memberships.shape[2:]
+
+    if n_rules == 0:
+        return np.zeros((sample_shape[0], 0) + sample_shape[1:], dtype=stacked_memberships.dtype)
+
+    if isinstance(stacked_memberships, StackedMemberships):
+        codes, categorical = stacked_memberships.codes, stacked_memberships.categorical
+        stacked_memberships = stacked_memberships.dense
+    else:
+        codes, categorical = None, None
+
+    if kernels.use_numba() and kernels.tnorm_code(tnorm) >= 0 and stacked_memberships.dtype == np.float64 and codes is None:
+        return kernels.rules_firing(stacked_memberships, antecedents, modifiers, kernels.tnorm_code(tnorm))
+
+    active = antecedents >= 0
+    n_active = np.sum(active, axis=1)
+    n_slots = max(int(np.max(n_active)), 1)
+
+    # Active antecedents first (keeping their order), padded with the neutral slot.
+    order = np.argsort(~active, axis=1, kind='stable')[:, :n_slots]
+    valid_slot = np.arange(n_slots)[np.newaxis, :] < n_active[:, np.newaxis]
+    features = np.where(valid_slot, order, 0)
+    labels = np.where(valid_slot, np.take_along_axis(antecedents, order, axis=1), -1)
+
+    if codes is not None:
+        # Categorical antecedents are computed from the category codes, their dense slot is the neutral one
+        categorical_slot = valid_slot & categorical[features]
+        categorical_memberships = np.equal(codes[features[categorical_slot]], labels[categorical_slot][:, np.newaxis])
+        labels = np.where(categorical_slot, -1, labels)
+
+    gathered = stacked_memberships[features, labels]
+    if codes is not None and np.any(categorical_slot):
+        gathered[categorical_slot] = categorical_memberships.reshape(categorical_memberships.shape + (1, ) * (len(sample_shape) - 1))
+
+    if modifiers is not None:
+        modifiers = np.asarray(modifiers, dtype=float).reshape(antecedents.shape)
+        slot_modifiers = np.take_along_axis(modifiers, order, axis=1)
+        slot_modifiers = np.where(valid_slot & (slot_modifiers != -1), slot_modifiers, 1.0).astype(gathered.dtype)
+        if np.any(slot_modifiers != 1.0):
+            slot_modifiers = slot_modifiers.reshape(slot_modifiers.shape + (1,) * len(sample_shape))
+            gathered = gathered ** slot_modifiers
+
+    firing = tnorm(gathered, axis=1)
+    firing[n_active == 0] = 0.0
+
+    return np.ascontiguousarray(np.moveaxis(firing, 0, 1))
+
+
+def iter_chunks(X, chunk_size: int=10000) -> Generator[np.array, None, None]:
+    '''
+    Splits the input data in chunks of at most chunk_size samples, so that they can be processed with bounded memory.
+
+    :param X: array samples x features, path to a .npy file (it is memory mapped), pandas dataframe or
+    iterable of arrays/dataframes (for example, the chunks of pandas.read_csv with chunksize).
+    :param chunk_size: maximum number of samples in each chunk.
+    :return: generator of arrays chunk samples x features.
+    '''
+    if chunk_size <= 0:
+        raise ValueError('The chunk size must be a positive integer.')
+
+    if isinstance(X, str) and X.endswith('.npy'):
+        X = np.load(X, mmap_mode='r')
+    elif isinstance(X, (list, tuple)) and len(X) > 0 and np.ndim(X[0]) == 1:
+        # List of samples, not of chunks
+        X = np.asarray(X)
+
+    if hasattr(X, 'iloc'):
+        # Pandas dataframe
+        for ix in range(0, X.shape[0], chunk_size):
+            yield X.iloc[ix:ix + chunk_size].values
+    elif isinstance(X, np.ndarray):
+        # The slices of memory mapped arrays are only read when converted
+        for ix in range(0, X.shape[0], chunk_size):
+            yield np.asarray(X[ix:ix + chunk_size])
+    else:
+        for chunk in X:
+            yield from iter_chunks(chunk if hasattr(chunk, 'iloc') else np.asarray(chunk), chunk_size)
+
             
 class RuleError(Exception):
     '''
@@ -206,6 +400,8 @@ class RuleBase():
     Class optimized to work with multiple rules at the same time. Right now supports only one consequent. (Solution: use one rulebase per consequent to study)
     '''
 
+    dtype = None # Floating point type of the memberships. If None, fuzzy_sets.get_default_dtype() is used.
+
     def __init__(self, antecedents: list[fs.fuzzyVariable], rules: list[RuleSimple], consequent: fs.fuzzyVariable=None, tnorm=np.prod) -> None:
         '''
         Creates a rulebase with the given antecedents, rules and consequent.
@@ -353,17 +549,26 @@ class RuleBase():
                     x = x.values
 
                 cache_antecedent_memberships.append(
-                    antecedent.compute_memberships(x[:, ix]))
+                    antecedent.compute_memberships(x[:, ix], dtype=self.get_dtype(), sparse=True))
 
             return cache_antecedent_memberships
 
         else:
             if self.fuzzy_type() == fs.FUZZY_SETS.t1:
-                return [np.zeros((x.shape[0], 1))]
+                return [np.zeros((x.shape[0], 1), dtype=self.get_dtype())]
             elif self.fuzzy_type() == fs.FUZZY_SETS.t2:
-                return [np.zeros((x.shape[0], 1, 2))]
+                return [np.zeros((x.shape[0], 1, 2), dtype=self.get_dtype())]
             elif self.fuzzy_type() == fs.FUZZY_SETS.gt2:
-                return [np.zeros((x.shape[0], len(self.alpha_cuts), 2))]
+                return [np.zeros((x.shape[0], len(self.alpha_cuts), 2), dtype=self.get_dtype())]
+
+
+    def get_dtype(self) -> np.dtype:
+        '''
+        Returns the floating point type used for the memberships and firing strengths of the rulebase.
+
+        :return: numpy dtype.
+        '''
+        return fs.get_default_dtype() if self.dtype is None else np.dtype(self.dtype)
 
 
     def compute_rule_antecedent_memberships(self, x: np.array, scaled=False, antecedents_memberships:list[np.array]=None) -> np.array:
@@ -374,59 +579,24 @@ class RuleBase():
 
         :param x: array with the values of the inputs.
         :param scaled: if True, the memberships are scaled according to their sums for each sample.
+        :param antecedents_memberships: precomputed antecedent memberships. Either the list returned by compute_antecedents_memberships or the array returned by stack_antecedent_memberships.
         :return: array with the memberships of the antecedents for each rule.
         '''
-        if self.fuzzy_type() == fs.FUZZY_SETS.t2:
-            res = np.zeros((x.shape[0], len(self.rules), 2))
-        elif self.fuzzy_type() == fs.FUZZY_SETS.t1:
-            res = np.zeros((x.shape[0], len(self.rules), ))
-        elif self.fuzzy_type() == fs.FUZZY_SETS.gt2:
-            res = np.zeros(
-                (x.shape[0], len(self.rules), len(self.alpha_cuts), 2))
+        if len(self.rules) == 0:
+            if self.fuzzy_type() == fs.FUZZY_SETS.t2:
+                return np.zeros((x.shape[0], 0, 2), dtype=self.get_dtype())
+            elif self.fuzzy_type() == fs.FUZZY_SETS.t1:
+                return np.zeros((x.shape[0], 0), dtype=self.get_dtype())
+            elif self.fuzzy_type() == fs.FUZZY_SETS.gt2:
+                return np.zeros((x.shape[0], 0, len(self.alpha_cuts), 2), dtype=self.get_dtype())
 
         if antecedents_memberships is None:
             antecedents_memberships = self.compute_antecedents_memberships(x)
-        
-        for jx, rule in enumerate(self.rules):
-            rule_antecedents = rule.antecedents
-            try:
-                fuzzy_modifier = rule.modifiers
-            except AttributeError:
-                fuzzy_modifier = None
-
-            if self.fuzzy_type() == fs.FUZZY_SETS.t1:
-                membership = np.zeros((x.shape[0], len(rule_antecedents)))
-            elif self.fuzzy_type() == fs.FUZZY_SETS.t2:
-                membership = np.zeros((x.shape[0], len(rule_antecedents), 2))
-            elif self.fuzzy_type() == fs.FUZZY_SETS.gt2:
-                membership = np.zeros(
-                    (x.shape[0], len(rule_antecedents), len(self.alpha_cuts), 2))
-
-            n_nonvl = 0
-            for ix, vl in enumerate(rule_antecedents):
-                if vl >= 0:
-                    membership_antecedent = list(antecedents_memberships[ix])[vl]
-
-                    if fuzzy_modifier is not None:
-                        if fuzzy_modifier[ix] != -1:
-                            membership[:, ix] = membership_antecedent**fuzzy_modifier[ix]
-                        else:
-                            membership[:, ix] = membership_antecedent
-                    else:
-                        membership[:, ix] = membership_antecedent
-
-                    n_nonvl += 1
-                else:
-                    membership[:, ix] = 1.0
-
-            if n_nonvl == 0:
-                membership[:, ix] = 0.0
 
-            membership = self.tnorm(membership, axis=1)
-            try:
-                res[:, jx] = membership
-            except UnboundLocalError:
-                pass  # All the antecedents are dont care.
+        # Precomputed arrays keep their own dtype
+        stacked_memberships = stack_antecedent_memberships(antecedents_memberships, dtype=None if isinstance(antecedents_memberships, (np.ndarray, StackedMemberships)) else self.get_dtype())
+        antecedent_matrix, modifiers_matrix = self._rules_matrices()
+        res = compute_rules_firing(stacked_memberships, antecedent_matrix, modifiers_matrix, self.tnorm)
 
         if scaled:
             if self.fuzzy_type() == fs.FUZZY_SETS.t1:
@@ -459,6 +629,27 @@ class RuleBase():
         return res
 
 
+    def _rules_matrices(self) -> tuple[np.array, np.array]:
+        '''
+        Returns the antecedent and modifier matrices (rules x features) of the rules in the rulebase.
+        If no rule has modifiers, the modifiers matrix is None.
+
+        :return: tuple with the antecedents matrix and the modifiers matrix.
+        '''
+        n_features = len(self.antecedents)
+        antecedent_matrix = np.array([rule.antecedents for rule in self.rules], dtype=int).reshape((len(self.rules), n_features))
+
+        modifiers_matrix = None
+        for ix, rule in enumerate(self.rules):
+            fuzzy_modifier = getattr(rule, 'modifiers', None)
+            if fuzzy_modifier is not None:
+                if modifiers_matrix is None:
+                    modifiers_matrix = -np.ones(antecedent_matrix.shape)
+                modifiers_matrix[ix] = fuzzy_modifier
+
+        return antecedent_matrix, modifiers_matrix
+
+
     def print_rules(self, return_rules:bool=False) -> None:
         '''
         Print the rules from the rule base.
@@ -633,7 +824,9 @@ class RuleBaseT2(RuleBase):
     This class supports iv approximation for t2 fs.
     '''
 
-    def __init__(self, antecedents: list[fs.fuzzyVariable], rules: list[RuleSimple], consequent: fs.fuzzyVariable = None, tnorm=np.prod) -> None:
+    type_reducer = 'km' # Type reduction method used in the regression inference. (One of centroid.type_reducers)
+
+    def __init__(self, antecedents: list[fs.fuzzyVariable], rules: list[RuleSimple], consequent: fs.fuzzyVariable = None, tnorm=np.prod, type_reducer: str='km') -> None:
         '''
         Constructor of the RuleBaseT2 class.
 
@@ -641,12 +834,18 @@ class RuleBaseT2(RuleBase):
         :param rules: list of rules.
         :param consequent: fuzzy variable that is the consequent of the rules.
         :param tnorm: t-norm used to compute the fuzzy output.
+        :param type_reducer: type reduction method: 'km' (Karnik and Mendel), 'ekm' (Enhanced KM), 'nie_tan' or 'wu_mendel' (uncertainty bounds).
+        The last two are closed formulas, faster but approximated.
         '''
+        if type_reducer not in centroid.type_reducers:
+            raise ValueError('Unknown type reducer ' + str(type_reducer) + '. Supported: ' + ', '.join(centroid.type_reducers))
+
         rules = self.delete_rule_duplicates(rules)
         self.rules = rules
         self.antecedents = antecedents
         self.consequent = consequent
         self.tnorm = tnorm
+        self.type_reducer = type_reducer
 
         if consequent is not None:
             self.consequent_centroids = np.zeros(
@@ -669,24 +868,23 @@ class RuleBaseT2(RuleBase):
                     consequent_ix = rule.consequent
                     self.consequent_centroids_rules[ix] = self.consequent_centroids[consequent_ix]
 
+            # The KM type reduction needs the centroids sorted: the orders are computed once here
+            self.consequent_centroids_orders = centroid.centroid_orders(self.consequent_centroids_rules)
+
 
     def inference(self, x: np.array) -> np.array:
         '''
-        Computes the iv output of the t2 inference system.
+        Computes the iv output of the t2 inference system, type reducing all the samples at the same time.
 
         Return an array in shape samples x 2 (last is iv dimension)
 
         :param x: array with the values of the inputs.
         :return: array with the memberships of the consequents for each sample.
         '''
-        res = np.zeros((x.shape[0], 2))
-
         antecedent_memberships = self.compute_rule_antecedent_memberships(x)
-        for sample in range(antecedent_memberships.shape[0]):
-            res[sample, :] = centroid.consequent_centroid(
-                antecedent_memberships[sample], self.consequent_centroids_rules)
 
-        return res
+        return centroid.type_reduction(antecedent_memberships, self.consequent_centroids_rules, self.type_reducer,
+                                       orders=getattr(self, 'consequent_centroids_orders', None))
 
 
     def forward(self, x: np.array) -> np.array:
@@ -698,7 +896,7 @@ class RuleBaseT2(RuleBase):
         :param x: array with the values of the inputs.
         :return: array with the deffuzified output for each sample.
         '''
-        return np.mean(self.inference(x))
+        return np.mean(self.inference(x), axis=1)
 
 
     def fuzzy_type(self) -> fs.FUZZY_SETS:
@@ -715,24 +913,50 @@ class RuleBaseGT2(RuleBase):
     Class optimized to work with multiple rules at the same time. Supports only one consequent. 
     (Use one rulebase per consequent to study classification problems. Check MasterRuleBase class for more documentation)
 
-    This class supports gt2 fs. (ONLY FOR CLASSIFICATION PROBLEMS)
+    This class supports gt2 fs. For regression, each alpha cut is type reduced as an iv rule base (alpha planes),
+    with iv or gt2 consequents.
     '''
 
-    def __init__(self, antecedents: list[fs.fuzzyVariable], rules: list[RuleSimple], consequent: fs.fuzzyVariable = None, tnorm=np.prod) -> None:
+    type_reducer = 'km' # Type reduction method of each alpha cut in the regression inference. (One of centroid.type_reducers)
+
+    def __init__(self, antecedents: list[fs.fuzzyVariable], rules: list[RuleSimple], consequent: fs.fuzzyVariable = None, tnorm=np.prod, type_reducer: str='km') -> None:
         '''
         Constructor of the RuleBaseGT2 class.
 
         :param antecedents: list of fuzzy variables that are the antecedents of the rules.
         :param rules: list of rules.
-        :param consequent: fuzzy variable that is the consequent of the rules.
+        :param consequent: fuzzy variable that is the consequent of the rules. ONLY on regression problems.
         :param tnorm: t-norm used to compute the fuzzy output.
+        :param type_reducer: type reduction method used in each alpha cut. (Check RuleBaseT2)
         '''
+        if type_reducer not in centroid.type_reducers:
+            raise ValueError('Unknown type reducer ' + str(type_reducer) + '. Supported: ' + ', '.join(centroid.type_reducers))
+
         rules = self.delete_rule_duplicates(rules)
         self.rules = rules
         self.antecedents = antecedents
         self.consequent = consequent
         self.tnorm = tnorm
         self.alpha_cuts = antecedents[0][0].alpha_cuts
+        self.type_reducer = type_reducer
+
+        if consequent is not None:
+            self.consequent_centroids = np.zeros((len(consequent.linguistic_variable_names()), 2))
+
+            for ix, vl_consequent in enumerate(consequent.linguistic_variables):
+                consequent_domain = vl_consequent.domain
+                domain_linspace = np.arange(consequent_domain[0], consequent_domain[1], 0.05)
+                consequent_memberships = vl_consequent.membership(domain_linspace)
+                if vl_consequent.type() == fs.FUZZY_SETS.gt2:
+                    # points x alpha cuts x 2 -> points x 2
+                    consequent_memberships = np.sum(np.array(vl_consequent.alpha_cuts)[np.newaxis, :, np.newaxis] * consequent_memberships, axis=1) / np.sum(vl_consequent.alpha_cuts)
+
+                self.consequent_centroids[ix, :] = centroid.compute_centroid_iv(domain_linspace, consequent_memberships)
+
+            self.consequent_centroids_rules = np.zeros((len(self.rules), 2))
+            for ix, rule in enumerate(self.rules):
+                self.consequent_centroids_rules[ix] = self.consequent_centroids[rule.consequent]
+            self.consequent_centroids_orders = centroid.centroid_orders(self.consequent_centroids_rules)
 
         try:
             # We try to get the modifiers from the rules, else, we will use the ones given in the constructor.
@@ -743,21 +967,23 @@ class RuleBaseGT2(RuleBase):
 
     def inference(self, x: np.array) -> np.array:
         '''
-        Computes the output of the gt2 inference system.
+        Computes the output of the gt2 inference system. The iv firing strengths of each alpha cut are type reduced
+        for all the samples and alpha cuts at the same time, and the resulting centroid of each alpha cut is defuzzified to its middle point.
 
         Return an array in shape samples x alpha_cuts
 
         :param x: array with the values of the inputs.
-        :return: array with the memberships of the consequents for each sample.
+        :return: array with the output of each alpha cut for each sample.
         '''
-        res = np.zeros((x.shape[0], 2))
+        antecedent_memberships = self.alpha_compute_rule_antecedent_memberships(x, scaled=False)
+        n_samples, n_rules, n_alpha_cuts = antecedent_memberships.shape[0:3]
 
-        antecedent_memberships = self.compute_rule_antecedent_memberships(x)
-        for sample in range(antecedent_memberships.shape[0]):
-            res[sample, :] = centroid.consequent_centroid(
-                antecedent_memberships[sample], self.consequent_centroids_rules)
+        # samples x rules x alpha cuts x 2 -> (samples * alpha cuts) x rules x 2
+        alpha_planes = np.swapaxes(antecedent_memberships, 1, 2).reshape((n_samples * n_alpha_cuts, n_rules, 2))
+        res = centroid.type_reduction(alpha_planes, self.consequent_centroids_rules, self.type_reducer,
+                                      orders=getattr(self, 'consequent_centroids_orders', None))
 
-        return res
+        return np.mean(res, axis=1).reshape((n_samples, n_alpha_cuts))
 
 
     def _alpha_reduction(self, x) -> np.array:
@@ -774,7 +1000,7 @@ class RuleBaseGT2(RuleBase):
 
     def forward(self, x: np.array) -> np.array:
         '''
-        Computes the deffuzified output of the t2 inference system.
+        Computes the deffuzified output of the gt2 inference system: the mean of the outputs of the alpha cuts, weighted by the alpha values.
 
         Return a vector of size (samples, )
 
@@ -864,22 +1090,16 @@ class RuleBaseT1(RuleBase):
 
     def inference(self, x: np.array) -> np.array:
         '''
-        Computes the output of the t1 inference system.
+        Computes the output of the t1 inference system for all the samples at the same time.
 
-        Return an array in shape samples.
+        Return an array in shape samples. Samples where no rule fires get a 0 output.
 
         :param x: array with the values of the inputs.
         :return: array with the output of the inference system for each sample.
         '''
-        res = np.zeros((x.shape[0]))
-
         antecedent_memberships = self.compute_rule_antecedent_memberships(x)
 
-        for sample in range(antecedent_memberships.shape[0]):
-            res[sample] = centroid.center_of_masses(
-                self.consequent_centroids_rules, antecedent_memberships[sample])
-
-        return res
+        return centroid.batch_center_of_masses(self.consequent_centroids_rules, antecedent_memberships)
 
     def forward(self, x: np.array) -> np.array:
         '''
@@ -908,11 +1128,14 @@ class MasterRuleBase():
     This Class encompasses a list of rule bases where each one corresponds to a different class.
     '''
 
-    def __init__(self, rule_base: list[RuleBase], consequent_names: list[str]=None, ds_mode: int = 0, allow_unknown:bool=False) -> None:
+    dtype = None # Floating point type of the memberships and firing strengths. If None, fuzzy_sets.get_default_dtype() is used.
+
+    def __init__(self, rule_base: list[RuleBase], consequent_names: list[str]=None, ds_mode: int = 0, allow_unknown:bool=False, dtype=None) -> None:
         '''
         Constructor of the MasterRuleBase class.
 
         :param rule_base: list of rule bases.
+        :param dtype: floating point type of the memberships and firing strengths (np.float32 or np.float64). If None, the default one is used.
         '''
         if len(rule_base) == 0:
             raise RuleError('No rule bases given!')
@@ -926,6 +1149,23 @@ class MasterRuleBase():
             self.consequent_names = consequent_names
         self.ds_mode = ds_mode
         self.allow_unknown = allow_unknown
+        self._consequents_cache = None
+        if dtype is not None:
+            self.set_dtype(dtype)
+
+
+    def set_dtype(self, dtype) -> None:
+        '''
+        Sets the floating point type of the memberships and firing strengths in all the rule bases.
+
+        :param dtype: numpy floating point type. (np.float32 or np.float64) None to use the default one.
+        '''
+        if dtype is not None and np.dtype(dtype).kind != 'f':
+            raise ValueError('The dtype must be a floating point type, got ' + str(np.dtype(dtype)))
+
+        self.dtype = dtype
+        for rule_base in self.rule_bases:
+            rule_base.dtype = dtype
 
 
     def rename_cons(self, consequent_names: list[str]) -> None:
@@ -943,15 +1183,32 @@ class MasterRuleBase():
         :param consequent: index of the rule base to add the rule.
         '''
         self.rule_bases[consequent].add_rule(rule)
+        self._consequents_cache = None
     
 
+    def _consequents_index(self) -> np.array:
+        '''
+        Returns an array with the index of the consequent of each rule.
+        The array is cached, and it is computed again when the number of rules in any rule base changes.
+
+        :return: integer array of shape rules.
+        '''
+        rule_base_sizes = tuple(len(rule_base) for rule_base in self.rule_bases)
+        cached = getattr(self, '_consequents_cache', None)
+        if cached is None or cached[0] != rule_base_sizes:
+            cached = (rule_base_sizes, np.repeat(np.arange(len(self.rule_bases)), rule_base_sizes))
+            self._consequents_cache = cached
+
+        return cached[1]
+
+
     def get_consequents(self) -> list[int]:
         '''
         Returns a list with the consequents of each rule base.
 
         :return: list with the consequents of each rule base.
         '''
-        return sum([[ix]*len(x) for ix, x in enumerate(self.rule_bases)], [])
+        return self._consequents_index().tolist()
 
 
     def get_consequents_names(self) -> list[str]:
@@ -1018,8 +1275,8 @@ class MasterRuleBase():
         return np.concatenate(aux, axis=1)
 
 
-    def _winning_rules(self, X: np.array, precomputed_truth=None, allow_unkown=True) -> np.array:
-        association_degrees = self.compute_association_degrees(X, precomputed_truth)
+    def _winning_rules(self, X: np.array, precomputed_truth=None, allow_unkown=True, firing_strengths: np.array=None) -> np.array:
+        association_degrees = self.compute_association_degrees(X, precomputed_truth, firing_strengths=firing_strengths)
 
         winning_rules = np.argmax(association_degrees, axis=1)
 
@@ -1030,17 +1287,19 @@ class MasterRuleBase():
         return winning_rules
 
 
-    def compute_association_degrees(self, X, precomputed_truth=None):
+    def compute_association_degrees(self, X, precomputed_truth=None, firing_strengths: np.array=None):
         '''
         Returns the winning rule for each sample. Takes into account dominance scores if already computed.
         :param X: array with the values of the inputs.
+        :param firing_strengths: if not None, the firing strengths of the rules for X are already computed.
         :return: array with the winning rule for each sample.
         '''
-        
-        firing_strengths = self.compute_firing_strenghts(X, precomputed_truth=precomputed_truth)
+        if firing_strengths is None:
+            firing_strengths = self.compute_firing_strenghts(X, precomputed_truth=precomputed_truth)
 
+        # The weights are cast so that the association degrees keep the dtype of the firing strengths
         if self.ds_mode == 0:
-            rulesw = self.get_scores()
+            rulesw = self.get_scores().astype(firing_strengths.dtype, copy=False)
             if self.fuzzy_type() == fs.FUZZY_SETS.t2 and len(rulesw.shape) == 1:
                 rulesw = rulesw[None, :, None]
                 
@@ -1048,7 +1307,7 @@ class MasterRuleBase():
         elif self.ds_mode == 1:
             association_degrees = firing_strengths
         elif self.ds_mode == 2:
-            rulesw = self.get_weights()
+            rulesw = self.get_weights().astype(firing_strengths.dtype, copy=False)
             if self.fuzzy_type() == fs.FUZZY_SETS.t2:
                 rulesw = rulesw[None, :, None] 
             
@@ -1062,45 +1321,65 @@ class MasterRuleBase():
         return association_degrees
     
     
-    def winning_rule_predict(self, X: np.array, precomputed_truth=None, out_class_names=False) -> np.array:
+    def winning_rule_predict(self, X: np.array, precomputed_truth=None, out_class_names=False, firing_strengths: np.array=None) -> np.array:
         '''
         Returns the winning rule for each sample. Takes into account dominance scores if already computed.
 
         :param X: array with the values of the inputs.
         :param precomputed_truth: if not None, the antecedent memberships are already computed. (Used for sped up in genetic algorithms)
+        :param firing_strengths: if not None, the firing strengths of the rules for X are already computed.
         :return: array with the winning rule for each sample.
         '''
+        consequents = self._consequents_index()
         # Raise an error if there no rules
-        if len(self.get_rules()) == 0:
+        if len(consequents) == 0:
             raise RuleError('No rules to predict!')
-        
-        if out_class_names:
-            consequents = sum([[self.consequent_names[ix]]*len(self[ix].rules)
-                          for ix in range(len(self.rule_bases))], [])  # The sum is for flatenning the list
-        else:
-            consequents = sum([[ix]*len(self[ix].rules)
-                          for ix in range(len(self.rule_bases))], [])  # The sum is for flatenning the list
             
-        winning_rules = self._winning_rules(X, precomputed_truth=precomputed_truth, allow_unkown=self.allow_unknown)
+        winning_rules = self._winning_rules(X, precomputed_truth=precomputed_truth, allow_unkown=self.allow_unknown, firing_strengths=firing_strengths)
+        unknown = np.any(winning_rules == -1)
 
+        # The last position of the lookup array is used for the samples without winning rule (index -1)
         if out_class_names:
-            res = []
+            names = list(self.consequent_names) + (['Unknown'] if unknown else [])
+            return np.array(names)[np.append(consequents, len(names) - 1)[winning_rules]]
         else:
-            res = np.zeros((X.shape[0], ))
-
-        for ix, winning_rule in enumerate(winning_rules):
-            if winning_rule != -1:
-                if out_class_names:
-                    res.append(consequents[winning_rule])
-                else:
-                    res[ix] = consequents[winning_rule]
+            return np.append(consequents, -1).astype(np.float64)[winning_rules]
+
+
+    def iter_predict(self, X, chunk_size: int=10000, out_class_names=False, return_association_degrees=False) -> Generator[np.array, None, None]:
+        '''
+        Predicts the samples chunk by chunk. The memory used is bounded by the chunk size, not by the number of samples.
+
+        :param X: array samples x features, path to a .npy file (it is memory mapped), pandas dataframe or iterable of arrays/dataframes.
+        :param chunk_size: maximum number of samples predicted at once.
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :param return_association_degrees: if True, the association degrees (chunk samples x rules) are also returned.
+        :return: generator with the predictions of each chunk (and the association degrees if return_association_degrees).
+        '''
+        for chunk in iter_chunks(X, chunk_size):
+            firing_strengths = self.compute_firing_strenghts(chunk)
+            predictions = self.winning_rule_predict(chunk, out_class_names=out_class_names, firing_strengths=firing_strengths)
+
+            if return_association_degrees:
+                yield predictions, self.compute_association_degrees(chunk, firing_strengths=firing_strengths)
             else:
-                if out_class_names:
-                    res.append('Unknown')
-                else:
-                    res[ix] = -1
+                yield predictions
+
+
+    def predict_chunked(self, X, chunk_size: int=10000, out_class_names=False) -> np.array:
+        '''
+        Returns the prediction for each sample, computed chunk by chunk. (See iter_predict)
+
+        :param X: array samples x features, path to a .npy file (it is memory mapped), pandas dataframe or iterable of arrays/dataframes.
+        :param chunk_size: maximum number of samples predicted at once.
+        :param out_class_names: if True, the output will be the class names instead of the class index.
+        :return: array with the prediction for each sample.
+        '''
+        predictions = list(self.iter_predict(X, chunk_size, out_class_names=out_class_names))
+        if len(predictions) == 0:
+            return np.array([])
 
-        return np.array(res)
+        return np.concatenate(predictions)
 
 
     def add_rule_base(self, rule_base: RuleBase) -> None:
@@ -1110,6 +1389,9 @@ class MasterRuleBase():
         :param rule_base: rule base to add.
         '''
         self.rule_bases.append(rule_base)
+        self._consequents_cache = None
+        if self.dtype is not None:
+            rule_base.dtype = self.dtype
 
         if len(self.rule_bases) != len(self.consequent_names):
             # We did not give proper names to the consequents
@@ -1162,6 +1444,8 @@ class MasterRuleBase():
         for ruleBase in self.rule_bases:
             ruleBase.prune_bad_rules(tolerance)
 
+        self._consequents_cache = None
+
 
     def __getitem__(self, item) -> RuleBase:
         '''
@@ -1233,6 +1517,21 @@ class MasterRuleBase():
         return self.rule_bases
 
 
+    def compile(self):
+        '''
+        Returns a frozen version of the rule base for fast inference. It gives the same predictions,
+        but it does not reflect later changes in the rule base.
+
+        :return: FrozenRuleModel object.
+        '''
+        try:
+            from . import frozen_model
+        except ImportError:
+            import frozen_model
+
+        return frozen_model.FrozenRuleModel(self)
+
+
     def n_linguistic_variables(self) -> list[int]:
         '''
         Returns the number of linguistic variables in the rule base.
@@ -26,14 +26,12 @@ try:
     from . import maintenance as mnt
     from . import rules as rl
     from . import evolutionary_fit as evf
-    from . import vis_rules
     from . import eval_rules as evr
 except:
     import fuzzy_sets as fs
     import maintenance as mnt
     import rules as rl
     import evolutionary_fit as evf
-    import vis_rules
     import eval_rules as evr
 
 
@@ -149,12 +147,14 @@ class temporalFuzzyVariable(fs.fuzzyVariable):
         self.time = time
 
 
-    def compute_memberships(self, x: np.array, time: int=None) -> dict:
+    def compute_memberships(self, x: np.array, time: int=None, dtype=None, sparse=False) -> dict:
         '''
         Computes the membership to each of the FS in the fuzzy variables.
 
         :param x: numeric value or array. Computes the membership to each of the IVFS in the fuzzy variables.
         :param time: int. Time moment to compute the membership.
+        :param dtype: floating point type of the membership arrays. If None, the default one is used. (See fuzzy_sets.set_default_dtype)
+        :param sparse: ignored. Temporal memberships are always dense.
         :return: list of floats. Membership to each of the FS in the fuzzy variables.
         '''
         if time is None:
@@ -162,9 +162,13 @@ class temporalFuzzyVariable(fs.fuzzyVariable):
             time = self.time
 
         res = []
+        dtype = fs.get_default_dtype() if dtype is None else np.dtype(dtype)
 
         for fuzzy_set in self.linguistic_variables:
-            res.append(fuzzy_set.membership(x, time))
+            membership = fuzzy_set.membership(x, time)
+            if isinstance(membership, np.ndarray) and membership.dtype.kind == 'f':
+                membership = membership.astype(dtype, copy=False)
+            res.append(membership)
 
         return res
     
@@ -471,7 +475,8 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
             lv.fix_time(time)
 
 
-    def fit(self, X: np.array, y: np.array, n_gen:int=50, pop_size:int=10, time_moments: np.array=None, checkpoints:int=0):
+    def fit(self, X: np.array, y: np.array, n_gen:int=50, pop_size:int=10, time_moments: np.array=None, checkpoints:int=0,
+            max_time:float=None, patience:int=None, target_fitness:float=None):
         '''
         Fits a fuzzy rule based classifier using a genetic algorithm to the given data.
 
@@ -480,7 +485,11 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
         :param n_gen: integer. Number of generations to run the genetic algorithm.
         :param pop_size: integer. Population size for each gneration.
         :param time_moments: array of integers. Time moments associated to each sample (when temporal dependencies are present)
-        :return: None. The classifier is fitted to the data.
+        :param checkpoints: integer. Number of checkpoints to save the best rulebase found so far.
+        :param max_time: float. Time budget in seconds, shared by the optimizations of all the time moments. If None (default) there is no budget.
+        :param patience: integer. Stop the optimization of a time moment when its best fitness has not improved for these generations. If None (default) it is not checked.
+        :param target_fitness: float. Stop the optimization of a time moment when its best fitness reaches this value. If None (default) it is not checked.
+        :return: None. The classifier is fitted to the data. The reason to stop and the generations run for each time moment are stored in stop_reason and n_gen_used.
         '''
         problems = []
         for ix in range(len(np.unique(time_moments))):
@@ -507,7 +516,13 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
 
         best_individuals = []
         self.performance = {}
+        self.stop_reason = {}
+        self.n_gen_used = {}
+        start_time = None
         for time, problem in enumerate(problems):
+            termination = evf.FitTermination(n_gen, max_time=max_time, patience=patience, target_fitness=target_fitness, start_time=start_time)
+            start_time = termination.start_time
+
             algorithm = GA(
             pop_size=pop_size,
             sampling=IntegerRandomSampling(),
@@ -520,8 +535,9 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
                     print('=================================================')
                     print('n_gen  |  n_eval  |     f_avg     |     f_min    ')
                     print('=================================================')
-                algorithm.setup(problem, seed=33, termination=('n_gen', n_gen)) # 33? Soon...
-                for k in range(n_gen):
+                algorithm.setup(problem, seed=33, termination=termination) # 33? Soon...
+                k = 0
+                while algorithm.has_next():
                     algorithm.next()
                     res = algorithm
                     if self.verbose:
@@ -543,13 +559,14 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
                             rule_base.purge_rules(self.tolerance)
                             checkpoint_rules = rule_base.print_rules(True)
                             f.write(checkpoint_rules)     
+                    k += 1
 
             else:
                 res = minimize(problem,
                             algorithm,
-                            # termination,
-                            ("n_gen", n_gen),
+                            termination,
                             copy_algorithm=False,
+                            copy_termination=False,
                             save_history=False,
                             verbose=self.verbose)
 
@@ -564,6 +581,8 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
 
         
             self.performance[time] = 1 - fitness_last_gen[best_solution]
+            self.stop_reason[time] = termination.reason
+            self.n_gen_used[time] = termination.n_gen_used
 
         try:
             self.var_names = list(X.columns)
@@ -605,6 +624,12 @@ class TemporalFuzzyRulesClassifier(evf.BaseFuzzyRulesClassifier):
         '''
         Plot the fuzzy partitions in each fuzzy variable.
         '''
+        # Imported here: matplotlib and networkx are only loaded when something is plotted
+        try:
+            from . import vis_rules
+        except ImportError:
+            import vis_rules
+
         fuzzy_variables = self.rule_base.rule_bases[0].antecedents
 
         for ix, fv in enumerate(fuzzy_variables):
@@ -674,6 +699,10 @@ def eval_temporal_fuzzy_model(fl_classifier: evf.BaseFuzzyRulesClassifier, X_tra
             print('------------')
 
     if plot_rules:
+        try:
+            from . import vis_rules
+        except ImportError:
+            import vis_rules
         vis_rules.visualize_rulebase(fl_classifier)
     if print_rules or return_rules:
         res = fl_classifier.print_rules(return_rules)
@@ -432,7 +432,7 @@ def construct_crisp_categorical_partition(x: np.array, name: str, fz_type_studie
         if fz_type_studied == fs.FUZZY_SETS.t1:
             aux = fs.categoricalFS(str(value), value)
         elif fz_type_studied == fs.FUZZY_SETS.t2 or fz_type_studied == fs.FUZZY_SETS.gt2:
-            aux = fs.categoricalIVFS(str(value), np.unique(x))
+            aux = fs.categoricalIVFS(str(value), value)
 
         fuzzy_sets.append(aux)
 
@@ -455,7 +455,7 @@ def construct_conditional_frequencies(X: np.array, discrete_time_labels: list[in
         if fset.type() == fs.FUZZY_SETS.t2:
             memberships[:, ix] = np.mean(fset.membership(X), axis=1)
         elif fset.type() == fs.FUZZY_SETS.gt2:
-            memberships[:, ix] = np.mean(np.squeeze(fset._alpha_reduction(fset.membership(X))), axis=1)
+            memberships[:, ix] = np.mean(fset.reduced_membership(X), axis=1)
         else:
             memberships[:, ix] = fset.membership(X)
     
@@ -0,0 +1,215 @@
+import os
+import tempfile
+
+import numpy as np
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+
+def test_lru_cache():
+    '''
+    Tests that the LRU cache keeps the most recently used entries and counts hits and misses.
+    '''
+    lru = ex_fuzzy.cache.LRUCache(2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1, 'Stored value not returned'
+    lru.put('c', 3)
+
+    assert len(lru) == 2, 'Cache grows over its maximum size'
+    assert 'b' not in lru, 'Least recently used entry not evicted'
+    assert lru.get('b') is None, 'Evicted entry returned'
+    assert lru.hits == 1 and lru.misses == 1, 'Wrong hit/miss count'
+    assert lru.stats()['hit_rate'] == 0.5, 'Wrong hit rate'
+
+
+def test_fitness_cache():
+    '''
+    Tests that the fitness cache gives the same fitness as the plain evaluation and detects rule-equivalent individuals.
+    '''
+    sample = np.random.random_sample((200, 4))
+    targets = np.random.randint(0, 2, 200)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions, allow_unknown=True)
+    cached_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions, allow_unknown=True, fitness_cache=100)
+    population = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+
+    # Swapping the first two rules gives the same rulebase
+    swapped = population[0].copy()
+    for section in range(2):
+        start = section * problem.nAnts * problem.nRules
+        swapped[start:start + 2 * problem.nAnts] = np.concatenate([population[0][start + problem.nAnts:start + 2 * problem.nAnts], population[0][start:start + problem.nAnts]])
+    consequents_pointer = 2 * problem.nAnts * problem.nRules
+    swapped[consequents_pointer:consequents_pointer + 2] = population[0][consequents_pointer:consequents_pointer + 2][::-1]
+    population = np.concatenate([population, population[:5], swapped[np.newaxis]])
+
+    assert np.allclose(problem.evaluate(population), cached_problem.evaluate(population)), 'Cached fitness differs from the evaluated one'
+    assert cached_problem.fitness_cache.hits >= 6, 'Repeated individuals not found in the cache'
+    assert len(cached_problem.fitness_cache) <= 20, 'Repeated individuals stored twice'
+
+
+def test_cached_fitness():
+    '''
+    Tests the cache lookups shared by the problems and the process runner: repeated individuals are evaluated once,
+    and the values marked as not cacheable are not stored.
+    '''
+    sample = np.random.random_sample((200, 4))
+    targets = np.random.randint(0, 2, 200)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions, fitness_cache=100)
+    population = np.random.randint(problem.xl, problem.xu + 1, size=(10, problem.n_var))
+    population = np.concatenate([population, population[:3]])
+
+    evaluated = []
+    def evaluate(x):
+        evaluated.append(len(x))
+        return np.arange(len(x), dtype=float), np.arange(len(x)) % 2 == 0
+
+    values = ex_fuzzy.cache.cached_fitness(problem, population, evaluate)
+    assert values[10:] == values[:3], 'Repeated individuals got different values'
+    assert evaluated == [len(set(problem._fitness_keys(population)))], 'Repeated individuals evaluated twice'
+    assert len(problem.fitness_cache) == (evaluated[0] + 1) // 2, 'Values not marked as cacheable were stored'
+
+    runner = ex_fuzzy.parallel.ProcessRunner(2)
+    process_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions,
+                                                            fitness_cache=100, thread_runner=runner)
+    serial_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions)
+    try:
+        for _ in range(2):
+            assert np.allclose(process_problem.evaluate(population), serial_problem.evaluate(population)), 'Process pool cached fitness differs'
+    finally:
+        runner.close()
+    assert process_problem.fitness_cache.hits == len(population), 'Evaluated individuals not found in the cache of the process runner'
+
+
+def test_membership_store():
+    '''
+    Tests that the membership store gives the same memberships as computing them, reads them back from disk and evicts the least recently used files.
+    '''
+    sample = np.random.random_sample((200, 4))
+    sample[:, 2] = np.random.randint(0, 30, 200)
+    categorical_mask = np.array([False, False, True, False])
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = ex_fuzzy.cache.MembershipStore(folder)
+        for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+            vl_partitions = ex_fuzzy.utils.construct_partitions(sample, fz_type, categorical_mask=categorical_mask)
+            reference = ex_fuzzy.rules.stack_antecedent_memberships(ex_fuzzy.rules.compute_antecedents_memberships(vl_partitions, sample))
+            for _ in range(2):
+                stored = ex_fuzzy.rules.stack_antecedent_memberships(ex_fuzzy.rules.compute_antecedents_memberships(vl_partitions, sample, store=store))
+                assert np.array_equal(stored.dense, reference.dense) and np.array_equal(stored.codes, reference.codes), 'Stored memberships differ from the computed ones'
+
+        assert store.hits == 8 and store.misses == 8, 'Memberships not read from the store'
+        assert isinstance(store.get(store.key(vl_partitions[0], sample[:, 0])), np.memmap), 'Memberships are not memory mapped'
+
+        # Same data and partitions with other names: same key. Other data: another key
+        renamed = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2, categorical_mask=categorical_mask)
+        renamed[0].name = 'renamed'
+        assert store.key(renamed[0], sample[:, 0]) == store.key(vl_partitions[0], sample[:, 0]), 'Names change the key'
+        assert store.key(vl_partitions[0], sample[:, 1]) != store.key(vl_partitions[0], sample[:, 0]), 'Different data give the same key'
+        assert store.key(vl_partitions[0], sample[:, 0], np.float32) != store.key(vl_partitions[0], sample[:, 0]), 'Different dtypes give the same key'
+
+        store.invalidate(store.key(vl_partitions[0], sample[:, 0]))
+        assert store.get(store.key(vl_partitions[0], sample[:, 0])) is None, 'Invalidated entry returned'
+        store.invalidate()
+        assert len(os.listdir(folder)) == 0, 'Store not emptied'
+
+        column_bytes = store.put('a', sample[:, 0]).nbytes
+        small_store = ex_fuzzy.cache.MembershipStore(folder, max_bytes=int(2.5 * (column_bytes + 128)))
+        small_store.put('b', sample[:, 1])
+        os.utime(os.path.join(folder, 'a.npy'), (0, 0))
+        small_store.put('c', sample[:, 2])
+        assert small_store.nbytes() <= small_store.max_bytes, 'Store grows over its maximum size'
+        assert small_store.get('a') is None, 'Least recently used entry not evicted'
+        assert small_store.get('b') is not None and small_store.get('c') is not None, 'Recently used entries evicted'
+
+
+def test_fit_membership_store():
+    '''
+    Tests that the genetic problems built with a membership store have the same memberships and fitness as the ones built without it.
+    '''
+    sample = np.random.random_sample((200, 4))
+    targets = np.random.randint(0, 2, 200)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = ex_fuzzy.cache.MembershipStore(folder)
+        problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions)
+        for _ in range(2):
+            stored_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions, membership_store=store)
+            assert np.array_equal(stored_problem._precomputed_truth, problem._precomputed_truth), 'Stored memberships differ from the computed ones'
+        assert store.hits == 4, 'Memberships not reused in the second fit'
+
+        population = np.random.randint(problem.xl, problem.xu + 1, size=(10, problem.n_var))
+        assert np.array_equal(problem.evaluate(population), stored_problem.evaluate(population)), 'Fitness with stored memberships differs'
+
+
+def test_firing_cache():
+    '''
+    Tests that the firing cache gives the same fitness as the plain batch evaluation, that offspring only compute their changed rules,
+    and that the cache stays under its memory bound.
+    '''
+    sample = np.random.random_sample((200, 4))
+    targets = np.random.randint(0, 2, 200)
+    for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+        vl_partitions = ex_fuzzy.utils.construct_partitions(sample, fz_type)
+        problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions,
+                                                        encode_mods=True, batch_fitness=True)
+        cached_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions,
+                                                               encode_mods=True, batch_fitness=True, firing_cache=2**20)
+        parents = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+        assert np.array_equal(problem.evaluate(parents), cached_problem.evaluate(parents)), 'Cached firing changes the fitness'
+        computed = cached_problem.firing_cache.misses
+
+        # Children with the class of one rule swapped have the same rules as their parents
+        children = parents.copy()
+        consequents_pointer = 2 * problem.nAnts * problem.nRules
+        children[:, consequents_pointer] = np.where(children[:, consequents_pointer] >= 0, 1 - children[:, consequents_pointer], -1)
+        assert np.array_equal(problem.evaluate(children), cached_problem.evaluate(children)), 'Cached firing changes the fitness'
+        assert cached_problem.firing_cache.misses == computed, 'Firing of the parents rules computed again'
+
+    # Memory bound and eviction of the rules that left the population
+    firing_cache = ex_fuzzy.cache.FiringCache(max_bytes=3 * 100 * 8, max_age=1)
+    firing = firing_cache.columns(np.arange(5)[:, np.newaxis], lambda missing: np.tile(missing[:, 0].astype(float), (100, 1)))
+    assert np.array_equal(firing[0], np.arange(5)), 'Wrong columns'
+    assert firing_cache.nbytes() <= firing_cache.max_bytes and len(firing_cache) == 3, 'Cache grows over its maximum size'
+    firing = firing_cache.columns(np.array([[4], [7]]), lambda missing: np.tile(missing[:, 0].astype(float), (100, 1)))
+    assert np.array_equal(firing[-1], [4, 7]), 'Wrong columns'
+    assert firing_cache.hits == 1 and len(firing_cache) == 2, 'Columns of rules out of the population not evicted'
+
+
+def test_membership_cache():
+    '''
+    Tests that the membership cache of the optimized linguistic variables gives the same fitness as computing the memberships,
+    and that individuals sharing the membership parameters of a variable reuse its memberships.
+    '''
+    sample = np.random.random_sample((200, 4))
+    targets = np.random.randint(0, 2, 200)
+    for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+        problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, fuzzy_type=fz_type, n_linguistic_variables=3)
+        cached_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=6, nAnts=2, n_classes=2, fuzzy_type=fz_type, n_linguistic_variables=3, membership_cache=50)
+        population = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+        # The second half only changes the rules, so all its memberships are reused
+        population[10:, 2 * problem.nAnts * problem.nRules:] = population[:10, 2 * problem.nAnts * problem.nRules:]
+
+        assert np.array_equal(problem.evaluate(population), cached_problem.evaluate(population)), 'Cached memberships change the fitness'
+        stats = cached_problem.membership_cache_stats()
+        # (Individuals without rules are not evaluated, so only the misses have a fixed bound)
+        assert stats['misses'] <= 10 * sample.shape[1] and stats['hits'] > 0, 'Shared membership parameters not found in the cache'
+        assert stats['size'] <= 10 * sample.shape[1], 'Repeated membership parameters stored twice'
+
+    assert problem.membership_cache_stats() is None, 'Membership cache enabled by default'
+
+
+if __name__ == '__main__':
+    test_lru_cache()
+    test_fitness_cache()
+    test_cached_fitness()
+    test_membership_store()
+    test_fit_membership_store()
+    test_firing_cache()
+    test_membership_cache()
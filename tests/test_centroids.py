@@ -26,3 +26,95 @@ def test_t2_centroid_centroids():
     assert math.isclose(ex_fuzzy.centroid.compute_centroid_t2_l(z, trial_fs(z)), 0.5, abs_tol=0.01), 'T2 centroid left not correctly computed'
 
 
+
+
+def _exhaustive_centroid(antecedent_memberships: np.array, centroids: np.array) -> np.array:
+    '''
+    Computes the KM centroid trying all the switch points.
+    '''
+    res = np.zeros((antecedent_memberships.shape[0], 2))
+    for sample, memberships in enumerate(antecedent_memberships):
+        if np.sum(memberships[:, 1]) == 0:
+            continue
+
+        for endpoint, (before, after) in enumerate([(1, 0), (0, 1)]):
+            order = np.argsort(centroids[:, endpoint])
+            z = centroids[order, endpoint]
+            candidates = []
+            for switch in range(len(z) + 1):
+                weights = np.concatenate([memberships[order, before][:switch], memberships[order, after][switch:]])
+                if np.sum(weights) > 0:
+                    candidates.append(z @ weights / np.sum(weights))
+            res[sample, endpoint] = min(candidates) if endpoint == 0 else max(candidates)
+
+    return res
+
+
+def test_batched_type_reduction():
+    '''
+    Tests that the batched KM and EKM give the exact centroid, and that the closed form type reducers are consistent with it.
+    '''
+    for n_rules in [1, 3, 20]:
+        centroids = np.sort(np.random.random_sample((n_rules, 2)) * 10, axis=1)
+        upper = np.random.random_sample((300, n_rules)) * (np.random.random_sample((300, n_rules)) > 0.4)
+        lower = upper * np.random.random_sample((300, n_rules)) * (np.random.random_sample((300, n_rules)) > 0.3)
+        upper[:5] = 0 # Samples where no rule fires
+        lower[:5] = 0
+        antecedent_memberships = np.stack([lower, upper], axis=2)
+        exhaustive = _exhaustive_centroid(antecedent_memberships, centroids)
+
+        for method in ['km', 'ekm']:
+            assert np.allclose(ex_fuzzy.centroid.type_reduction(antecedent_memberships, centroids, method, chunk_size=128), exhaustive), method + ' centroid not correctly computed'
+
+        nie_tan = ex_fuzzy.centroid.type_reduction(antecedent_memberships, centroids, 'nie_tan')
+        assert np.all(nie_tan[:, 0] >= exhaustive[:, 0] - 1e-9) and np.all(nie_tan[:, 0] <= exhaustive[:, 1] + 1e-9), 'Nie-Tan output outside the KM centroid'
+
+        # With equal lower and upper memberships all the type reducers give the center of masses
+        t1_memberships = np.stack([upper, upper], axis=2)
+        center_of_masses = np.array([[upper_row @ centroids[:, 0] / np.sum(upper_row), upper_row @ centroids[:, 1] / np.sum(upper_row)] if np.sum(upper_row) > 0 else [0, 0] for upper_row in upper])
+        for method in ex_fuzzy.centroid.type_reducers:
+            reduced = ex_fuzzy.centroid.type_reduction(t1_memberships, centroids, method)
+            expected = np.mean(center_of_masses, axis=1, keepdims=True) if method == 'nie_tan' else center_of_masses
+            assert np.allclose(reduced, expected * np.ones((1, 2))), method + ' does not reduce to the center of masses'
+
+
+def test_rulebase_t2_type_reducer():
+    '''
+    Tests the batched inference of the t2 rule bases against the centroids computed trying all the switch points.
+    '''
+    food = ex_fuzzy.fuzzy_sets.fuzzyVariable('Food', [ex_fuzzy.fuzzy_sets.IVFS('Rancid', [0, 0, 0.5, 4.5], [0, 0, 1, 5], [0, 9]),
+                                                        ex_fuzzy.fuzzy_sets.IVFS('Delicious', [4.5, 8.5, 9, 9], [4, 8, 9, 9], [0, 9])])
+    service = ex_fuzzy.fuzzy_sets.fuzzyVariable('Service', [ex_fuzzy.fuzzy_sets.IVFS('Poor', [0, 0, 0.5, 2.5], [0, 0, 1, 3], [0, 9]),
+                                                              ex_fuzzy.fuzzy_sets.IVFS('Good', [1.5, 3.5, 4.5, 6.5], [1, 3, 5, 7], [0, 9]),
+                                                              ex_fuzzy.fuzzy_sets.IVFS('Excellent', [5.5, 7.5, 9, 9], [5, 7, 9, 9], [0, 9])])
+    tip = ex_fuzzy.fuzzy_sets.fuzzyVariable('Tip', [ex_fuzzy.fuzzy_sets.IVFS('Cheap', [2, 6, 6, 10], [0, 6, 6, 12], [0, 30]),
+                                                      ex_fuzzy.fuzzy_sets.IVFS('Average', [12, 15, 15, 18], [10, 15, 15, 20], [0, 30]),
+                                                      ex_fuzzy.fuzzy_sets.IVFS('Generous', [20, 24, 24, 28], [18, 24, 24, 30], [0, 30])])
+    rule_list = [ex_fuzzy.rules.RuleSimple([0, 0], 0), ex_fuzzy.rules.RuleSimple([0, 1], 0), ex_fuzzy.rules.RuleSimple([0, 2], 1),
+                 ex_fuzzy.rules.RuleSimple([1, 0], 1), ex_fuzzy.rules.RuleSimple([1, 1], 1), ex_fuzzy.rules.RuleSimple([1, 2], 2)]
+    x = np.random.random_sample((200, 2)) * 9
+
+    rule_base = ex_fuzzy.rules.RuleBaseT2([food, service], rule_list, tip)
+    antecedent_memberships = rule_base.compute_rule_antecedent_memberships(x)
+    assert np.allclose(rule_base.inference(x), _exhaustive_centroid(antecedent_memberships, rule_base.consequent_centroids_rules)), 'Batched KM centroid not correctly computed'
+    assert rule_base.forward(x).shape == (200, ), 'Wrong output shape'
+
+    km_centroids = rule_base.inference(x)
+    assert np.allclose(ex_fuzzy.rules.RuleBaseT2([food, service], rule_list, tip, type_reducer='ekm').inference(x), km_centroids), 'EKM differs from KM'
+    nie_tan = ex_fuzzy.rules.RuleBaseT2([food, service], rule_list, tip, type_reducer='nie_tan').forward(x)
+    assert np.all(nie_tan >= km_centroids[:, 0] - 1e-9) and np.all(nie_tan <= km_centroids[:, 1] + 1e-9), 'Nie-Tan output outside the KM centroid'
+    wu_mendel = ex_fuzzy.rules.RuleBaseT2([food, service], rule_list, tip, type_reducer='wu_mendel').inference(x)
+    assert np.all(wu_mendel[:, 0] <= wu_mendel[:, 1] + 1e-9) and np.all(wu_mendel >= 0) and np.all(wu_mendel <= 30), 'Wrong Wu-Mendel centroids'
+
+    try:
+        ex_fuzzy.rules.RuleBaseT2([food, service], rule_list, tip, type_reducer='unknown')
+        assert False, 'Unknown type reducer accepted'
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    test_t2_centroid()
+    test_t2_centroid_centroids()
+    test_batched_type_reduction()
+    test_rulebase_t2_type_reducer()
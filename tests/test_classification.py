@@ -1,4 +1,7 @@
 
+import os
+import tempfile
+
 import numpy as np
 import pandas as pd
 import math
@@ -49,8 +52,273 @@ def test_random_classification_gt2():
 def test_random_classification_gt2_precomputed():
     test_random_classification_precomputed(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
 
+def test_batch_fitness(fs_type=ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1):
+    sample = np.random.random_sample((300, 4))
+    targets = np.random.randint(0, 3, 300)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, fs_type)
+
+    for ds_mode in [0, 1, 2]:
+        problem_args = dict(nRules=15, nAnts=3, n_classes=3, linguistic_variables=vl_partitions, tolerance=0.01, alpha=0.1, beta=0.05,
+                            ds_mode=ds_mode, encode_mods=True, allow_unknown=ds_mode == 1)
+        problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, **problem_args)
+        batch_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, batch_fitness=True, **problem_args)
+
+        population = np.random.randint(problem.xl, problem.xu + 1, size=(30, problem.n_var))
+        assert np.allclose(problem.evaluate(population), batch_problem.evaluate(population)), 'Batched fitness differs from the elementwise fitness'
+
+
+def test_batch_fitness_t2():
+    test_batch_fitness(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+
+
+def test_process_runner():
+    sample = np.random.random_sample((300, 4))
+    targets = np.random.randint(0, 2, 300)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    runner = ex_fuzzy.parallel.ProcessRunner(2)
+
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=10, nAnts=3, n_classes=2, linguistic_variables=vl_partitions)
+    process_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=10, nAnts=3, n_classes=2, linguistic_variables=vl_partitions, thread_runner=runner)
+    population = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+    try:
+        assert np.allclose(problem.evaluate(population), process_problem.evaluate(population)), 'Process pool fitness differs from the serial fitness'
+    finally:
+        runner.close()
+
+    assert runner.pool is None, 'Process pool not released'
+
+
+def test_runner_batch_fitness():
+    '''
+    Tests that asking for a pool of workers with the batch fitness, which never uses it, is rejected.
+    '''
+    for runner_backend in ['thread', 'process']:
+        try:
+            ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, runner=2, runner_backend=runner_backend, batch_fitness=True)
+            assert False, 'A runner was accepted with batch_fitness'
+        except ValueError:
+            pass
+
+
+def test_random_classification_batch_fitness():
+    sample = np.random.random_sample((sample_size, 5))
+    targets = np.random.randint(0, 2, sample_size)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    model = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, verbose=False, tolerance=0.0, linguistic_variables=vl_partitions, batch_fitness=True)
+    model.fit(sample, targets, n_gen=20, pop_size=60)
+    predictions = model.predict(sample)
+    assert math.isclose(np.mean(np.equal(predictions, targets)), 0.5, abs_tol=0.1)
+
+
+def test_fitness_sample():
+    '''
+    Tests the mini-batch fitness: the batch is stratified, the fitness is the one of a problem built with the batch,
+    and the full data is restored when the sampling stops.
+    '''
+    sample = np.random.random_sample((400, 4))
+    targets = np.random.choice(3, 400, p=[0.6, 0.3, 0.1])
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    problem_args = dict(nRules=10, nAnts=3, n_classes=3, linguistic_variables=vl_partitions, batch_fitness=True)
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, fitness_sample=100, random_state=0, **problem_args)
+    population = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+
+    for _ in range(2):
+        assert problem.X.shape[0] == 100 and problem.subsampled(), 'Wrong mini-batch size'
+        assert np.all(np.abs(np.bincount(problem.y, minlength=3) - np.bincount(targets, minlength=3) / 4) <= 1), 'Mini-batch not stratified'
+        batch_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(problem.X, problem.y, **problem_args)
+        assert np.allclose(problem.evaluate(population), batch_problem.evaluate(population)), 'Mini-batch fitness differs'
+        problem.resample()
+
+    full_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, **problem_args)
+    problem.use_full_data()
+    assert not problem.subsampled() and problem.X.shape[0] == 400, 'Full data not restored'
+    assert np.allclose(problem.evaluate(population), full_problem.evaluate(population)), 'Full data fitness differs'
+
+
+def test_fitness_race():
+    '''
+    Tests that the race gives the full data fitness to the individuals that are not dropped, and that it drops the clearly worse ones.
+    '''
+    sample = np.random.random_sample((400, 4))
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    problem_args = dict(nRules=10, nAnts=3, n_classes=2, linguistic_variables=vl_partitions, batch_fitness=True)
+
+    # With random labels no individual is clearly better than the others, so none is dropped
+    targets = np.random.randint(0, 2, 400)
+    full_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, **problem_args)
+    population = np.random.randint(full_problem.xl, full_problem.xu + 1, size=(30, full_problem.n_var))
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, fitness_sample=50, race=True, race_confidence=1 - 1e-9, **problem_args)
+    assert np.allclose(problem.evaluate(population), full_problem.evaluate(population)), 'Race fitness differs from the full data fitness'
+
+    targets = (sample[:, 0] > 0.5).astype(int)
+    full_fitness = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, **problem_args).evaluate(population)
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, fitness_sample=50, race=True, race_confidence=0.01, **problem_args)
+    survivors = np.isclose(problem.evaluate(population), full_fitness)
+    assert np.any(survivors) and not np.all(survivors), 'Race without survivors or without dropped individuals'
+    assert problem.X.shape[0] == 400, 'Full data not restored after the race'
+
+    # Dropped individuals never rank above a survivor, and only the full data fitness values are cached
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, fitness_sample=50, race=True, race_confidence=0.01, fitness_cache=100, **problem_args)
+    fitness, survivors = problem._race(population)
+    assert np.any(survivors) and not np.all(survivors), 'Race without survivors or without dropped individuals'
+    assert np.max(fitness[~survivors]) <= np.min(fitness[survivors]), 'Dropped individual ranked above a survivor'
+    assert np.allclose(1 - fitness[survivors], full_fitness[survivors].ravel()), 'Survivors without their full data fitness'
+    problem.evaluate(population)
+    cached = [(problem.fitness_cache.get(key), full_value) for key, full_value in zip(problem._fitness_keys(population), full_fitness.ravel()) if key in problem.fitness_cache]
+    assert 0 < len(cached) < len(population), 'Dropped individuals cached'
+    assert all(np.isclose(value, full_value) for value, full_value in cached), 'Fitness of dropped individuals cached'
+
+    try:
+        ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=10, nAnts=3, n_classes=2, linguistic_variables=vl_partitions, race=True)
+        assert False, 'Race allowed without batch fitness'
+    except ValueError:
+        pass
+
+
+def test_process_runner_fitness_sample():
+    '''
+    Tests that the process runner evaluates the mini-batches without restarting its pool: the workers get the rows of each new mini-batch.
+    '''
+    sample = np.random.random_sample((300, 4))
+    targets = np.random.randint(0, 2, 300)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    problem_args = dict(nRules=10, nAnts=3, n_classes=2, linguistic_variables=vl_partitions)
+    runner = ex_fuzzy.parallel.ProcessRunner(2)
+    starts = []
+    runner_start = runner.start
+    runner.start = lambda *args: starts.append(1) or runner_start(*args)
+
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, fitness_sample=100, random_state=0, thread_runner=runner, **problem_args)
+    population = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+    try:
+        for _ in range(3):
+            batch_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(problem.X, problem.y, **problem_args)
+            assert np.allclose(problem.evaluate(population), batch_problem.evaluate(population)), 'Process pool mini-batch fitness differs'
+            problem.resample()
+
+        problem.use_full_data()
+        full_problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, **problem_args)
+        assert np.allclose(problem.evaluate(population), full_problem.evaluate(population)), 'Process pool full data fitness differs'
+    finally:
+        runner.close()
+    assert len(starts) == 1, 'Process pool restarted to change the mini-batch'
+
+    model = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, verbose=False, tolerance=0.0, linguistic_variables=vl_partitions, fitness_sample=100,
+                                                               runner=2, runner_backend='process')
+    starts.clear()
+    model_runner_start = model.thread_runner.start
+    model.thread_runner.start = lambda *args: starts.append(1) or model_runner_start(*args)
+    model.fit(sample, targets, n_gen=4, pop_size=10)
+    assert len(starts) == 1 and model.n_gen_used == 4, 'Process pool restarted during the fit'
+    assert model.thread_runner.pool is None, 'Process pool not released'
+
+
+def test_random_classification_fitness_sample():
+    sample = np.random.random_sample((sample_size, 5))
+    targets = np.random.randint(0, 2, sample_size)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    for options in [dict(fitness_sample=sample_size // 4, sample_period=2), dict(fitness_sample=sample_size // 4, race=True, batch_fitness=True)]:
+        model = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, verbose=False, tolerance=0.0, linguistic_variables=vl_partitions, **options)
+        model.fit(sample, targets, n_gen=5, pop_size=20)
+        predictions = model.predict(sample)
+        assert math.isclose(np.mean(np.equal(predictions, targets)), 0.5, abs_tol=0.1)
+
+
+def test_fit_termination():
+    '''
+    Tests the early stopping criteria of the fit, with the minimize and the checkpoints loops, and that the reason to stop and
+    the generations run are recorded.
+    '''
+    sample = np.random.random_sample((300, 4))
+    targets = np.random.randint(0, 2, 300)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    model = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, verbose=False, tolerance=0.0, linguistic_variables=vl_partitions)
+
+    model.fit(sample, targets, n_gen=3, pop_size=10)
+    assert model.stop_reason == 'n_gen' and model.n_gen_used == 3, 'Wrong number of generations'
+
+    model.fit(sample, targets, n_gen=50, pop_size=10, target_fitness=-np.inf)
+    assert model.stop_reason == 'target_fitness' and model.n_gen_used == 1, 'Target fitness not checked'
+
+    model.fit(sample, targets, n_gen=50, pop_size=10, max_time=1e-6)
+    assert model.stop_reason == 'max_time' and model.n_gen_used == 1, 'Time budget not checked'
+
+    model.fit(sample, targets, n_gen=200, pop_size=10, patience=1)
+    assert model.stop_reason == 'no_improvement' and model.n_gen_used < 200, 'Patience not checked'
+
+    current_folder = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            model.fit(sample, targets, n_gen=200, pop_size=10, checkpoints=1, patience=1)
+            checkpoint_files = os.listdir(folder)
+        finally:
+            os.chdir(current_folder)
+
+    assert model.stop_reason == 'no_improvement' and model.n_gen_used < 200, 'Patience not checked in the checkpoints loop'
+    assert len(checkpoint_files) == model.n_gen_used, 'Wrong number of checkpoints'
+
+
+def test_fit_termination_fitness_sample():
+    '''
+    Tests the early stopping with mini-batches: the best fitness is taken again when the population is scored on a new mini-batch,
+    and the target fitness has to be reached on the whole data.
+    '''
+    sample = np.random.random_sample((400, 4))
+    targets = np.random.randint(0, 2, 400)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    problem = ex_fuzzy.evolutionary_fit.FitRuleBase(sample, targets, nRules=10, nAnts=3, n_classes=2, linguistic_variables=vl_partitions, fitness_sample=40, random_state=0)
+    termination = ex_fuzzy.evolutionary_fit.FitTermination(30, patience=5)
+    algorithm = ex_fuzzy.evolutionary_fit.GA(pop_size=10, sampling=ex_fuzzy.evolutionary_fit.IntegerRandomSampling(), eliminate_duplicates=False)
+    algorithm.setup(problem, seed=0, termination=termination, callback=ex_fuzzy.evolutionary_fit._ResampleCallback(problem, 1, termination))
+    while algorithm.has_next():
+        algorithm.next()
+        # (The elitist survival keeps the best individual of the rescored population)
+        assert np.isclose(termination.best_fitness, 1 - np.min(algorithm.pop.get('F'))), 'Best fitness of another mini-batch kept'
+
+    model = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, verbose=False, tolerance=0.0, linguistic_variables=vl_partitions, fitness_sample=40)
+    model.fit(sample, targets, n_gen=200, pop_size=10, patience=3)
+    assert model.stop_reason == 'no_improvement' and model.n_gen_used < 200, 'Patience not checked with mini-batches'
+
+    # Random labels: the mcc of small mini-batches reaches 0.15 easily, the one of the whole data does not
+    model.fit(sample, targets, n_gen=15, pop_size=10, target_fitness=0.15)
+    assert model.stop_reason != 'target_fitness' or model.performance >= 0.15, 'Target fitness reached only on a mini-batch'
+
+
+def test_temporal_fit_termination():
+    '''
+    Tests that the time budget of the temporal classifier is shared by all the time moments.
+    '''
+    from ex_fuzzy import temporal
+
+    sample = np.random.random_sample((200, 3))
+    targets = np.random.randint(0, 2, 200)
+    time_moments = np.random.randint(0, 2, 200)
+    partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    temporal_variables = [temporal.temporalFuzzyVariable(partition.name, [temporal.temporalFS(fuzzy_set, np.array([1.0, 0.6])) for fuzzy_set in partition]) for partition in partitions]
+    model = temporal.TemporalFuzzyRulesClassifier(nRules=6, nAnts=2, linguistic_variables=temporal_variables, n_class=2)
+
+    model.fit(sample, targets, n_gen=2, pop_size=6, time_moments=time_moments)
+    assert model.stop_reason == {0: 'n_gen', 1: 'n_gen'} and model.n_gen_used == {0: 2, 1: 2}, 'Wrong number of generations'
+
+    model.fit(sample, targets, n_gen=50, pop_size=6, time_moments=time_moments, max_time=1e-6)
+    assert model.stop_reason == {0: 'max_time', 1: 'max_time'} and model.n_gen_used == {0: 1, 1: 1}, 'Time budget not shared'
+
+
 if __name__ == '__main__':
     test_random_classification_t2()
     test_random_classification_t2_precomputed()
     test_random_classification_gt2()
     test_random_classification_gt2_precomputed()
+    test_batch_fitness()
+    test_batch_fitness_t2()
+    test_process_runner()
+    test_runner_batch_fitness()
+    test_random_classification_batch_fitness()
+    test_fitness_sample()
+    test_fitness_race()
+    test_process_runner_fitness_sample()
+    test_random_classification_fitness_sample()
+    test_fit_termination()
+    test_fit_termination_fitness_sample()
+    test_temporal_fit_termination()
@@ -0,0 +1,27 @@
+import numpy as np
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+sample_size = 300
+
+
+def test_rule_fine_tune_classifier():
+    '''
+    Tests that the two step classifier that fine tunes mined rules predicts with the classifier of its second step.
+    '''
+    X = np.random.random_sample((sample_size, 3))
+    y = (X[:, 0] > 0.5).astype(int)
+    partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+    classifier = ex_fuzzy.classifiers.RuleFineTuneClassifier(nRules=6, nAnts=2, linguistic_variables=partitions, n_class=2)
+    classifier.fit(X, y, n_gen=2, pop_size=6)
+    predictions = classifier.predict(X)
+    assert predictions.shape == (sample_size, ), 'Wrong number of predictions'
+    assert np.array_equal(predictions, classifier.internal_classifier().predict(X)), 'Predictions not made by the fine tuned classifier'
+
+
+if __name__ == '__main__':
+    test_rule_fine_tune_classifier()
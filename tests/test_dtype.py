@@ -0,0 +1,105 @@
+import numpy as np
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+sample_size = 500
+n_features = 4
+
+
+def _random_master_rule_base(fz_type, ds_mode=0):
+    X = np.random.random_sample((sample_size, n_features))
+    y = np.random.randint(0, 3, sample_size)
+    partitions = ex_fuzzy.utils.construct_partitions(X, fz_type)
+    rule_base_class = ex_fuzzy.rules.RuleBaseT1 if fz_type == ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1 else ex_fuzzy.rules.RuleBaseT2
+
+    rule_bases = []
+    for _ in range(3):
+        rule_list = [ex_fuzzy.rules.RuleSimple(list(np.random.randint(-1, 3, n_features)), 0) for _ in range(4)]
+        rule_bases.append(rule_base_class(partitions, rule_list))
+
+    mrule_base = ex_fuzzy.rules.MasterRuleBase(rule_bases, ds_mode=ds_mode)
+    ex_fuzzy.eval_rules.evalRuleBase(mrule_base, X, y).add_rule_weights()
+
+    return mrule_base, X, y
+
+
+def _check_dtype(fz_type):
+    mrule_base, X, y = _random_master_rule_base(fz_type)
+    firing64 = mrule_base.compute_firing_strenghts(X)
+    degrees64 = mrule_base.compute_association_degrees(X)
+    preds64 = mrule_base.winning_rule_predict(X)
+
+    mrule_base.set_dtype(np.float32)
+    firing32 = mrule_base.compute_firing_strenghts(X)
+    degrees32 = mrule_base.compute_association_degrees(X)
+    preds32 = mrule_base.winning_rule_predict(X)
+
+    assert firing32.dtype == np.float32, 'Firing strengths are not float32'
+    assert degrees32.dtype == np.float32, 'Association degrees are not float32'
+    assert np.allclose(firing32, firing64, atol=1e-6), 'float32 firing strengths differ from the float64 ones'
+    assert np.allclose(degrees32, degrees64, atol=1e-6), 'float32 association degrees differ from the float64 ones'
+    # Predictions can only change in ties broken by rounding
+    ties = np.sort(degrees64, axis=1)[:, -1] - np.sort(degrees64, axis=1)[:, -2] < 1e-5
+    assert np.array_equal(preds32[~ties], preds64[~ties]), 'float32 predictions differ from the float64 ones'
+
+
+def test_dtype_t1():
+    '''
+    Tests that the float32 mode gives the same predictions as the float64 one for t1 rule bases.
+    '''
+    _check_dtype(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+
+def test_dtype_t2():
+    '''
+    Tests that the float32 mode gives the same predictions as the float64 one for t2 rule bases.
+    '''
+    _check_dtype(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+
+
+def test_default_dtype():
+    '''
+    Tests the global dtype setting.
+    '''
+    mrule_base, X, _ = _random_master_rule_base(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    preds64 = mrule_base.winning_rule_predict(X)
+    try:
+        ex_fuzzy.fuzzy_sets.set_default_dtype(np.float32)
+        assert mrule_base.compute_firing_strenghts(X).dtype == np.float32, 'Default dtype not used'
+        assert ex_fuzzy.rules.stack_antecedent_memberships(ex_fuzzy.rules.compute_antecedents_memberships(mrule_base.antecedents, X)).dtype == np.float32, 'Default dtype not used in the stacked memberships'
+        assert np.mean(mrule_base.winning_rule_predict(X) == preds64) > 0.99, 'float32 predictions differ from the float64 ones'
+    finally:
+        ex_fuzzy.fuzzy_sets.set_default_dtype(np.float64)
+
+    try:
+        ex_fuzzy.fuzzy_sets.set_default_dtype(int)
+        assert False, 'Integer dtypes must be rejected'
+    except ValueError:
+        pass
+
+
+def test_dtype_fitness():
+    '''
+    Tests that the genetic fitness computed in float32 matches the float64 one, both evaluating one rulebase at a time and in batch.
+    '''
+    X = np.random.random_sample((200, n_features))
+    y = np.random.randint(0, 2, 200)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+    for batch_fitness in [False, True]:
+        problem64 = ex_fuzzy.evolutionary_fit.FitRuleBase(X, y, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions, batch_fitness=batch_fitness)
+        problem32 = ex_fuzzy.evolutionary_fit.FitRuleBase(X, y, nRules=6, nAnts=2, n_classes=2, linguistic_variables=vl_partitions, batch_fitness=batch_fitness, dtype=np.float32)
+        assert problem32._precomputed_truth.dtype == np.float32, 'Precomputed memberships are not float32'
+
+        population = np.random.randint(problem64.xl, problem64.xu + 1, size=(20, problem64.n_var))
+        assert np.allclose(problem32.evaluate(population), problem64.evaluate(population), atol=1e-2), 'float32 fitness differs from the float64 one'
+
+
+if __name__ == '__main__':
+    test_dtype_t1()
+    test_dtype_t2()
+    test_default_dtype()
+    test_dtype_fitness()
@@ -0,0 +1,102 @@
+import numpy as np
+from sklearn.metrics import matthews_corrcoef
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+n_samples = 300
+n_features = 4
+
+
+def _reference_support_confidence(mrule_base, X, y):
+    '''
+    Rule by rule computation of the support and confidence of each rule.
+    '''
+    firing_strengths = mrule_base.compute_firing_strenghts(X)
+    consequents = mrule_base.get_consequents()
+    supports = np.zeros((len(consequents), ) + firing_strengths.shape[2:3])
+    confidences = np.zeros(supports.shape)
+    for ix, consequent in enumerate(consequents):
+        match = y == consequent
+        firing = firing_strengths[:, ix]
+        if np.sum(match) > 0:
+            supports[ix] = np.mean(firing[match])
+        if np.sum(firing) != 0:
+            confidences[ix] = np.sum(firing[match]) / np.sum(firing)
+
+    return supports, confidences
+
+
+def _random_master_rule_base(fz_type):
+    X = np.random.random_sample((n_samples, n_features))
+    y = np.random.randint(0, 3, n_samples)
+    partitions = ex_fuzzy.utils.construct_partitions(X, fz_type)
+    rule_base_class = ex_fuzzy.rules.RuleBaseT1 if fz_type == ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1 else ex_fuzzy.rules.RuleBaseT2
+
+    rule_bases = []
+    for _ in range(3):
+        rule_list = [ex_fuzzy.rules.RuleSimple(list(np.random.randint(-1, 3, n_features)), 0) for _ in range(4)]
+        rule_bases.append(rule_base_class(partitions, rule_list))
+
+    return ex_fuzzy.rules.MasterRuleBase(rule_bases), X, y
+
+
+def _check_eval(fz_type):
+    mrule_base, X, y = _random_master_rule_base(fz_type)
+    ev = ex_fuzzy.eval_rules.evalRuleBase(mrule_base, X, y)
+    ref_supports, ref_confidences = _reference_support_confidence(mrule_base, X, y)
+
+    ev.add_rule_weights()
+    supports = np.array([rule.support for rule in mrule_base.get_rules()])
+    confidences = np.array([rule.confidence for rule in mrule_base.get_rules()])
+    scores = np.array([rule.score for rule in mrule_base.get_rules()])
+    assert np.allclose(supports, ref_supports), 'Support differs from the rule by rule computation'
+    assert np.allclose(confidences, ref_confidences), 'Confidence differs from the rule by rule computation'
+    assert np.allclose(scores, ref_supports * ref_confidences), 'Dominance scores differ from the rule by rule computation'
+
+    preds = mrule_base.winning_rule_predict(X)
+    assert np.isclose(ev.classification_eval(), matthews_corrcoef(y, preds)), 'Wrong matthews correlation coefficient'
+
+    # After purging, the scores of the remaining rules do not change
+    mrule_base.purge_rules(np.median(np.mean(scores.reshape((len(scores), -1)), axis=1)))
+    remaining = np.array([rule.score for rule in mrule_base.get_rules()])
+    ev.add_rule_weights()
+    assert np.allclose(remaining, [rule.score for rule in mrule_base.get_rules()]), 'Scores changed after purging the rules'
+    ref_supports, _ = _reference_support_confidence(mrule_base, X, y)
+    assert np.allclose(ev.compute_pattern_support(), ref_supports), 'Support of the purged rule base differs from the rule by rule computation'
+    assert np.isclose(ev.classification_eval(), matthews_corrcoef(y, mrule_base.winning_rule_predict(X))), 'Wrong matthews correlation coefficient after purging'
+
+
+def test_eval_rules_t1():
+    '''
+    Tests that the single pass rule evaluation matches the rule by rule computation in t1.
+    '''
+    _check_eval(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+
+def test_eval_rules_t2():
+    '''
+    Tests that the single pass rule evaluation matches the rule by rule computation in t2.
+    '''
+    _check_eval(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+
+
+def test_matthews_corrcoef_batch():
+    '''
+    Tests that the batched matthews correlation coefficient matches the sklearn one.
+    '''
+    y = np.random.randint(0, 3, 100)
+    preds = np.random.randint(-1, 3, (5, 100))
+    preds[0] = y
+    preds[1] = 0
+    res = ex_fuzzy.eval_rules.matthews_corrcoef_batch(y, preds)
+
+    assert np.allclose(res, [matthews_corrcoef(y, pred) for pred in preds]), 'Batched mcc differs from sklearn'
+
+
+if __name__ == '__main__':
+    test_eval_rules_t1()
+    test_eval_rules_t2()
+    test_matthews_corrcoef_batch()
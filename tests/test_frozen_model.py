@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+sample_size = 500
+
+
+def _check_frozen(fz_type):
+    sample = np.random.random_sample((sample_size, 4))
+    targets = np.random.randint(0, 3, sample_size)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, fz_type)
+    model = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(10, 3, fuzzy_type=fz_type, verbose=False, tolerance=0.0, linguistic_variables=vl_partitions)
+    model.fit(sample, targets, n_gen=10, pop_size=30)
+
+    frozen = pickle.loads(pickle.dumps(model.compile()))
+    test_sample = np.random.random_sample((sample_size, 4))
+    assert np.array_equal(frozen.predict(test_sample), model.predict(test_sample)), 'Frozen model predictions differ'
+    assert np.array_equal(frozen.compute_association_degrees(test_sample), model.predict_proba(test_sample)), 'Frozen model association degrees differ'
+    assert np.array_equal(frozen.predict(test_sample, out_class_names=True), model.predict(test_sample, out_class_names=True)), 'Frozen model class names differ'
+
+
+def test_frozen_model_t1():
+    '''
+    Tests that the frozen model gives the same outputs as the fitted t1 classifier.
+    '''
+    _check_frozen(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+
+def test_frozen_model_t2():
+    '''
+    Tests that the frozen model gives the same outputs as the fitted t2 classifier.
+    '''
+    _check_frozen(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+
+
+def test_frozen_model_categorical():
+    '''
+    Tests the frozen model with categorical variables, modifiers, singleton sets and unknown predictions.
+    '''
+    sample = np.random.random_sample((sample_size, 3))
+    sample[:, 2] = np.random.randint(0, 3, sample_size)
+    vl_partitions = ex_fuzzy.utils.construct_partitions(sample, categorical_mask=np.array([False, False, True]))
+    vl_partitions[1][1] = ex_fuzzy.fuzzy_sets.FS('singleton', [0.5, 0.5, 0.5, 0.5], [0, 1])
+    sample[::3, 1] = 0.5
+
+    rule_list = [ex_fuzzy.rules.RuleSimple([0, -1, 1], 0), ex_fuzzy.rules.RuleSimple([2, 1, -1], 0)]
+    rule_list[0].modifiers = np.array([2.0, -1, -1])
+    rule_list[1].modifiers = np.array([-1, -1, -1])
+    rule_bases = [ex_fuzzy.rules.RuleBaseT1(vl_partitions, rule_list[:1]), ex_fuzzy.rules.RuleBaseT1(vl_partitions, rule_list[1:])]
+    mrule_base = ex_fuzzy.rules.MasterRuleBase(rule_bases, ['a', 'b'], ds_mode=1, allow_unknown=True)
+
+    frozen = mrule_base.compile()
+    preds = mrule_base.winning_rule_predict(sample)
+    assert np.any(preds == -1), 'The test data should have unknown samples'
+    assert np.array_equal(frozen.predict(sample), preds), 'Frozen model predictions differ'
+    assert np.array_equal(frozen.predict(sample, out_class_names=True), mrule_base.winning_rule_predict(sample, out_class_names=True)), 'Frozen model class names differ'
+
+
+def test_frozen_iter_predict():
+    '''
+    Tests that the chunked prediction of the frozen model gives the same predictions and association degrees as the rule base one.
+    '''
+    sample = np.random.random_sample((sample_size, 3))
+    partitions = ex_fuzzy.utils.construct_partitions(sample, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+    rule_list = [ex_fuzzy.rules.RuleSimple([0, -1, 1], 0), ex_fuzzy.rules.RuleSimple([2, 1, -1], 0), ex_fuzzy.rules.RuleSimple([-1, 0, 2], 0)]
+    rule_bases = [ex_fuzzy.rules.RuleBaseT2(partitions, rule_list[:2]), ex_fuzzy.rules.RuleBaseT2(partitions, rule_list[2:])]
+    mrule_base = ex_fuzzy.rules.MasterRuleBase(rule_bases, ['a', 'b'], ds_mode=1)
+    frozen = mrule_base.compile()
+
+    chunks = list(frozen.iter_predict(pd.DataFrame(sample), chunk_size=64, out_class_names=True, return_association_degrees=True))
+    rule_base_chunks = list(mrule_base.iter_predict(pd.DataFrame(sample), chunk_size=64, out_class_names=True, return_association_degrees=True))
+    assert len(chunks) == len(rule_base_chunks) and max(len(predictions) for predictions, _ in chunks) <= 64, 'Wrong chunks'
+    for (predictions, degrees), (rule_base_predictions, rule_base_degrees) in zip(chunks, rule_base_chunks):
+        assert np.array_equal(predictions, rule_base_predictions), 'Chunked predictions differ'
+        assert np.allclose(degrees, rule_base_degrees), 'Chunked association degrees differ'
+
+    assert np.array_equal(np.concatenate(list(frozen.iter_predict(sample, chunk_size=100))), frozen.predict(sample)), 'Predictions without the association degrees differ'
+
+
+if __name__ == '__main__':
+    test_frozen_model_t1()
+    test_frozen_model_t2()
+    test_frozen_model_categorical()
+    test_frozen_iter_predict()
@@ -44,9 +44,27 @@ def test_fuzzy_gt2_memberships():
     assert math.isclose(np.mean(trial_fs.alpha_reduction(res)), 0.5, abs_tol=0.1), 'GT2 memberships not correctly reduced'
 
 
+def test_fuzzy_gt2_lookup_tables():
+    '''
+    Tests the GT2 memberships computed with the lookup tables, their alpha reduction and the inputs out of the domain.
+    '''
+    secondary_memberships = {}
+    for x in np.round(np.arange(0, 1.01, 0.1), 1):
+        secondary_memberships[x] = ex_fuzzy.fuzzy_sets.FS('trial', [0, x, x, 1], [0, 1])
+    trial_fs = ex_fuzzy.fuzzy_sets.GT2('trial', secondary_memberships, [0, 1], significant_decimals=1, unit_resolution=0.01)
+
+    x = np.random.random_sample(100)
+    res = trial_fs.membership(x)
+    assert res.shape == (100, len(trial_fs.alpha_cuts), 2), 'Wrong GT2 membership shape'
+    for ix, alpha in enumerate(trial_fs.alpha_cuts):
+        assert np.array_equal(res[:, ix], trial_fs.iv_secondary_memberships[alpha][(x * 10).astype(int)]), 'Lookup table differs from the alpha cut memberships'
+
+    assert np.allclose(trial_fs.reduced_membership(x), trial_fs.alpha_reduction(res)), 'Reduced lookup table differs from the alpha reduction'
+    assert np.array_equal(trial_fs.membership(np.array([-3.0, 7.0])), trial_fs.membership(np.array([0.0, 1.0]))), 'Out of domain inputs not clipped'
 
     
 if __name__ == '__main__':
     test_fuzzy_t1_memberships()
     test_fuzzy_t2_memberships()
-    test_fuzzy_gt2_memberships()
\ No newline at end of file
+    test_fuzzy_gt2_memberships()
+    test_fuzzy_gt2_lookup_tables()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import json
+import subprocess
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+
+package_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ex_fuzzy')
+heavy_modules = ['pymoo', 'sklearn', 'pandas', 'matplotlib', 'networkx', 'torch']
+
+
+def _import_in_new_process(statement: str) -> tuple[float, list[str]]:
+    '''
+    Runs the import statement in a new python process.
+
+    :param statement: python code with the imports.
+    :return: seconds taken by the statement and heavy modules loaded after it.
+    '''
+    code = 'import sys, time, json\n' + \
+           'start = time.perf_counter()\n' + \
+           statement + '\n' + \
+           'elapsed = time.perf_counter() - start\n' + \
+           'print(json.dumps([elapsed, [module for module in ' + repr(heavy_modules) + ' if module in sys.modules]]))'
+    env = dict(os.environ, PYTHONPATH=package_path + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+
+    return tuple(json.loads(output.strip().splitlines()[-1]))
+
+
+def _best_import_time(statement: str, repetitions: int=3) -> float:
+    return min(_import_in_new_process(statement)[0] for _ in range(repetitions))
+
+
+def test_lean_inference_import():
+    '''
+    Tests that the package and the inference modules load without the training and plotting dependencies, and that the other modules
+    are still available as attributes of the package.
+    '''
+    _, loaded = _import_in_new_process('import ex_fuzzy\nfrom ex_fuzzy import rules, frozen_model, persistence, fuzzy_sets, cache')
+    assert loaded == [], 'Inference import loads ' + ', '.join(loaded)
+
+    _, loaded = _import_in_new_process('import ex_fuzzy\nex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier')
+    assert 'pymoo' in loaded, 'Training modules not imported on access'
+    assert 'matplotlib' not in loaded and 'networkx' not in loaded, 'Training loads the plotting dependencies'
+
+
+def test_import_time():
+    '''
+    Import time benchmark: the inference import has to be much faster than the training one.
+    (Relative to it, so that the check does not depend on the speed of the machine)
+    '''
+    inference_time = _best_import_time('import ex_fuzzy.rules')
+    training_time = _best_import_time('import ex_fuzzy.evolutionary_fit')
+
+    assert inference_time < 0.5 * training_time, 'Inference import takes ' + str(round(inference_time, 3)) + 's, training import ' + str(round(training_time, 3)) + 's'
+
+
+if __name__ == '__main__':
+    for statement in ['import ex_fuzzy', 'import ex_fuzzy.rules', 'import ex_fuzzy.evolutionary_fit', 'import ex_fuzzy.utils', 'import ex_fuzzy.vis_rules']:
+        elapsed, loaded = _import_in_new_process(statement)
+        print(statement.ljust(35), str(round(elapsed, 3)) + 's', loaded)
+
+    test_lean_inference_import()
+    test_import_time()
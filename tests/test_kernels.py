@@ -0,0 +1,85 @@
+import numpy as np
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+n_samples = 300
+n_features = 4
+
+
+def _firing_strengths(fz_type, tnorm, with_modifiers):
+    X = np.random.random_sample((n_samples, n_features))
+    X[::5, 1] = 0.5
+    partitions = ex_fuzzy.utils.construct_partitions(X, fz_type)
+    partitions[1][1] = ex_fuzzy.fuzzy_sets.FS('singleton', [0.5, 0.5, 0.5, 0.5], [0, 1]) if fz_type == ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1 else partitions[1][1]
+    rule_list = [ex_fuzzy.rules.RuleSimple(list(np.random.randint(-1, 3, n_features)), 0) for _ in range(6)] + [ex_fuzzy.rules.RuleSimple([-1] * n_features, 0)]
+    if with_modifiers:
+        for rule in rule_list:
+            rule.modifiers = np.random.choice([-1, 0.5, 1.0, 2.0], n_features)
+
+    rule_base_class = ex_fuzzy.rules.RuleBaseT1 if fz_type == ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1 else ex_fuzzy.rules.RuleBaseT2
+    mrule_base = ex_fuzzy.rules.MasterRuleBase([rule_base_class(partitions, rule_list[:3], tnorm=tnorm), rule_base_class(partitions, rule_list[3:], tnorm=tnorm)], ds_mode=1)
+    frozen = mrule_base.compile()
+
+    return mrule_base.compute_firing_strenghts(X), frozen.compute_firing_strenghts(X)
+
+
+def test_kernel_backends():
+    '''
+    Tests that the numba kernels (if numba is installed) give the same firing strengths as the numpy implementation.
+    '''
+    backend = ex_fuzzy.kernels.get_backend()
+    try:
+        for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+            for tnorm in [np.prod, np.min]:
+                for with_modifiers in [False, True]:
+                    state = np.random.get_state()
+                    ex_fuzzy.kernels.set_backend('numpy')
+                    numpy_firing, numpy_frozen_firing = _firing_strengths(fz_type, tnorm, with_modifiers)
+                    assert np.array_equal(numpy_firing, numpy_frozen_firing), 'Frozen model firing strengths differ'
+                    if not ex_fuzzy.kernels.numba_available:
+                        continue
+
+                    np.random.set_state(state)
+                    ex_fuzzy.kernels.set_backend('numba')
+                    numba_firing, numba_frozen_firing = _firing_strengths(fz_type, tnorm, with_modifiers)
+                    if with_modifiers:
+                        # The vectorized numpy power can differ in the last bit
+                        assert np.allclose(numpy_firing, numba_firing, rtol=0, atol=1e-15), 'Numba firing strengths differ'
+                        assert np.allclose(numpy_frozen_firing, numba_frozen_firing, rtol=0, atol=1e-15), 'Numba fused firing strengths differ'
+                    else:
+                        assert np.array_equal(numpy_firing, numba_firing), 'Numba firing strengths differ'
+                        assert np.array_equal(numpy_frozen_firing, numba_frozen_firing), 'Numba fused firing strengths differ'
+    finally:
+        ex_fuzzy.kernels.set_backend(backend)
+
+
+def test_set_backend():
+    '''
+    Tests the backend selection.
+    '''
+    backend = ex_fuzzy.kernels.get_backend()
+    try:
+        ex_fuzzy.kernels.set_backend('numpy')
+        assert not ex_fuzzy.kernels.use_numba(), 'Numpy backend not selected'
+        try:
+            ex_fuzzy.kernels.set_backend('cuda')
+            assert False, 'Unknown backend accepted'
+        except ValueError:
+            pass
+
+        if not ex_fuzzy.kernels.numba_available:
+            try:
+                ex_fuzzy.kernels.set_backend('numba')
+                assert False, 'Numba backend selected without numba'
+            except ValueError:
+                pass
+    finally:
+        ex_fuzzy.kernels.set_backend(backend)
+
+
+if __name__ == '__main__':
+    test_kernel_backends()
+    test_set_backend()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+
+import numpy as np
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+sample_size = 300
+n_features = 4
+
+
+def _fitted_classifier(fz_type, ds_mode=0, fuzzy_modifiers=False):
+    X = np.random.random_sample((sample_size, n_features))
+    X[:, 2] = np.random.randint(0, 5, sample_size)
+    y = np.random.randint(0, 3, sample_size)
+    partitions = ex_fuzzy.utils.construct_partitions(X, fz_type, categorical_mask=np.array([False, False, True, False]))
+    classifier = ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier(nRules=8, nAnts=3, linguistic_variables=partitions, n_class=3,
+                                                                     ds_mode=ds_mode, fuzzy_modifiers=fuzzy_modifiers, class_names=['a', 'b', 'c'])
+    classifier.fit(X, y, n_gen=2, pop_size=8)
+
+    return classifier, X
+
+
+def _check_rules(loaded_rule_base, rule_base):
+    assert [len(rule_base_) for rule_base_ in loaded_rule_base] == [len(rule_base_) for rule_base_ in rule_base], 'Number of rules changed'
+    for loaded_rule, rule in zip(loaded_rule_base.get_rules(), rule_base.get_rules()):
+        assert loaded_rule.antecedents == rule.antecedents, 'Antecedents changed'
+        assert np.array_equal(loaded_rule.score, rule.score), 'Scores changed'
+        assert (loaded_rule.modifiers is None) == (rule.modifiers is None), 'Modifiers changed'
+        if rule.modifiers is not None:
+            assert np.array_equal(loaded_rule.modifiers, rule.modifiers), 'Modifiers changed'
+        if hasattr(rule, 'weight'):
+            assert loaded_rule.weight == rule.weight, 'Weights changed'
+
+
+def test_save_load_classifier():
+    '''
+    Tests that the classifiers loaded from the binary format have the same rules and give the same predictions as the saved ones.
+    '''
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'model.npz')
+        for fz_type, ds_mode, fuzzy_modifiers in [(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, 0, True), (ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, 2, False), (ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2, 0, False),
+                                                   (ex_fuzzy.fuzzy_sets.FUZZY_SETS.gt2, 1, False)]:
+            classifier, X = _fitted_classifier(fz_type, ds_mode, fuzzy_modifiers)
+            ex_fuzzy.persistence.save_model(classifier, path)
+
+            for mmap_mode in [None, 'r']:
+                loaded = ex_fuzzy.persistence.load_model(path, mmap_mode=mmap_mode)
+                assert isinstance(loaded, ex_fuzzy.evolutionary_fit.BaseFuzzyRulesClassifier), 'Wrong model class'
+                _check_rules(loaded.rule_base, classifier.rule_base)
+                assert loaded.rule_base.print_rules(True) == classifier.rule_base.print_rules(True), 'Printed rules changed'
+                assert np.array_equal(loaded.predict(X), classifier.predict(X)), 'Predictions changed'
+                assert np.array_equal(loaded.predict(X, out_class_names=True), classifier.predict(X, out_class_names=True)), 'Class names changed'
+                assert loaded.nAnts == classifier.nAnts and loaded.classes_names == classifier.classes_names, 'Classifier settings changed'
+                for loaded_variable, variable, column in zip(loaded.lvs, classifier.lvs, X.T):
+                    for loaded_set, fuzzy_set in zip(loaded_variable, variable):
+                        assert type(loaded_set) is type(fuzzy_set) and np.array_equal(loaded_set.membership(column), fuzzy_set.membership(column)), 'Memberships changed'
+
+            # Master rule bases can be saved on their own
+            ex_fuzzy.persistence.save_model(classifier.rule_base, path)
+            loaded_rule_base = ex_fuzzy.persistence.load_model(path)
+            assert isinstance(loaded_rule_base, ex_fuzzy.rules.MasterRuleBase), 'Wrong model class'
+            assert np.array_equal(loaded_rule_base.winning_rule_predict(X), classifier.rule_base.winning_rule_predict(X)), 'Predictions changed'
+
+
+def test_save_load_wrapper_and_temporal():
+    '''
+    Tests the binary format with the two step classifiers and with the temporal classifier.
+    '''
+    from ex_fuzzy import temporal
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'model.npz')
+
+        classifier, X = _fitted_classifier(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+        wrapper = ex_fuzzy.classifiers.FuzzyRulesClassifier(nRules=8, nAnts=3, linguistic_variables=classifier.lvs)
+        wrapper.fl_classifier2 = classifier
+        ex_fuzzy.persistence.save_model(wrapper, path)
+        loaded = ex_fuzzy.persistence.load_model(path)
+        assert isinstance(loaded, ex_fuzzy.classifiers.FuzzyRulesClassifier), 'Wrong model class'
+        assert np.array_equal(loaded.predict(X), wrapper.predict(X)), 'Predictions changed'
+
+        X = np.random.random_sample((sample_size, n_features))
+        y = np.random.randint(0, 2, sample_size)
+        time_moments = np.random.randint(0, 2, sample_size)
+        partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+        temporal_variables = [temporal.temporalFuzzyVariable(partition.name, [temporal.temporalFS(fuzzy_set, np.array([1.0, 0.6])) for fuzzy_set in partition]) for partition in partitions]
+        temporal_classifier = temporal.TemporalFuzzyRulesClassifier(nRules=6, nAnts=2, linguistic_variables=temporal_variables, n_class=2)
+        temporal_classifier.fit(X, y, n_gen=2, pop_size=6, time_moments=time_moments)
+
+        ex_fuzzy.persistence.save_model(temporal_classifier, path)
+        loaded = ex_fuzzy.persistence.load_model(path)
+        assert isinstance(loaded, temporal.TemporalFuzzyRulesClassifier), 'Wrong model class'
+        assert np.array_equal(loaded.forward(X, time_moments), temporal_classifier.forward(X, time_moments)), 'Temporal predictions changed'
+        assert loaded.rule_base.print_rules(True) == temporal_classifier.rule_base.print_rules(True), 'Printed temporal rules changed'
+
+
+if __name__ == '__main__':
+    test_save_load_classifier()
+    test_save_load_wrapper_and_temporal()
@@ -0,0 +1,170 @@
+from itertools import combinations, product
+
+import numpy as np
+import pandas as pd
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+n_samples = 300
+n_features = 5
+
+
+def _reference_rule_search(data, fuzzy_variables, support_threshold, max_depth):
+    '''
+    Exhaustive search of the frequent itemsets, scoring every combination of items.
+    '''
+    memberships = [np.array(fuzzy_variables[ix](data.iloc[:, ix].values)) for ix in range(data.shape[1])]
+    res = []
+    for depth in range(1, max_depth + 1):
+        for variables in combinations(range(data.shape[1]), depth):
+            for labels in product(*[range(len(fuzzy_variables[ix])) for ix in variables]):
+                min_membership = np.min([memberships[ix][label] for ix, label in zip(variables, labels)], axis=0)
+                if np.mean(min_membership) > support_threshold:
+                    res.append(tuple(zip(variables, labels)))
+
+    return res
+
+
+def _check_rule_search(fz_type):
+    data = pd.DataFrame(np.random.random_sample((n_samples, n_features)))
+    fuzzy_variables = ex_fuzzy.utils.construct_partitions(data.values, fz_type)
+
+    for support_threshold in [0.02, 0.05, 0.1]:
+        freq_itemsets = ex_fuzzy.rule_mining.rule_search(data, fuzzy_variables, support_threshold, max_depth=3)
+        assert freq_itemsets == _reference_rule_search(data, fuzzy_variables, support_threshold, 3), 'Frequent itemsets differ from the exhaustive search'
+
+
+def test_rule_search_t1():
+    '''
+    Tests that the level-wise search finds the same frequent itemsets as the exhaustive search in t1.
+    '''
+    _check_rule_search(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+
+def test_rule_search_t2():
+    '''
+    Tests that the level-wise search finds the same frequent itemsets as the exhaustive search in t2.
+    '''
+    _check_rule_search(ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+
+
+def test_multiclass_mine_rulebase():
+    '''
+    Tests that mining the classes in a process pool gives the same rules as mining them in turn and pruning them afterwards.
+    '''
+    data = pd.DataFrame(np.random.random_sample((n_samples, n_features)), columns=[str(ix) for ix in range(n_features)])
+    y = np.random.randint(0, 3, n_samples)
+    data.loc[y == 1, '0'] *= 0.3
+    fuzzy_variables = ex_fuzzy.utils.construct_partitions(data.values, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+
+    rule_bases = [ex_fuzzy.rule_mining.mine_rulebase_support(data.loc[y == yclass], fuzzy_variables, 0.05, 3) for yclass in range(3)]
+    reference = ex_fuzzy.rules.MasterRuleBase(rule_bases, ['0', '1', '2'])
+    ex_fuzzy.rule_mining.prune_rules_confidence_lift(data, y, reference, fuzzy_variables, 0.4, 1.05)
+    reference_rules = [[list(rule.antecedents) for rule in rule_base] for rule_base in reference]
+
+    for runner in [1, 2]:
+        master_rule_base = ex_fuzzy.rule_mining.multiclass_mine_rulebase(data, y, fuzzy_variables, 0.05, 3, 0.4, 1.05, runner=runner)
+        assert [[list(rule.antecedents) for rule in rule_base] for rule_base in master_rule_base] == reference_rules, 'Mined rules differ from the sequential mining and pruning'
+
+
+def test_rule_search_top_k():
+    '''
+    Tests that the top k search returns the itemsets with the highest support, and that the memory limit only keeps frequent itemsets.
+    '''
+    data = pd.DataFrame(np.random.random_sample((n_samples, n_features)))
+    fuzzy_variables = ex_fuzzy.utils.construct_partitions(data.values, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    memberships = [np.array(fuzzy_variables[ix](data.iloc[:, ix].values)) for ix in range(n_features)]
+    support = lambda itemset: np.mean(np.min([memberships[ix][label] for ix, label in itemset], axis=0))
+
+    reference = _reference_rule_search(data, fuzzy_variables, 0.01, 3)
+    reference_supports = np.sort([support(itemset) for itemset in reference])[::-1]
+    for top_k in [1, 20, 200]:
+        top_itemsets = ex_fuzzy.rule_mining.rule_search(data, fuzzy_variables, 0.01, 3, top_k=top_k)
+        assert np.allclose([support(itemset) for itemset in top_itemsets], reference_supports[:top_k]), 'Top k itemsets are not the ones with the highest support'
+
+    # Room for 20 min-membership vectors per level
+    row_megabytes = n_samples * 8 / 2**20
+    capped = list(ex_fuzzy.rule_mining.iter_rule_search(data, fuzzy_variables, 0.01, 3, memory_limit=2 * 20 * row_megabytes))
+    assert 0 < len(capped) < len(reference), 'The memory limit does not bound the search'
+    assert set(capped) <= set(reference), 'The memory limited search returns itemsets that are not frequent'
+
+
+def test_rule_search_categorical():
+    '''
+    Tests that the frequent itemsets with high cardinality categorical variables, stored as category indexes, are the same as the exhaustive search ones.
+    '''
+    for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+        data = pd.DataFrame(np.random.random_sample((n_samples, n_features)))
+        data[1] = np.random.randint(0, 4, n_samples)
+        data[3] = np.random.randint(0, 40, n_samples)
+        fuzzy_variables = ex_fuzzy.utils.construct_partitions(data.values, fz_type, categorical_mask=np.array([False, True, False, True, False]))
+
+        item_memberships = ex_fuzzy.rule_mining.compute_item_memberships(data, fuzzy_variables)
+        assert item_memberships.dense.shape[0] == 9, 'Categorical items are stored as dense memberships'
+        for support_threshold in [0.01, 0.05]:
+            freq_itemsets = ex_fuzzy.rule_mining.rule_search(data, fuzzy_variables, support_threshold, max_depth=3)
+            assert freq_itemsets == _reference_rule_search(data, fuzzy_variables, support_threshold, 3), 'Frequent itemsets with categorical variables differ from the exhaustive search'
+
+
+def test_rule_search_categorical_last():
+    '''
+    Tests the search when the last variable is categorical, so the only candidates to extend some itemsets are categorical items.
+    '''
+    data = pd.DataFrame(np.random.random_sample((n_samples, 3)), columns=['0', '1', '2'])
+    data['2'] = np.random.randint(0, 4, n_samples)
+    y = np.random.randint(0, 2, n_samples)
+    for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+        fuzzy_variables = ex_fuzzy.utils.construct_partitions(data.values, fz_type, categorical_mask=np.array([False, False, True]))
+
+        freq_itemsets = ex_fuzzy.rule_mining.rule_search(data, fuzzy_variables, 0.05, max_depth=3)
+        assert freq_itemsets == _reference_rule_search(data, fuzzy_variables, 0.05, 3), 'Frequent itemsets with a categorical last variable differ from the exhaustive search'
+
+        master_rule_base = ex_fuzzy.rule_mining.multiclass_mine_rulebase(data, y, fuzzy_variables, 0.05, 3, 0.0, 0.0)
+        assert len(master_rule_base) == 2, 'Wrong number of mined rule bases'
+
+
+def test_explore_rule_bases_fitness():
+    '''
+    Tests that the fitness computed over the precomputed candidate firing strengths is the same as the one of the built rulebases,
+    also when some classes have no chosen rules, and with the firing strengths memory mapped from a store.
+    '''
+    import tempfile
+
+    for fz_type in [ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2]:
+        data = np.random.random_sample((n_samples, n_features))
+        y = np.random.randint(0, 3, n_samples)
+        fuzzy_variables = ex_fuzzy.utils.construct_partitions(data, fz_type)
+        candidate_rules = ex_fuzzy.rule_mining.multiclass_mine_rulebase(data, y, fuzzy_variables, 0.05, max_depth=2)
+        problem = ex_fuzzy.evolutionary_fit.ExploreRuleBases(data, y, nRules=6, n_classes=3, candidate_rules=candidate_rules)
+
+        population = np.random.randint(problem.xl, problem.xu + 1, size=(20, problem.n_var))
+        # Individuals without rules for the first class
+        first_class_rules = len(candidate_rules[0])
+        population[:5] = np.random.randint(first_class_rules, problem.xu[0] + 1, size=(5, problem.n_var))
+        reference = np.array([problem._individual_objective(individual) for individual in population])
+        assert np.allclose(problem._batch_objective(population), reference), 'Batch fitness differs from the rulebase one'
+
+        rule_base = problem._construct_ruleBase(population[0], fz_type)
+        assert len(rule_base[0]) == 0 and rule_base.get_consequents() == [candidate_rules.get_consequents()[val] for val in np.unique(population[0])], 'Consequents of the chosen rules changed'
+
+        with tempfile.TemporaryDirectory() as folder:
+            store = ex_fuzzy.cache.MembershipStore(folder)
+            for _ in range(2):
+                stored_problem = ex_fuzzy.evolutionary_fit.ExploreRuleBases(data, y, nRules=6, n_classes=3, candidate_rules=candidate_rules,
+                                                                            membership_store=store, batch_fitness=True)
+            assert isinstance(stored_problem._candidate_firing, np.memmap), 'Candidate firing strengths not memory mapped'
+            assert np.array_equal(stored_problem._batch_objective(population), problem._batch_objective(population)), 'Stored firing strengths change the fitness'
+            assert np.array_equal(stored_problem.evaluate(population)[:, 0], problem._batch_objective(population)), 'Batch evaluation differs'
+
+
+if __name__ == '__main__':
+    test_rule_search_t1()
+    test_rule_search_t2()
+    test_multiclass_mine_rulebase()
+    test_rule_search_top_k()
+    test_rule_search_categorical()
+    test_rule_search_categorical_last()
+    test_explore_rule_bases_fitness()
@@ -0,0 +1,231 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+n_samples = 200
+n_features = 4
+
+
+def _reference_rule_memberships(rule_base, antecedents_memberships, n_samples, tail_shape):
+    '''
+    Rule by rule, antecedent by antecedent computation of the firing strengths.
+    '''
+    res = np.zeros((n_samples, len(rule_base.rules)) + tail_shape)
+    for jx, rule in enumerate(rule_base.rules):
+        membership = np.zeros((n_samples, len(rule.antecedents)) + tail_shape)
+        n_nonvl = 0
+        for ix, vl in enumerate(rule.antecedents):
+            if vl >= 0:
+                membership_antecedent = np.array(antecedents_memberships[ix][vl])
+                if rule.modifiers is not None and rule.modifiers[ix] != -1:
+                    membership_antecedent = membership_antecedent**rule.modifiers[ix]
+                membership[:, ix] = membership_antecedent
+                n_nonvl += 1
+            else:
+                membership[:, ix] = 1.0
+
+        if n_nonvl == 0:
+            membership[:, ix] = 0.0
+
+        res[:, jx] = rule_base.tnorm(membership, axis=1)
+
+    return res
+
+
+def _sample_rules(with_modifiers=False):
+    rule_list = [
+        ex_fuzzy.rules.RuleSimple([0, -1, 2, 1], 0),
+        ex_fuzzy.rules.RuleSimple([-1, -1, -1, 1], 0),
+        ex_fuzzy.rules.RuleSimple([2, 1, 0, 0], 0),
+        ex_fuzzy.rules.RuleSimple([-1, -1, -1, -1], 0),
+    ]
+    if with_modifiers:
+        rule_list[0].modifiers = np.array([2.0, -1, 0.5, -1])
+        rule_list[1].modifiers = np.array([-1, -1, -1, -1])
+        rule_list[2].modifiers = np.array([-1, 3.0, -1, 1.3])
+        rule_list[3].modifiers = np.array([-1, -1, -1, -1])
+
+    return rule_list
+
+
+def _check_rule_base(rule_base_class, fz_type, tail_shape, tnorm=np.prod, with_modifiers=False):
+    X = np.random.random_sample((n_samples, n_features))
+    partitions = ex_fuzzy.utils.construct_partitions(X, fz_type)
+    rule_base = rule_base_class(partitions, _sample_rules(with_modifiers), tnorm=tnorm)
+
+    antecedents_memberships = rule_base.compute_antecedents_memberships(X)
+    reference = _reference_rule_memberships(rule_base, antecedents_memberships, n_samples, tail_shape)
+
+    vectorized = ex_fuzzy.rules.RuleBase.compute_rule_antecedent_memberships(rule_base, X)
+    assert vectorized.shape == reference.shape, 'Firing strengths shape changed'
+    assert np.allclose(vectorized, reference), 'Vectorized firing strengths differ from the rule by rule computation'
+
+    stacked = ex_fuzzy.rules.stack_antecedent_memberships(antecedents_memberships)
+    precomputed = ex_fuzzy.rules.RuleBase.compute_rule_antecedent_memberships(rule_base, X, antecedents_memberships=stacked)
+    assert np.allclose(precomputed, reference), 'Stacked precomputed memberships give different firing strengths'
+    assert np.all(vectorized[:, 3] == 0), 'Rules without antecedents should not fire'
+
+
+def test_rule_firing_t1():
+    '''
+    Tests that the vectorized rule firing matches the rule by rule computation in t1.
+    '''
+    _check_rule_base(ex_fuzzy.rules.RuleBaseT1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ())
+    _check_rule_base(ex_fuzzy.rules.RuleBaseT1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, (), with_modifiers=True)
+    _check_rule_base(ex_fuzzy.rules.RuleBaseT1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, (), tnorm=np.min, with_modifiers=True)
+
+
+def test_rule_firing_t2():
+    '''
+    Tests that the vectorized rule firing matches the rule by rule computation in t2.
+    '''
+    _check_rule_base(ex_fuzzy.rules.RuleBaseT2, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2, (2,))
+    _check_rule_base(ex_fuzzy.rules.RuleBaseT2, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2, (2,), with_modifiers=True)
+
+
+def test_rule_firing_gt2():
+    '''
+    Tests that the vectorized rule firing matches the rule by rule computation in gt2.
+    '''
+    X = np.random.random_sample((n_samples, n_features))
+    partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.gt2)
+    n_alpha = len(partitions[0][0].alpha_cuts)
+    _check_rule_base(ex_fuzzy.rules.RuleBaseGT2, ex_fuzzy.fuzzy_sets.FUZZY_SETS.gt2, (n_alpha, 2), with_modifiers=True)
+
+
+def test_rule_firing_categorical():
+    '''
+    Tests that the rules with high cardinality categorical variables, stored as category indexes, fire as in the rule by rule computation.
+    '''
+    for rule_base_class, fz_type, tail_shape in [(ex_fuzzy.rules.RuleBaseT1, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1, ()), (ex_fuzzy.rules.RuleBaseT2, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2, (2,))]:
+        X = np.random.random_sample((n_samples, n_features))
+        X[:, 1] = np.random.randint(0, 300, n_samples)
+        partitions = ex_fuzzy.utils.construct_partitions(X, fz_type, categorical_mask=np.array([False, True, False, False]))
+        rule_list = _sample_rules(with_modifiers=True)
+        rule_list[2].antecedents[1] = len(partitions[1]) - 1
+        rule_base = rule_base_class(partitions, rule_list)
+
+        antecedents_memberships = rule_base.compute_antecedents_memberships(X)
+        assert isinstance(antecedents_memberships[1], ex_fuzzy.fuzzy_sets.categoricalMemberships), 'Categorical memberships are not stored as category indexes'
+        stacked = ex_fuzzy.rules.stack_antecedent_memberships(antecedents_memberships)
+        assert stacked.dense.shape[1] == 4, 'Categorical variables are stored in the dense memberships'
+
+        reference = _reference_rule_memberships(rule_base, antecedents_memberships, n_samples, tail_shape)
+        vectorized = ex_fuzzy.rules.RuleBase.compute_rule_antecedent_memberships(rule_base, X)
+        assert np.allclose(vectorized, reference), 'Firing strengths with categorical variables differ from the rule by rule computation'
+
+
+def _reference_predict(mrule_base, X, out_class_names=False):
+    '''
+    Sample by sample prediction using the winning rules.
+    '''
+    consequents = sum([[ix]*len(mrule_base[ix].rules) for ix in range(len(mrule_base))], [])
+    winning_rules = mrule_base._winning_rules(X, allow_unkown=mrule_base.allow_unknown)
+    res = []
+    for winning_rule in winning_rules:
+        if winning_rule != -1:
+            res.append(mrule_base.consequent_names[consequents[winning_rule]] if out_class_names else consequents[winning_rule])
+        else:
+            res.append('Unknown' if out_class_names else -1)
+
+    return np.array(res)
+
+
+def test_winning_rule_predict():
+    '''
+    Tests the vectorized prediction, including the unknown samples and the consequent names.
+    '''
+    X = np.random.random_sample((n_samples, n_features))
+    partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    rule_bases = [ex_fuzzy.rules.RuleBaseT1(partitions, [ex_fuzzy.rules.RuleSimple([0, 0, -1, -1], 0)]),
+                  ex_fuzzy.rules.RuleBaseT1(partitions, [ex_fuzzy.rules.RuleSimple([2, -1, 2, -1], 0), ex_fuzzy.rules.RuleSimple([-1, 1, -1, 1], 0)])]
+    mrule_base = ex_fuzzy.rules.MasterRuleBase(rule_bases, consequent_names=['a', 'b'], ds_mode=1, allow_unknown=True)
+
+    preds = mrule_base.winning_rule_predict(X)
+    assert preds.dtype == np.float64, 'Predictions should be floats'
+    assert np.array_equal(preds, _reference_predict(mrule_base, X)), 'Vectorized predictions differ from the sample by sample ones'
+    assert np.any(preds == -1), 'The test data should have unknown samples'
+    assert np.array_equal(mrule_base.winning_rule_predict(X, out_class_names=True), _reference_predict(mrule_base, X, out_class_names=True)), 'Wrong consequent names'
+
+    # The cached consequents are updated when the rules change
+    mrule_base.add_rule(ex_fuzzy.rules.RuleSimple([1, 1, 1, 1], 0), 0)
+    assert mrule_base.get_consequents() == [0, 0, 1, 1], 'Consequents not updated after adding a rule'
+    mrule_base[1].remove_rule(0)
+    assert mrule_base.get_consequents() == [0, 0, 1], 'Consequents not updated after removing a rule'
+    assert np.array_equal(mrule_base.winning_rule_predict(X), _reference_predict(mrule_base, X)), 'Predictions differ after changing the rules'
+
+
+def test_predict_chunked():
+    '''
+    Tests that the chunked prediction gives the same results for arrays, memory mapped files and dataframe iterators.
+    '''
+    X = np.random.random_sample((n_samples, n_features))
+    partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)
+    rule_bases = [ex_fuzzy.rules.RuleBaseT2(partitions, _sample_rules()[:2]), ex_fuzzy.rules.RuleBaseT2(partitions, _sample_rules()[2:3])]
+    mrule_base = ex_fuzzy.rules.MasterRuleBase(rule_bases, ds_mode=1)
+    preds = mrule_base.winning_rule_predict(X)
+
+    assert np.array_equal(mrule_base.predict_chunked(X, chunk_size=33), preds), 'Chunked predictions differ'
+    chunks = list(mrule_base.iter_predict(pd.DataFrame(X), chunk_size=64, return_association_degrees=True))
+    assert max(len(chunk_preds) for chunk_preds, _ in chunks) <= 64, 'Chunk bigger than the chunk size'
+    assert np.array_equal(np.concatenate([degrees for _, degrees in chunks]), mrule_base.compute_association_degrees(X)), 'Chunked association degrees differ'
+
+    dataframe_chunks = (pd.DataFrame(X[ix:ix + 70]) for ix in range(0, n_samples, 70))
+    assert np.array_equal(mrule_base.predict_chunked(dataframe_chunks, chunk_size=50), preds), 'Predictions of the dataframe iterator differ'
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'X.npy')
+        np.save(path, X)
+        assert np.array_equal(mrule_base.predict_chunked(path, chunk_size=50), preds), 'Predictions of the memory mapped file differ'
+
+
+def test_regression_inference():
+    '''
+    Tests the batched t1 and gt2 regression inference against the per sample computation, with samples where no rule fires.
+    '''
+    X = np.random.random_sample((n_samples, n_features))
+    y = np.random.random_sample((n_samples, 1)) * 10
+    rule_list = [ex_fuzzy.rules.RuleSimple([0, -1, 2, -1], 0), ex_fuzzy.rules.RuleSimple([2, 1, -1, -1], 1), ex_fuzzy.rules.RuleSimple([-1, -1, 1, 0], 2)]
+
+    partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    consequent = ex_fuzzy.utils.construct_partitions(y, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)[0]
+    rule_base = ex_fuzzy.rules.RuleBaseT1(partitions, rule_list, consequent)
+    firing_strengths = rule_base.compute_rule_antecedent_memberships(X)
+    firing_rows = np.sum(firing_strengths, axis=1) > 0
+    assert not np.all(firing_rows), 'The test needs samples where no rule fires'
+
+    output = rule_base.forward(X)
+    reference = np.array([ex_fuzzy.centroid.center_of_masses(rule_base.consequent_centroids_rules, firing) for firing in firing_strengths[firing_rows]])
+    assert np.allclose(output[firing_rows], reference), 'Batched t1 inference differs from the per sample one'
+    assert np.all(output[~firing_rows] == 0), 'Samples where no rule fires should output 0'
+
+    gt2_partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.gt2)
+    iv_consequent = ex_fuzzy.utils.construct_partitions(y, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t2)[0]
+    gt2_rule_base = ex_fuzzy.rules.RuleBaseGT2(gt2_partitions, rule_list, iv_consequent)
+    alpha_outputs = gt2_rule_base.inference(X)
+    assert alpha_outputs.shape == (n_samples, len(gt2_rule_base.alpha_cuts)), 'Wrong gt2 inference shape'
+
+    alpha_firing = gt2_rule_base.alpha_compute_rule_antecedent_memberships(X, scaled=False)
+    iv_rule_base = ex_fuzzy.rules.RuleBaseT2(partitions, rule_list, iv_consequent)
+    for ix in range(len(gt2_rule_base.alpha_cuts)):
+        alpha_reference = ex_fuzzy.centroid.type_reduction(alpha_firing[:, :, ix], iv_rule_base.consequent_centroids_rules)
+        assert np.allclose(alpha_outputs[:, ix], np.mean(alpha_reference, axis=1)), 'Alpha cut output differs from its iv type reduction'
+    expected = np.sum(np.array(gt2_rule_base.alpha_cuts) * alpha_outputs, axis=1) / np.sum(gt2_rule_base.alpha_cuts)
+    assert np.allclose(gt2_rule_base.forward(X), expected), 'Wrong gt2 defuzzification'
+
+
+if __name__ == '__main__':
+    test_rule_firing_t1()
+    test_rule_firing_t2()
+    test_rule_firing_gt2()
+    test_rule_firing_categorical()
+    test_winning_rule_predict()
+    test_predict_chunked()
+    test_regression_inference()
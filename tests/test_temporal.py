@@ -0,0 +1,30 @@
+import numpy as np
+
+import sys
+sys.path.append('./ex_fuzzy/')
+sys.path.append('../ex_fuzzy/')
+import ex_fuzzy as ex_fuzzy
+
+sample_size = 300
+
+
+def test_temporal_fit():
+    '''
+    Tests that the temporal classifier can be fitted and gives one prediction per sample.
+    '''
+    from ex_fuzzy import temporal
+
+    X = np.random.random_sample((sample_size, 3))
+    y = np.random.randint(0, 2, sample_size)
+    time_moments = np.random.randint(0, 2, sample_size)
+    partitions = ex_fuzzy.utils.construct_partitions(X, ex_fuzzy.fuzzy_sets.FUZZY_SETS.t1)
+    temporal_variables = [temporal.temporalFuzzyVariable(partition.name, [temporal.temporalFS(fuzzy_set, np.array([1.0, 0.6])) for fuzzy_set in partition]) for partition in partitions]
+
+    classifier = temporal.TemporalFuzzyRulesClassifier(nRules=6, nAnts=2, linguistic_variables=temporal_variables, n_class=2)
+    classifier.fit(X, y, n_gen=2, pop_size=6, time_moments=time_moments)
+    predictions = classifier.forward(X, time_moments)
+    assert predictions.shape == (sample_size, ) and np.all(np.isin(predictions, [0, 1])), 'Wrong temporal predictions'
+
+
+if __name__ == '__main__':
+    test_temporal_fit()